@@ -0,0 +1,256 @@
+''' quaternion attitude and heading reference systems
+MadgwickAHRS and MahonyAHRS fuse the gyro, accelerometer and magnetometer in one update of an orientation quaternion,
+pitch, roll and heading are read from the quaternion only when they are needed:
+
+    ahrs = AHRS.MadgwickAHRS()
+    ahrs.update(gx, gy, gz, ax, ay, az, mx, my, mz, dt)     #gyro in rad/s, acc and mag in any unit
+    roll, pitch, yaw = ahrs.angles()                        #degrees
+
+The frame is right handed with z up: a level sensor measures +1g on the z axis, roll is around x, pitch around y and
+yaw around z, counterclockwise seen from above. The first update with usable accelerometer and magnetometer values
+sets the quaternion straight from them (initialise()), so there is no settling time after power up. The filters
+follow the reference implementations of Sebastian Madgwick, with the same gains as names.
+'''
+
+import math
+
+
+MADGWICK_BETA = 0.033       #gradient descent gain, higher follows the accelerometer and compass faster but noisier
+MAHONY_KP = 1.0             #proportional gain
+MAHONY_KI = 0.0             #integral gain, corrects the gyro bias when above 0
+
+
+class QuaternionAHRS:
+    ''' the quaternion state the filters share '''
+
+    def __init__(self):
+        self.q0 = 1.0
+        self.q1 = 0.0
+        self.q2 = 0.0
+        self.q3 = 0.0
+        self.initialised = False
+
+    def initialise(self, ax, ay, az, mx, my, mz):
+        '''set the orientation from a single accelerometer and magnetometer sample, returns False if they are unusable'''
+        if (ax == 0 and ay == 0 and az == 0) or (mx == 0 and my == 0 and mz == 0):
+            return False
+        roll = math.atan2(ay, az)
+        pitch = math.atan2(-ax, math.sqrt(ay * ay + az * az))
+        sinRoll = math.sin(roll)
+        cosRoll = math.cos(roll)
+        sinPitch = math.sin(pitch)
+        cosPitch = math.cos(pitch)
+        #the magnetic field rotated back to level
+        hx = mx * cosPitch + my * sinPitch * sinRoll + mz * sinPitch * cosRoll
+        hy = my * cosRoll - mz * sinRoll
+        yaw = math.atan2(-hy, hx)
+
+        cr = math.cos(roll / 2)
+        sr = math.sin(roll / 2)
+        cp = math.cos(pitch / 2)
+        sp = math.sin(pitch / 2)
+        cy = math.cos(yaw / 2)
+        sy = math.sin(yaw / 2)
+        self.q0 = cr * cp * cy + sr * sp * sy
+        self.q1 = sr * cp * cy - cr * sp * sy
+        self.q2 = cr * sp * cy + sr * cp * sy
+        self.q3 = cr * cp * sy - sr * sp * cy
+        self.initialised = True
+        return True
+
+    def angles(self):
+        '''returns (roll, pitch, yaw) in degrees, yaw between -180 and 180'''
+        q0 = self.q0
+        q1 = self.q1
+        q2 = self.q2
+        q3 = self.q3
+        roll = math.atan2(q0 * q1 + q2 * q3, 0.5 - q1 * q1 - q2 * q2)
+        sinPitch = 2.0 * (q0 * q2 - q3 * q1)
+        pitch = math.asin(max(-1.0, min(1.0, sinPitch)))
+        yaw = math.atan2(q0 * q3 + q1 * q2, 0.5 - q2 * q2 - q3 * q3)
+        return math.degrees(roll), math.degrees(pitch), math.degrees(yaw)
+
+
+class MadgwickAHRS(QuaternionAHRS):
+    ''' Madgwick's gradient descent filter '''
+
+    def __init__(self, beta=MADGWICK_BETA):
+        QuaternionAHRS.__init__(self)
+        self.beta = beta
+
+    def update(self, gx, gy, gz, ax, ay, az, mx, my, mz, dt):
+        '''one filter step, gyro rates in rad/s and dt in seconds'''
+        if not self.initialised and self.initialise(ax, ay, az, mx, my, mz):
+            return
+        q0 = self.q0
+        q1 = self.q1
+        q2 = self.q2
+        q3 = self.q3
+
+        #rate of change of the quaternion from the gyro
+        qDot0 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz)
+        qDot1 = 0.5 * (q0 * gx + q2 * gz - q3 * gy)
+        qDot2 = 0.5 * (q0 * gy - q1 * gz + q3 * gx)
+        qDot3 = 0.5 * (q0 * gz + q1 * gy - q2 * gx)
+
+        accNorm = ax * ax + ay * ay + az * az
+        magNorm = mx * mx + my * my + mz * mz
+        if accNorm > 0 and magNorm > 0:
+            recipNorm = 1.0 / math.sqrt(accNorm)
+            ax *= recipNorm
+            ay *= recipNorm
+            az *= recipNorm
+            recipNorm = 1.0 / math.sqrt(magNorm)
+            mx *= recipNorm
+            my *= recipNorm
+            mz *= recipNorm
+
+            _2q0mx = 2.0 * q0 * mx
+            _2q0my = 2.0 * q0 * my
+            _2q0mz = 2.0 * q0 * mz
+            _2q1mx = 2.0 * q1 * mx
+            _2q0 = 2.0 * q0
+            _2q1 = 2.0 * q1
+            _2q2 = 2.0 * q2
+            _2q3 = 2.0 * q3
+            _2q0q2 = 2.0 * q0 * q2
+            _2q2q3 = 2.0 * q2 * q3
+            q0q0 = q0 * q0
+            q0q1 = q0 * q1
+            q0q2 = q0 * q2
+            q0q3 = q0 * q3
+            q1q1 = q1 * q1
+            q1q2 = q1 * q2
+            q1q3 = q1 * q3
+            q2q2 = q2 * q2
+            q2q3 = q2 * q3
+            q3q3 = q3 * q3
+
+            #direction of the earth's magnetic field
+            hx = mx * q0q0 - _2q0my * q3 + _2q0mz * q2 + mx * q1q1 + _2q1 * my * q2 + _2q1 * mz * q3 - mx * q2q2 - mx * q3q3
+            hy = _2q0mx * q3 + my * q0q0 - _2q0mz * q1 + _2q1mx * q2 - my * q1q1 + my * q2q2 + _2q2 * mz * q3 - my * q3q3
+            _2bx = math.sqrt(hx * hx + hy * hy)
+            _2bz = -_2q0mx * q2 + _2q0my * q1 + mz * q0q0 + _2q1mx * q3 - mz * q1q1 + _2q2 * my * q3 - mz * q2q2 + mz * q3q3
+            _4bx = 2.0 * _2bx
+            _4bz = 2.0 * _2bz
+
+            #gradient descent step
+            fax = 2.0 * q1q3 - _2q0q2 - ax
+            fay = 2.0 * q0q1 + _2q2q3 - ay
+            faz = 1.0 - 2.0 * q1q1 - 2.0 * q2q2 - az
+            fmx = _2bx * (0.5 - q2q2 - q3q3) + _2bz * (q1q3 - q0q2) - mx
+            fmy = _2bx * (q1q2 - q0q3) + _2bz * (q0q1 + q2q3) - my
+            fmz = _2bx * (q0q2 + q1q3) + _2bz * (0.5 - q1q1 - q2q2) - mz
+            s0 = -_2q2 * fax + _2q1 * fay - _2bz * q2 * fmx + (-_2bx * q3 + _2bz * q1) * fmy + _2bx * q2 * fmz
+            s1 = _2q3 * fax + _2q0 * fay - 4.0 * q1 * faz + _2bz * q3 * fmx + (_2bx * q2 + _2bz * q0) * fmy + (_2bx * q3 - _4bz * q1) * fmz
+            s2 = -_2q0 * fax + _2q3 * fay - 4.0 * q2 * faz + (-_4bx * q2 - _2bz * q0) * fmx + (_2bx * q1 + _2bz * q3) * fmy + (_2bx * q0 - _4bz * q2) * fmz
+            s3 = _2q1 * fax + _2q2 * fay + (-_4bx * q3 + _2bz * q1) * fmx + (-_2bx * q0 + _2bz * q2) * fmy + _2bx * q1 * fmz
+            sNorm = s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3
+            if sNorm > 0:
+                recipNorm = self.beta / math.sqrt(sNorm)
+                qDot0 -= recipNorm * s0
+                qDot1 -= recipNorm * s1
+                qDot2 -= recipNorm * s2
+                qDot3 -= recipNorm * s3
+
+        q0 += qDot0 * dt
+        q1 += qDot1 * dt
+        q2 += qDot2 * dt
+        q3 += qDot3 * dt
+        recipNorm = 1.0 / math.sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+        self.q0 = q0 * recipNorm
+        self.q1 = q1 * recipNorm
+        self.q2 = q2 * recipNorm
+        self.q3 = q3 * recipNorm
+
+
+class MahonyAHRS(QuaternionAHRS):
+    ''' Mahony's nonlinear complementary filter, a PI controller on the error between the measured and estimated
+    gravity and magnetic field directions '''
+
+    def __init__(self, kp=MAHONY_KP, ki=MAHONY_KI):
+        QuaternionAHRS.__init__(self)
+        self.kp = kp
+        self.ki = ki
+        self.integralX = 0.0
+        self.integralY = 0.0
+        self.integralZ = 0.0
+
+    def update(self, gx, gy, gz, ax, ay, az, mx, my, mz, dt):
+        '''one filter step, gyro rates in rad/s and dt in seconds'''
+        if not self.initialised and self.initialise(ax, ay, az, mx, my, mz):
+            return
+        q0 = self.q0
+        q1 = self.q1
+        q2 = self.q2
+        q3 = self.q3
+
+        accNorm = ax * ax + ay * ay + az * az
+        magNorm = mx * mx + my * my + mz * mz
+        if accNorm > 0 and magNorm > 0:
+            recipNorm = 1.0 / math.sqrt(accNorm)
+            ax *= recipNorm
+            ay *= recipNorm
+            az *= recipNorm
+            recipNorm = 1.0 / math.sqrt(magNorm)
+            mx *= recipNorm
+            my *= recipNorm
+            mz *= recipNorm
+
+            q0q0 = q0 * q0
+            q0q1 = q0 * q1
+            q0q2 = q0 * q2
+            q0q3 = q0 * q3
+            q1q1 = q1 * q1
+            q1q2 = q1 * q2
+            q1q3 = q1 * q3
+            q2q2 = q2 * q2
+            q2q3 = q2 * q3
+            q3q3 = q3 * q3
+
+            #reference direction of the earth's magnetic field
+            hx = 2.0 * (mx * (0.5 - q2q2 - q3q3) + my * (q1q2 - q0q3) + mz * (q1q3 + q0q2))
+            hy = 2.0 * (mx * (q1q2 + q0q3) + my * (0.5 - q1q1 - q3q3) + mz * (q2q3 - q0q1))
+            bx = math.sqrt(hx * hx + hy * hy)
+            bz = 2.0 * (mx * (q1q3 - q0q2) + my * (q2q3 + q0q1) + mz * (0.5 - q1q1 - q2q2))
+
+            #estimated direction of gravity and the magnetic field, halved
+            halfvx = q1q3 - q0q2
+            halfvy = q0q1 + q2q3
+            halfvz = q0q0 - 0.5 + q3q3
+            halfwx = bx * (0.5 - q2q2 - q3q3) + bz * (q1q3 - q0q2)
+            halfwy = bx * (q1q2 - q0q3) + bz * (q0q1 + q2q3)
+            halfwz = bx * (q0q2 + q1q3) + bz * (0.5 - q1q1 - q2q2)
+
+            #error is the cross product between the estimated and measured directions
+            halfex = (ay * halfvz - az * halfvy) + (my * halfwz - mz * halfwy)
+            halfey = (az * halfvx - ax * halfvz) + (mz * halfwx - mx * halfwz)
+            halfez = (ax * halfvy - ay * halfvx) + (mx * halfwy - my * halfwx)
+
+            if self.ki > 0:
+                self.integralX += 2.0 * self.ki * halfex * dt
+                self.integralY += 2.0 * self.ki * halfey * dt
+                self.integralZ += 2.0 * self.ki * halfez * dt
+                gx += self.integralX
+                gy += self.integralY
+                gz += self.integralZ
+            gx += 2.0 * self.kp * halfex
+            gy += 2.0 * self.kp * halfey
+            gz += 2.0 * self.kp * halfez
+
+        gx *= 0.5 * dt
+        gy *= 0.5 * dt
+        gz *= 0.5 * dt
+        q0, q1, q2, q3 = (q0 - q1 * gx - q2 * gy - q3 * gz,
+                          q1 + q0 * gx + q2 * gz - q3 * gy,
+                          q2 + q0 * gy - q1 * gz + q3 * gx,
+                          q3 + q0 * gz + q1 * gy - q2 * gx)
+        recipNorm = 1.0 / math.sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+        self.q0 = q0 * recipNorm
+        self.q1 = q1 * recipNorm
+        self.q2 = q2 * recipNorm
+        self.q3 = q3 * recipNorm
+
+
+#the fusion modes of berryIMU.OrientationEstimator that use a quaternion filter
+FILTERS = {"MADGWICK": MadgwickAHRS, "MAHONY": MahonyAHRS}
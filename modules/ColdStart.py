@@ -0,0 +1,51 @@
+''' cold start budget of the trackers
+Measures how long every phase of a tracker start takes, from the launch of the script until the first move, and
+prints it when the tracker is ready to move:
+
+    import time as t
+    launchTime = t.perf_counter()           #first line of the script
+    ...imports...
+    coldStart = ColdStart.ColdStart(launchTime)
+    coldStart.mark("imports")
+    gps = MirrorGPS.getGPSinfo()
+    coldStart.mark("GPS fix", waiting=True)
+    ...
+    coldStart.report()
+
+Waiting phases (the GPS fix, the IMU filters settling) depend on the sky and the hardware, not on the code, so they
+are printed but don't count against COLD_START_BUDGET. The python interpreter start itself is not included.
+'''
+
+import time
+
+
+COLD_START_BUDGET = 3.0     #seconds from launch to the first move, without the waiting phases
+
+
+class ColdStart:
+
+    def __init__(self, start=None, budget=COLD_START_BUDGET):
+        '''start: time.perf_counter() at the launch, by default now'''
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+        self.budget = budget
+        self.phases = []            #[(name, seconds, waiting)]
+
+    def mark(self, name, waiting=False):
+        '''end of the phase name, it started at the previous mark'''
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last, waiting))
+        self.last = now
+
+    def elapsed(self, waiting=None):
+        '''seconds of all phases, of only the waiting ones (True) or of the others (False)'''
+        return sum(seconds for name, seconds, isWaiting in self.phases if waiting is None or isWaiting == waiting)
+
+    def report(self):
+        '''print every phase and whether the start stayed within the budget'''
+        print("cold start:")
+        for name, seconds, waiting in self.phases:
+            print("    %-20s %7.2f s%s" % (name, seconds, " (waiting)" if waiting else ""))
+        own = self.elapsed(False)
+        print("    %-20s %7.2f s, %.2f s without waiting, budget %.1f s%s" % ("total", self.elapsed(), own, self.budget,
+            "" if own <= self.budget else " EXCEEDED"))
@@ -0,0 +1,90 @@
+''' gyro bias against die temperature
+A MEMS gyro doesn't read exactly 0 when it is not turning, and the offset (the bias) changes with the temperature
+of the chip. The Kalman filters learn the bias, but start from 0 on every launch. BiasTable keeps the measured bias
+per degree of die temperature in a small JSON file, so the filters can start from the bias that goes with the
+current temperature:
+
+    table = GyroBias.BiasTable(berryIMU.BIAS_TABLE)
+    temperature = imu.readTemperature()
+    bias = table.lookup(temperature)                #(x, y, z) in deg/s, None for an empty table
+    measured = GyroBias.measureBias(imu, gain)      #only when the IMU is not moving
+    if measured:
+        table.record(temperature, measured)
+        table.save()
+'''
+
+import os
+import json
+import time
+import math
+
+
+STILL_LIMIT = 0.5           #maximum standard deviation of the gyro rates in deg/s to count as not moving
+MAX_WEIGHT = 20             #a bin is the mean of its measurements until it has this many, then a moving average
+NEAR = 2.0                  #lookup() within this many degrees of a measured bin counts as known
+
+
+class BiasTable:
+
+    def __init__(self, path=None):
+        '''path: the table file, it is read when it exists'''
+        self.path = path
+        self.bins = {}              #{degrees: [x, y, z, weight]}
+        if path and os.path.exists(path):
+            with open(path) as tableFile:
+                self.bins = {int(degrees): values for degrees, values in json.load(tableFile).items()}
+
+    def save(self, path=None):
+        with open(path or self.path, 'w') as tableFile:
+            json.dump({str(degrees): values for degrees, values in sorted(self.bins.items())}, tableFile, indent=4)
+
+    def record(self, temperature, bias):
+        '''add a measured (x, y, z) bias in deg/s at temperature (degrees Celsius) to the bin of that degree'''
+        degrees = int(round(temperature))
+        old = self.bins.get(degrees)
+        if old is None:
+            self.bins[degrees] = [bias[0], bias[1], bias[2], 1]
+            return
+        weight = min(old[3] + 1, MAX_WEIGHT)
+        self.bins[degrees] = [old[axis] + (bias[axis] - old[axis]) / weight for axis in range(3)] + [weight]
+
+    def known(self, temperature):
+        '''True when there is a measurement within NEAR degrees'''
+        return any(abs(degrees - temperature) <= NEAR for degrees in self.bins)
+
+    def lookup(self, temperature):
+        '''the (x, y, z) bias in deg/s at temperature, interpolated between the bins around it and the nearest bin
+        outside the measured range. None when the table is empty'''
+        if not self.bins:
+            return None
+        below = [degrees for degrees in self.bins if degrees <= temperature]
+        above = [degrees for degrees in self.bins if degrees >= temperature]
+        if not below:
+            return tuple(self.bins[min(above)][:3])
+        if not above:
+            return tuple(self.bins[max(below)][:3])
+        low = max(below)
+        high = min(above)
+        if low == high:
+            return tuple(self.bins[low][:3])
+        fraction = (temperature - low) / (high - low)
+        return tuple(self.bins[low][axis] + (self.bins[high][axis] - self.bins[low][axis]) * fraction for axis in range(3))
+
+
+def measureBias(device, gain, n=100, interval=0.005):
+    '''average n gyro samples of device (an IMU.Imu) with gain dps/LSB, returns the (x, y, z) bias in deg/s.
+    returns None when the IMU was moving'''
+    sums = [0.0, 0.0, 0.0]
+    squareSums = [0.0, 0.0, 0.0]
+    for i in range(n):
+        rates = device.readGyro()
+        for axis in range(3):
+            rate = rates[axis] * gain
+            sums[axis] += rate
+            squareSums[axis] += rate * rate
+        time.sleep(interval)
+    means = [total / n for total in sums]
+    for axis in range(3):
+        if math.sqrt(max(0.0, squareSums[axis] / n - means[axis] * means[axis])) > STILL_LIMIT:
+            return None
+    return tuple(means)
@@ -14,15 +14,13 @@ This can be useful in case where the compass doesn't give an accurate reading.
 
 '''
 
+import time as t
+launchTime = t.perf_counter()
+
 import MirrorGPS
 import liblo
-from astropy.coordinates import SkyCoord, EarthLocation, AltAz, get_sun
-
-from astropy.time import Time 
-import astropy.units as u
-
-from astropy.utils import iers
-import time as t
+import SunPosition
+import ColdStart
 import argparse
 
 import wmm2015 as wmm
@@ -31,48 +29,64 @@ import wmm2015 as wmm
 parser = argparse.ArgumentParser(description="Fruitstepper stepper control")
 parser.add_argument('--heading', metavar="heading", type=int, nargs=1, default=[None], required=False, help="heading of the sun tracker, 0 is due north")
 parser.add_argument('--interval', metavar="interval", type=int, nargs=1, default=[60], required=False, help="interval in seconds between sun position updates")
+parser.add_argument('--sunBackend', metavar="sunBackend", type=str, default=None, required=False, help="ASTROPY or PSA, see SunPosition.BACKENDS")
 argHeading = parser.parse_args().heading[0]
+argSunBackend = parser.parse_args().sunBackend
 trackingInterval = parser.parse_args().interval[0]
 
-
-#max age of astropy data in days
-iers.conf.auto_max_age = 365
+coldStart = ColdStart.ColdStart(launchTime)
+coldStart.mark("imports")
 
 
 motionCtrlAddress = liblo.Address("127.0.0.1", 8000)
+
+orientation = None
+if(argHeading == None):
+    #ask the orientation daemon (OrientationService.py) first, its filters are already settled
+    import OrientationService
+    orientation = OrientationService.queryOrientation()
+if(argHeading == None and orientation == None):
+    #measure the orientation in the background while waiting for the GPS
+    import berryIMU
+    estimator = berryIMU.OrientationEstimator()
+    estimator.start()
+    estimator.startBackground(scheduled=True)
+coldStart.mark("orientation start")
        
 gps = MirrorGPS.getGPSinfo()
+coldStart.mark("GPS fix", waiting=True)
 print(gps)
 date = gps[0]
 time = gps[1]
-suntime = Time(date + " " + time)
+suntime = MirrorGPS.gpsUnixTime(date, time)
 lon = float(gps[2]) / 100
 lat = float(gps[4]) / 100
 print("lon: %f" % lon)
 print("lat: %f" % lat)
-print("suntime: %s" % suntime)
-sunPos = get_sun(suntime)
-print("sunra: %s" % sunPos.ra)
+print("suntime: %s %s UTC" % (date, time))
 magDecl = wmm.wmm(lat, lon, 0, 2019)
 print("magDecl: %s" % (magDecl.decl.item(),))
 
-location = EarthLocation.from_geodetic(lat=lat, lon=lon, height=0)
-altaz = sunPos.transform_to(AltAz(obstime=suntime, location=location))
-sunalt = altaz.alt.deg
-sunaz = altaz.az.deg
+#the sun positions of the coming day in one go, the updates interpolate them
+ephemeris = SunPosition.DayEphemeris(lat, lon, suntime, backend=argSunBackend)
+sunalt, sunaz = ephemeris.altaz(suntime)
+coldStart.mark("sun table")
 sunaltZero = sunalt 
 sunazZero = sunaz
 
 print(sunalt, sunaz)
 
 if(argHeading == None):
-    import berryIMU
-    orientation = berryIMU.getValues()
+    if(orientation == None):
+        estimator.waitForConvergence()
+        estimator.stopBackground()
+        orientation = estimator.getValues()
     print("pitch: %s , roll: %s , heading: %s" % orientation)
     heading = orientation[2] - magDecl.decl.item()
     print("corrected heading %f" % heading)
 else:
     heading = argHeading
+coldStart.mark("orientation", waiting=True)
 
 '''if(heading < 180):
     northComp = 90 - heading
@@ -90,6 +104,7 @@ sunYaw = sunaz
 print("sunYaw: %f" % sunYaw)
 sunPitch = sunalt
 print("sunPitch: %f" % sunPitch)
+coldStart.report()
 liblo.send(motionCtrlAddress, "/angleYaw", northComp, 1)
 t.sleep(10)
 liblo.send(motionCtrlAddress, "/zeroYaw", 1)
@@ -111,13 +126,9 @@ while(True):
     #update the current time after the interval
     gps = MirrorGPS.getGPSinfo()
     time = gps[1]
-    suntime = Time(date + " " + time)
-    #get new sun position
-    sunPos = get_sun(suntime)
-    #convert to altaz system and calculate movement since beginning (deltaPosition)
-    altaz = sunPos.transform_to(AltAz(obstime=suntime, location=location))
-    sunalt = altaz.alt.deg
-    sunaz = altaz.az.deg
+    suntime = MirrorGPS.gpsUnixTime(date, time)
+    #get the new sun position from the ephemeris, movement since beginning (deltaPosition)
+    sunalt, sunaz = ephemeris.altaz(suntime)
     deltaSunalt = sunalt - sunaltZero
     deltaSunaz = sunaz - sunazZero
     #send delta positions to fruitstepper4.py
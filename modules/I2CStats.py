@@ -0,0 +1,133 @@
+''' I2C transaction statistics
+InstrumentedBus wraps an smbus (or IMUSim) bus and counts the transactions per device address and records the time
+every transaction takes in a fixed bucket histogram. Wrap the bus before detecting the IMU:
+
+    IMU.setBus(I2CStats.InstrumentedBus(IMU.openBus()))
+    imu = IMU.detectIMU()
+    ...
+    IMU.bus.dump()
+
+With installSignalHandler() the statistics are printed whenever the process gets a SIGUSR1 (kill -USR1 <pid>), so a
+running leveler or tracker can be inspected without stopping it. Transactions on the same bus that don't go through
+this object (e.g. the MotorKit PCA9685) are not counted, but they show up as longer latencies of the IMU transactions.
+'''
+
+import sys
+import time
+import bisect
+import signal
+import threading
+
+
+#upper bounds of the latency buckets in microseconds, the last bucket holds everything slower
+BUCKETS_US = (50, 100, 200, 300, 500, 750, 1000, 2000, 5000, 10000, 50000)
+
+
+class InstrumentedBus:
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.started = time.monotonic()
+        self.reset()
+
+    def reset(self):
+        '''clear all counters'''
+        self.counts = {}            #{(address, operation): transactions}
+        self.histograms = {}        #{address: [transactions per latency bucket]}
+        self.totalTime = {}         #{address: seconds spent in transactions}
+        self.started = time.monotonic()
+
+    def record(self, address, operation, elapsed):
+        key = (address, operation)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        histogram = self.histograms.get(address)
+        if histogram is None:
+            histogram = self.histograms[address] = [0] * (len(BUCKETS_US) + 1)
+        histogram[bisect.bisect_left(BUCKETS_US, elapsed * 1000000)] += 1
+        self.totalTime[address] = self.totalTime.get(address, 0.0) + elapsed
+
+
+    #smbus interface
+
+    def read_byte_data(self, address, register):
+        start = time.perf_counter()
+        try:
+            return self.bus.read_byte_data(address, register)
+        finally:
+            self.record(address, "read_byte_data", time.perf_counter() - start)
+
+    def write_byte_data(self, address, register, value):
+        start = time.perf_counter()
+        try:
+            return self.bus.write_byte_data(address, register, value)
+        finally:
+            self.record(address, "write_byte_data", time.perf_counter() - start)
+
+    def read_i2c_block_data(self, address, register, length):
+        start = time.perf_counter()
+        try:
+            return self.bus.read_i2c_block_data(address, register, length)
+        finally:
+            self.record(address, "read_i2c_block_data", time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        #everything else (close, other smbus calls) goes to the wrapped bus uncounted
+        return getattr(self.bus, name)
+
+
+    def asDict(self):
+        '''the statistics as a dictionary, e.g. for json.dump. Works on a copy of the counters, the sampling thread
+        can go on recording while it runs'''
+        elapsed = time.monotonic() - self.started
+        totalTime = dict(self.totalTime)
+        histograms = {address: list(histogram) for address, histogram in list(self.histograms.items())}
+        counts = dict(self.counts)
+        devices = {}
+        for address in set(address for address, operation in counts) | set(histograms):
+            devices["0x%02X" % address] = {'operations': {}, 'transactions': 0, 'perSecond': 0.0, 'meanLatencyUs': 0.0,
+                                           'busLoad': 0.0, 'histogram': {}}
+        for (address, operation), count in counts.items():
+            devices["0x%02X" % address]['operations'][operation] = count
+        for address, histogram in histograms.items():
+            device = devices["0x%02X" % address]
+            transactions = sum(histogram)
+            busy = totalTime.get(address, 0.0)
+            device['transactions'] = transactions
+            device['perSecond'] = transactions / elapsed if elapsed > 0 else 0.0
+            device['meanLatencyUs'] = busy / transactions * 1000000 if transactions else 0.0
+            device['busLoad'] = busy / elapsed if elapsed > 0 else 0.0
+            device['histogram'] = {label: count for label, count in zip(bucketLabels(), histogram)}
+        return {'seconds': elapsed, 'devices': devices}
+
+    def dump(self, out=None):
+        '''print the statistics'''
+        out = out or sys.stdout
+        stats = self.asDict()
+        print("I2C statistics over %.1f s" % stats['seconds'], file=out)
+        for address, device in sorted(stats['devices'].items()):
+            print("device %s: %i transactions (%.1f/s), mean %.0f us, bus busy %.1f%%" % (
+                address, device['transactions'], device['perSecond'], device['meanLatencyUs'], device['busLoad'] * 100), file=out)
+            for operation, count in sorted(device['operations'].items()):
+                print("    %-20s %i" % (operation, count), file=out)
+            for label, count in device['histogram'].items():
+                if count:
+                    print("    %10s us  %i" % (label, count), file=out)
+
+    def installSignalHandler(self, signalNumber=signal.SIGUSR1):
+        '''print the statistics when the process receives signalNumber. Python only installs signal handlers from
+        the main thread, from another thread nothing is installed and False is returned'''
+        if threading.current_thread() is not threading.main_thread():
+            print("I2C statistics signal handler not installed, call it from the main thread")
+            return False
+        signal.signal(signalNumber, lambda signum, frame: self.dump())
+        return True
+
+
+def bucketLabels():
+    labels = []
+    lower = 0
+    for upper in BUCKETS_US:
+        labels.append("%i-%i" % (lower, upper))
+        lower = upper
+    labels.append(">%i" % lower)
+    return labels
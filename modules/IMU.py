@@ -1,151 +1,93 @@
-import smbus
-bus = smbus.SMBus(1)
 from LSM9DS0 import *
 from LSM9DS1 import *
 import time
-time.sleep(1)
+import struct
+import numpy as np
+import IMUTiming
 
 
 LSM9DS0 = 0
 
+#the I2C bus backend, anything with the smbus read_byte_data, write_byte_data and read_i2c_block_data methods
+#it is opened by detectIMU(), use setBus() before that to run on another bus or on a simulated IMU (see IMUSim.py)
+bus = None
 
 
-def detectIMU():
-    #Detect which version of BerryIMU is connected.   
-    #BerryIMUv1 uses the LSM9DS0
-    #BerryIMUv2 uses the LSM9DS1
+
+def setBus(newBus):
+    '''use newBus for all IMU transactions instead of the Raspberry Pi I2C bus'''
+    global bus
+    bus = newBus
+
+
+def openBus(busNumber=1):
+    '''open the I2C bus of the Raspberry Pi, unless a bus backend has already been set'''
+    global bus
+    if bus is None:
+        import smbus
+        bus = smbus.SMBus(busNumber)
+        time.sleep(1)
+    return bus
+
+
+
+
+
+def detectIMU(i2cBus=None):
+    '''Detect which version of BerryIMU is connected and return an Imu device for it.
+    BerryIMUv1 uses the LSM9DS0
+    BerryIMUv2 uses the LSM9DS1
+    Without i2cBus the default bus is used and the device also becomes the one the module level read and write
+    functions use. Pass another bus to talk to more than one BerryIMU, e.g. one per mirror.'''
     global LSM9DS0
-    
+    global imu
+
+    defaultBus = i2cBus is None
+    if defaultBus:
+        i2cBus = openBus()
+    foundLSM9DS0 = 0
     
     try:
         #Check for LSM9DS0
         #If no LSM9DS0 is conencted, there will be an I2C bus error and the program will exit.
         #This section of code stops this from happening.
-        LSM9DS0_WHO_G_response = (bus.read_byte_data(LSM9DS0_GYR_ADDRESS, LSM9DS0_WHO_AM_I_G))
-        LSM9DS0_WHO_XM_response = (bus.read_byte_data(LSM9DS0_ACC_ADDRESS, LSM9DS0_WHO_AM_I_XM))
+        LSM9DS0_WHO_G_response = (i2cBus.read_byte_data(LSM9DS0_GYR_ADDRESS, LSM9DS0_WHO_AM_I_G))
+        LSM9DS0_WHO_XM_response = (i2cBus.read_byte_data(LSM9DS0_ACC_ADDRESS, LSM9DS0_WHO_AM_I_XM))
     except IOError as e:
         print( '' )       #need to do something here, so we just print a space
     else:
         if (LSM9DS0_WHO_G_response == 0xd4) and (LSM9DS0_WHO_XM_response == 0x49):
             print( "Found LSM9DS0")
-            LSM9DS0 = 1
+            foundLSM9DS0 = 1
 
 
     try:
         #Check for LSM9DS1
         #If no LSM9DS1 is conencted, there will be an I2C bus error and the program will exit.
         #This section of code stops this from happening.
-        LSM9DS1_WHO_XG_response = (bus.read_byte_data(LSM9DS1_GYR_ADDRESS, LSM9DS1_WHO_AM_I_XG))
-        LSM9DS1_WHO_M_response = (bus.read_byte_data(LSM9DS1_MAG_ADDRESS, LSM9DS1_WHO_AM_I_M))
+        LSM9DS1_WHO_XG_response = (i2cBus.read_byte_data(LSM9DS1_GYR_ADDRESS, LSM9DS1_WHO_AM_I_XG))
+        LSM9DS1_WHO_M_response = (i2cBus.read_byte_data(LSM9DS1_MAG_ADDRESS, LSM9DS1_WHO_AM_I_M))
 
     except IOError as f:
         print( 'Error could not find LSM9DS1')        #need to do something here, so we just print a space
     else:
         if (LSM9DS1_WHO_XG_response == 0x68) and (LSM9DS1_WHO_M_response == 0x3d):
             print ("Found LSM9DS1")
-            LSM9DS0 = 0
-
-    time.sleep(1)
-
-
-
-    
-
-
-def writeAG(register,value):
-        bus.write_byte_data(ACC_ADDRESS , register, value)
-        return -1
-
-def writeACC(register,value):
-        bus.write_byte_data(ACC_ADDRESS , register, value)
-        return -1
-
-def writeMAG(register,value):
-        bus.write_byte_data(MAG_ADDRESS, register, value)
-        return -1
-
-def writeGRY(register,value):
-        bus.write_byte_data(GYR_ADDRESS, register, value)
-        return -1
-
-
-
-def readACCx():
-    acc_l = bus.read_byte_data(ACC_ADDRESS, OUT_X_L_XL)
-    acc_h = bus.read_byte_data(ACC_ADDRESS, OUT_X_H_XL)
-    acc_combined = (acc_l | acc_h <<8)
-
-    return acc_combined  if acc_combined < 32768 else acc_combined - 65536
-
-
-def readACCy():
-    acc_l = bus.read_byte_data(ACC_ADDRESS, OUT_Y_L_XL)
-    acc_h = bus.read_byte_data(ACC_ADDRESS, OUT_Y_H_XL)
-    acc_combined = (acc_l | acc_h <<8)
-
-    return acc_combined  if acc_combined < 32768 else acc_combined - 65536
-
-
-def readACCz():
-    acc_l = bus.read_byte_data(ACC_ADDRESS, OUT_Z_L_XL)
-    acc_h = bus.read_byte_data(ACC_ADDRESS, OUT_Z_H_XL)
-    acc_combined = (acc_l | acc_h <<8)
-
-    return acc_combined  if acc_combined < 32768 else acc_combined - 65536
-
-
-def readMAGx():
-        mag_l = bus.read_byte_data(MAG_ADDRESS, OUT_X_L_M)
-        mag_h = bus.read_byte_data(MAG_ADDRESS, OUT_X_H_M)
-        mag_combined = (mag_l | mag_h <<8)
-        return mag_combined  if mag_combined < 32768 else mag_combined - 65536
-
-
-def readMAGy():
-        mag_l = bus.read_byte_data(MAG_ADDRESS, OUT_Y_L_M)
-        mag_h = bus.read_byte_data(MAG_ADDRESS, OUT_Y_H_M)
-        mag_combined = (mag_l | mag_h <<8)
-
-        return mag_combined  if mag_combined < 32768 else mag_combined - 65536
-
-
-def readMAGz():
-        mag_l = bus.read_byte_data(MAG_ADDRESS, OUT_Z_L_M)
-        mag_h = bus.read_byte_data(MAG_ADDRESS, OUT_Z_H_M)
-        mag_combined = (mag_l | mag_h <<8)
-
-        return mag_combined  if mag_combined < 32768 else mag_combined - 65536
-
-
-def readGYRx():
-        gyr_l = bus.read_byte_data(GYR_ADDRESS, OUT_X_L_G)
-        gyr_h = bus.read_byte_data(GYR_ADDRESS, OUT_X_H_G)
-        gyr_combined = (gyr_l | gyr_h <<8)
-
-        return gyr_combined  if gyr_combined < 32768 else gyr_combined - 65536
-  
-
-def readGYRy():
-        gyr_l = bus.read_byte_data(GYR_ADDRESS, OUT_Y_L_G)
-        gyr_h = bus.read_byte_data(GYR_ADDRESS, OUT_Y_H_G)
-        gyr_combined = (gyr_l | gyr_h <<8)
-
-        return gyr_combined  if gyr_combined < 32768 else gyr_combined - 65536
-
-def readGYRz():
-        gyr_l = bus.read_byte_data(GYR_ADDRESS, OUT_Z_L_G)
-        gyr_h = bus.read_byte_data(GYR_ADDRESS, OUT_Z_H_G)
-        gyr_combined = (gyr_l | gyr_h <<8)
-
-        return gyr_combined  if gyr_combined < 32768 else gyr_combined - 65536
-
-
+            foundLSM9DS0 = 0
 
+    device = Imu(i2cBus, foundLSM9DS0)
+    if defaultBus:
+        LSM9DS0 = foundLSM9DS0
+        imu = device
 
+    time.sleep(1)
+    return device
 
 
 
 
+''' single register access on the default bus. Every axis read takes two I2C transactions,
+use readACC(), readGYR() and readMAG() or the Imu methods in loops '''
 
 def writeACC(register,value):
     if(LSM9DS0):
@@ -279,50 +221,333 @@ def readGYRz():
     return gyr_combined  if gyr_combined < 32768 else gyr_combined - 65536
 
 
-
-
-def initIMU():
-
-    if (LSM9DS0):   #For BerryIMUv1
-
-        #initialise the accelerometer
-        writeACC(LSM9DS0_CTRL_REG1_XM, 0b01100111)  #z,y,x axis enabled, continuos update,  100Hz data rate
-        writeACC(LSM9DS0_CTRL_REG2_XM, 0b00100000)  #+/- 16G full scale
-
-        #initialise the magnetometer
-        writeMAG(LSM9DS0_CTRL_REG5_XM, 0b11110000)  #Temp enable, M data rate = 50Hz
-        writeMAG(LSM9DS0_CTRL_REG6_XM, 0b01100000)  #+/-12gauss
-        writeMAG(LSM9DS0_CTRL_REG7_XM, 0b00000000)  #Continuous-conversion mode
-
-        #initialise the gyroscope
-        writeGRY(LSM9DS0_CTRL_REG1_G, 0b00001111)   #Normal power mode, all axes enabled
-        writeGRY(LSM9DS0_CTRL_REG4_G, 0b00110000)   #Continuos update, 2000 dps full scale
-
-    else:       #For BerryIMUv2
-        #initialise the gyroscope
-        writeGRY(LSM9DS1_CTRL_REG4,0b00111000)      #z, y, x axis enabled for gyro
-        writeGRY(LSM9DS1_CTRL_REG1_G,0b10111000)    #Gyro ODR = 476Hz, 2000 dps
-        writeGRY(LSM9DS1_ORIENT_CFG_G,0b00111000)   #Swap orientation 
-
-        #initialise the accelerometer
-        writeACC(LSM9DS1_CTRL_REG5_XL,0b00111000)   #z, y, x axis enabled for accelerometer
-        writeACC(LSM9DS1_CTRL_REG6_XL,0b00101000)   #+/- 16g
-
-        #initialise the magnetometer
-        writeMAG(LSM9DS1_CTRL_REG1_M, 0b10011100)   #Temp compensation enabled,Low power mode mode,80Hz ODR
-        writeMAG(LSM9DS1_CTRL_REG2_M, 0b01000000)   #+/-12gauss
-        writeMAG(LSM9DS1_CTRL_REG3_M, 0b00000000)   #continuos update
-        writeMAG(LSM9DS1_CTRL_REG4_M, 0b00000000)   #lower power mode for Z axis
-
-
-
-
-
-
-
-
-
-
-
-
-
+#setting the MSB of the register address enables address auto-increment on the LSM9DS0 and the LSM9DS1 magnetometer
+#the LSM9DS1 accelerometer/gyro auto-increments through IF_ADD_INC in CTRL_REG8 instead
+AUTO_INCREMENT = 0x80
+
+#3 little endian 16 bit signed values
+unpackAxes = struct.Struct('<hhh').unpack
+unpackSample = struct.Struct('<9h').unpack
+
+#one raw 9 axis sample with its time.monotonic() timestamp in seconds, as filled in by readBatch()
+SAMPLE_DTYPE = np.dtype([('t', np.float64),
+                         ('acc', np.int16, 3),
+                         ('gyr', np.int16, 3),
+                         ('mag', np.int16, 3)])
+
+
+class Imu:
+    ''' a BerryIMU on an I2C bus, created by detectIMU()
+    The chip specific addresses and registers are bound once when the device is created, so the read functions
+    don't have to check which chip is connected on every call.
+
+    readAccel(), readGyro() and readMag() read all three axes of a sensor in a single I2C transaction.
+    The output registers of every sensor are laid out as X_L, X_H, Y_L, Y_H, Z_L, Z_H so one 6 byte block read
+    starting at the X low byte returns the whole sample. This is 3 transactions for a 9 axis sample instead of 18.
+    '''
+
+    def __init__(self, i2cBus, isLSM9DS0):
+        self.bus = i2cBus
+        self.LSM9DS0 = isLSM9DS0
+        if (isLSM9DS0):
+            self.accAddress = LSM9DS0_ACC_ADDRESS
+            self.magAddress = LSM9DS0_MAG_ADDRESS
+            self.gyrAddress = LSM9DS0_GYR_ADDRESS
+            self.accBlock = (LSM9DS0_ACC_ADDRESS, AUTO_INCREMENT | LSM9DS0_OUT_X_L_A, 6)
+            self.magBlock = (LSM9DS0_MAG_ADDRESS, AUTO_INCREMENT | LSM9DS0_OUT_X_L_M, 6)
+            self.gyrBlock = (LSM9DS0_GYR_ADDRESS, AUTO_INCREMENT | LSM9DS0_OUT_X_L_G, 6)
+            self.tempBlock = (LSM9DS0_ACC_ADDRESS, AUTO_INCREMENT | LSM9DS0_OUT_TEMP_L_XM, 2)
+            #(address, status register, new data available bit)
+            self.accStatus = (LSM9DS0_ACC_ADDRESS, LSM9DS0_STATUS_REG_A, 0b00001000)
+            self.gyrStatus = (LSM9DS0_GYR_ADDRESS, LSM9DS0_STATUS_REG_G, 0b00001000)
+            self.magStatus = (LSM9DS0_MAG_ADDRESS, LSM9DS0_STATUS_REG_M, 0b00001000)
+        else:
+            self.accAddress = LSM9DS1_ACC_ADDRESS
+            self.magAddress = LSM9DS1_MAG_ADDRESS
+            self.gyrAddress = LSM9DS1_GYR_ADDRESS
+            self.accBlock = (LSM9DS1_ACC_ADDRESS, LSM9DS1_OUT_X_L_XL, 6)
+            self.magBlock = (LSM9DS1_MAG_ADDRESS, AUTO_INCREMENT | LSM9DS1_OUT_X_L_M, 6)
+            self.gyrBlock = (LSM9DS1_GYR_ADDRESS, LSM9DS1_OUT_X_L_G, 6)
+            self.tempBlock = (LSM9DS1_GYR_ADDRESS, LSM9DS1_OUT_TEMP_L, 2)
+            self.accStatus = (LSM9DS1_GYR_ADDRESS, LSM9DS1_STATUS_REG_1, 0b00000001)
+            self.gyrStatus = (LSM9DS1_GYR_ADDRESS, LSM9DS1_STATUS_REG_1, 0b00000010)
+            self.magStatus = (LSM9DS1_MAG_ADDRESS, LSM9DS1_STATUS_REG_M, 0b00001000)
+        self.readBlock = i2cBus.read_i2c_block_data
+
+        #sensor settings, set by initIMU()
+        self.gyroODR = self.accelODR = self.magODR = None
+        self.gyroGain = self.accelGain = self.magGain = None
+
+        self.fifoPeriod = 1.0 / 476     #time between two FIFO samples, set by enableFIFO()
+        self.fifoOverruns = 0           #how many times the FIFO was full and samples were overwritten before they were read
+        self.fifoEnabled = False        #set by enableFIFO() and disableFIFO()
+        self.fifoTime = None            #timestamp of the newest sample readFIFO() returned
+        self.fifoClock = IMUTiming.SampleClock(self.fifoPeriod)     #counts the FIFO samples
+
+
+    def writeACC(self, register, value):
+        self.bus.write_byte_data(self.accAddress, register, value)
+
+    def writeMAG(self, register, value):
+        self.bus.write_byte_data(self.magAddress, register, value)
+
+    def writeGRY(self, register, value):
+        self.bus.write_byte_data(self.gyrAddress, register, value)
+
+
+    def readAccel(self):
+        '''read the x, y and z axis of the accelerometer in one transaction, returns a (x, y, z) tuple'''
+        return unpackAxes(bytes(self.readBlock(*self.accBlock)))
+
+    def readGyro(self):
+        '''read the x, y and z axis of the gyroscope in one transaction, returns a (x, y, z) tuple'''
+        return unpackAxes(bytes(self.readBlock(*self.gyrBlock)))
+
+    def readMag(self):
+        '''read the x, y and z axis of the magnetometer in one transaction, returns a (x, y, z) tuple'''
+        return unpackAxes(bytes(self.readBlock(*self.magBlock)))
+
+    def dataReady(self, status):
+        '''True when the sensor of status (accStatus, gyrStatus or magStatus) has a sample that hasn't been read'''
+        return bool(self.bus.read_byte_data(status[0], status[1]) & status[2])
+
+    def inertialReady(self):
+        '''returns (accelerometer ready, gyro ready), one status read on the LSM9DS1 where they share a register'''
+        if self.accStatus[:2] == self.gyrStatus[:2]:
+            status = self.bus.read_byte_data(self.gyrStatus[0], self.gyrStatus[1])
+            return bool(status & self.accStatus[2]), bool(status & self.gyrStatus[2])
+        return self.dataReady(self.accStatus), self.dataReady(self.gyrStatus)
+
+    def readTemperature(self):
+        '''the die temperature in degrees Celsius. The sensors give it relative to about 25 degrees, so the absolute
+        value can be a few degrees off, but it is repeatable, which is what the gyro bias table (GyroBias.py) needs'''
+        low, high = self.readBlock(*self.tempBlock)
+        if (self.LSM9DS0):
+            raw = (high & 0x0F) << 8 | low      #12 bit two's complement, 8 LSB per degree
+            if raw >= 0x800:
+                raw -= 0x1000
+            return 25 + raw / 8
+        raw = high << 8 | low                   #16 LSB per degree
+        if raw >= 0x8000:
+            raw -= 0x10000
+        return 25 + raw / 16
+
+
+    def readBatch(self, n, out=None, interval=0.0):
+        '''read n 9 axis samples into a SAMPLE_DTYPE array. out can be a preallocated array of at least n samples
+        that is reused between calls. interval is the minimum time between two samples in seconds.
+        returns the array with the n samples'''
+        if out is None:
+            out = np.empty(n, dtype=SAMPLE_DTYPE)
+        #work on the plain int16 view so every sample is a single row assignment
+        raw = out.view(np.int16).reshape(len(out), -1)[:, 4:]
+        timestamps = out['t']
+        readBlock = self.readBlock
+        accBlock = self.accBlock
+        gyrBlock = self.gyrBlock
+        magBlock = self.magBlock
+        monotonic = time.monotonic
+        nextSample = monotonic()
+        for i in range(n):
+            if interval:
+                delay = nextSample - monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                nextSample += interval
+            timestamps[i] = monotonic()
+            raw[i] = unpackSample(bytes(readBlock(*accBlock) + readBlock(*gyrBlock) + readBlock(*magBlock)))
+        return out[:n]
+
+
+    def initIMU(self, gyroODR=None, gyroFS=2000, accelODR=None, accelFS=16, magODR=None, magFS=12):
+        '''initialise the accelerometer, gyroscope and magnetometer
+        ODRs are output data rates in Hz, None selects the default rate of the chip. The full scales are in dps for the
+        gyroscope, g for the accelerometer and gauss for the magnetometer. Supported values are in the ODR and FS
+        tables at the end of this file.
+        returns (gyroGain, accelGain, magGain): the sensitivity in dps/LSB, g/LSB and gauss/LSB that goes with the full
+        scales, they are also kept on the device together with the ODRs'''
+        writeACC = self.writeACC
+        writeMAG = self.writeMAG
+        writeGRY = self.writeGRY
+
+        if (self.LSM9DS0):   #For BerryIMUv1
+            gyroODR = 95 if gyroODR is None else gyroODR
+            accelODR = 100 if accelODR is None else accelODR
+            magODR = 50 if magODR is None else magODR
+            gyroODRBits = lookupSetting(LSM9DS0_GYRO_ODR, gyroODR, "gyro ODR")
+            gyroFSBits, self.gyroGain = lookupSetting(LSM9DS0_GYRO_FS, gyroFS, "gyro full scale")
+            accelODRBits = lookupSetting(LSM9DS0_ACCEL_ODR, accelODR, "accelerometer ODR")
+            accelFSBits, self.accelGain = lookupSetting(LSM9DS0_ACCEL_FS, accelFS, "accelerometer full scale")
+            magODRBits = lookupSetting(LSM9DS0_MAG_ODR, magODR, "magnetometer ODR")
+            magFSBits, self.magGain = lookupSetting(LSM9DS0_MAG_FS, magFS, "magnetometer full scale")
+
+            #initialise the accelerometer
+            writeACC(LSM9DS0_CTRL_REG1_XM, accelODRBits << 4 | 0b0111)   #z,y,x axis enabled, continuos update, accelerometer data rate
+            writeACC(LSM9DS0_CTRL_REG2_XM, accelFSBits << 3)            #accelerometer full scale
+
+            #initialise the magnetometer
+            writeMAG(LSM9DS0_CTRL_REG5_XM, 0b11100000 | magODRBits << 2)    #Temp enable, high resolution, M data rate
+            writeMAG(LSM9DS0_CTRL_REG6_XM, magFSBits << 5)                  #magnetometer full scale
+            writeMAG(LSM9DS0_CTRL_REG7_XM, 0b00000000)                      #Continuous-conversion mode
+
+            #initialise the gyroscope
+            writeGRY(LSM9DS0_CTRL_REG1_G, gyroODRBits << 6 | 0b1111)   #gyro data rate, Normal power mode, all axes enabled
+            writeGRY(LSM9DS0_CTRL_REG4_G, gyroFSBits << 4)            #Continuos update, gyro full scale
+
+        else:       #For BerryIMUv2
+            gyroODR = 476 if gyroODR is None else gyroODR
+            accelODR = 10 if accelODR is None else accelODR     #only used when the gyro is powered down, otherwise the accelerometer runs at the gyro ODR
+            magODR = 80 if magODR is None else magODR
+            gyroODRBits = lookupSetting(LSM9DS1_GYRO_ODR, gyroODR, "gyro ODR")
+            gyroFSBits, self.gyroGain = lookupSetting(LSM9DS1_GYRO_FS, gyroFS, "gyro full scale")
+            accelODRBits = lookupSetting(LSM9DS1_ACCEL_ODR, accelODR, "accelerometer ODR")
+            accelFSBits, self.accelGain = lookupSetting(LSM9DS1_ACCEL_FS, accelFS, "accelerometer full scale")
+            magODRBits = lookupSetting(LSM9DS1_MAG_ODR, magODR, "magnetometer ODR")
+            magFSBits, self.magGain = lookupSetting(LSM9DS1_MAG_FS, magFS, "magnetometer full scale")
+            if gyroODR:
+                accelODR = gyroODR      #the accelerometer shares the gyro ODR while the gyro is on
+
+            #initialise the gyroscope
+            writeGRY(LSM9DS1_CTRL_REG4,0b00111000)                              #z, y, x axis enabled for gyro
+            writeGRY(LSM9DS1_CTRL_REG1_G, gyroODRBits << 5 | gyroFSBits << 3)   #Gyro ODR and full scale
+            writeGRY(LSM9DS1_ORIENT_CFG_G,0b00111000)                           #Swap orientation 
+            writeGRY(LSM9DS1_CTRL_REG8,0b01000100)                              #Block data update, register address auto-increment for burst reads
+
+            #initialise the accelerometer
+            writeACC(LSM9DS1_CTRL_REG5_XL,0b00111000)                           #z, y, x axis enabled for accelerometer
+            writeACC(LSM9DS1_CTRL_REG6_XL, accelODRBits << 5 | accelFSBits << 3)    #accelerometer ODR and full scale
+
+            #initialise the magnetometer
+            writeMAG(LSM9DS1_CTRL_REG1_M, 0b10000000 | magODRBits << 2)     #Temp compensation enabled,Low power mode mode, magnetometer ODR
+            writeMAG(LSM9DS1_CTRL_REG2_M, magFSBits << 5)                   #magnetometer full scale
+            writeMAG(LSM9DS1_CTRL_REG3_M, 0b00000000)                       #continuos update
+            writeMAG(LSM9DS1_CTRL_REG4_M, 0b00000000)                       #lower power mode for Z axis
+
+        self.gyroODR = gyroODR
+        self.accelODR = accelODR
+        self.magODR = magODR
+        return (self.gyroGain, self.accelGain, self.magGain)
+
+    def samplePeriod(self):
+        '''the time between two gyro samples in seconds, None before initIMU()'''
+        if not self.gyroODR:
+            return None
+        return 1.0 / self.gyroODR
+
+
+    ''' LSM9DS1 accelerometer/gyro FIFO in continuous (stream) mode.
+    The FIFO holds 32 slots of gyro + accelerometer samples at the gyro ODR, so at 476Hz it covers 67ms.
+    As long as readFIFO() is called more often than that no samples are lost, and the loop can sleep between calls
+    instead of polling one sample at a time.
+    '''
+
+    def enableFIFO(self, odr=None, threshold=31):
+        '''enable the LSM9DS1 FIFO in continuous mode. odr is the gyro output data rate in Hz, by default the one set in initIMU()
+        returns False when the IMU has no supported FIFO (LSM9DS0)'''
+        if (self.LSM9DS0):
+            print("FIFO stream mode is only supported on the BerryIMUv2 (LSM9DS1)")
+            return False
+
+        self.fifoPeriod = 1.0 / (odr or self.gyroODR)
+        self.fifoTime = None
+        self.fifoClock = IMUTiming.SampleClock(self.fifoPeriod)
+        self.writeGRY(LSM9DS1_FIFO_CTRL, 0b11000000 | (threshold & 0x1F))   #continuous mode, newest sample overwrites the oldest
+        self.writeGRY(LSM9DS1_CTRL_REG9, 0b00000010)                        #FIFO enabled, don't stop on threshold
+        self.fifoEnabled = True
+        return True
+
+    def disableFIFO(self):
+        '''switch the FIFO back to bypass mode, the output registers then hold the latest sample again'''
+        self.writeGRY(LSM9DS1_CTRL_REG9, 0b00000000)
+        self.writeGRY(LSM9DS1_FIFO_CTRL, 0b00000000)
+        self.fifoEnabled = False
+
+    def readFIFO(self):
+        '''drain all unread samples from the FIFO, oldest first.
+        returns a list of (timestamp, (GYRx, GYRy, GYRz), (ACCx, ACCy, ACCz)) tuples. The timestamps are in
+        time.monotonic() seconds and count FIFO periods: every sample is one FIFO period after the one before it, also
+        across reads, so the time between two samples is always exactly the sensor period (see IMUTiming.py). The
+        newest sample of the first read, of a read after an overrun (samples were lost) and of a read where the count
+        has drifted a whole FIFO away from the clock is stamped with the time of the read.'''
+        fifoStatus = self.bus.read_byte_data(self.gyrAddress, LSM9DS1_FIFO_SRC)
+        now = time.monotonic()
+        unread = fifoStatus & 0b00111111
+        if fifoStatus & 0b01000000:
+            self.fifoOverruns += 1
+            self.fifoTime = None
+        if unread == 0:
+            return []
+        newest = now if self.fifoTime is None else self.fifoTime + self.fifoClock.advance(unread)
+        #the sensor clock is a few percent off, once the count is a whole FIFO (32 slots) away from the time it starts again
+        if abs(newest - now) > 32 * self.fifoPeriod:
+            newest = now
+        self.fifoTime = newest
+
+        #gyro and accelerometer output registers are not adjacent (0x18 and 0x28), a burst can't cross from one to
+        #the other, so every slot takes one block read per sensor
+        samples = []
+        for i in range(unread):
+            gyr = self.readGyro()
+            acc = self.readAccel()
+            samples.append((newest - (unread - 1 - i) * self.fifoClock.period, gyr, acc))
+        return samples
+
+
+
+#the device detectIMU() found on the default bus, used by the functions below
+imu = None
+
+
+def initIMU(gyroODR=None, gyroFS=2000, accelODR=None, accelFS=16, magODR=None, magFS=12):
+    return imu.initIMU(gyroODR, gyroFS, accelODR, accelFS, magODR, magFS)
+
+def readACC():
+    return imu.readAccel()
+
+def readGYR():
+    return imu.readGyro()
+
+def readMAG():
+    return imu.readMag()
+
+def readBatch(n, out=None, interval=0.0):
+    return imu.readBatch(n, out, interval)
+
+def enableFIFO(odr=None, threshold=31):
+    return imu.enableFIFO(odr, threshold)
+
+def disableFIFO():
+    imu.disableFIFO()
+
+def readFIFO():
+    return imu.readFIFO()
+
+
+
+
+''' output data rate and full scale settings
+ODR tables map the rate in Hz to the register bits, FS tables map the full scale to (register bits, sensitivity per LSB).
+Sensitivities are from the LSM9DS0 and LSM9DS1 datasheets.
+'''
+
+LSM9DS0_GYRO_ODR = {95: 0b00, 190: 0b01, 380: 0b10, 760: 0b11}
+LSM9DS0_GYRO_FS = {245: (0b00, 0.00875), 500: (0b01, 0.0175), 2000: (0b11, 0.070)}
+LSM9DS0_ACCEL_ODR = {0: 0b0000, 3.125: 0b0001, 6.25: 0b0010, 12.5: 0b0011, 25: 0b0100, 50: 0b0101,
+                     100: 0b0110, 200: 0b0111, 400: 0b1000, 800: 0b1001, 1600: 0b1010}
+LSM9DS0_ACCEL_FS = {2: (0b000, 0.000061), 4: (0b001, 0.000122), 6: (0b010, 0.000183), 8: (0b011, 0.000244), 16: (0b100, 0.000732)}
+LSM9DS0_MAG_ODR = {3.125: 0b000, 6.25: 0b001, 12.5: 0b010, 25: 0b011, 50: 0b100, 100: 0b101}
+LSM9DS0_MAG_FS = {2: (0b00, 0.00008), 4: (0b01, 0.00016), 8: (0b10, 0.00032), 12: (0b11, 0.00048)}
+
+LSM9DS1_GYRO_ODR = {0: 0b000, 14.9: 0b001, 59.5: 0b010, 119: 0b011, 238: 0b100, 476: 0b101, 952: 0b110}
+LSM9DS1_GYRO_FS = {245: (0b00, 0.00875), 500: (0b01, 0.0175), 2000: (0b11, 0.070)}
+LSM9DS1_ACCEL_ODR = {0: 0b000, 10: 0b001, 50: 0b010, 119: 0b011, 238: 0b100, 476: 0b101, 952: 0b110}
+LSM9DS1_ACCEL_FS = {2: (0b00, 0.000061), 4: (0b10, 0.000122), 8: (0b11, 0.000244), 16: (0b01, 0.000732)}
+LSM9DS1_MAG_ODR = {0.625: 0b000, 1.25: 0b001, 2.5: 0b010, 5: 0b011, 10: 0b100, 20: 0b101, 40: 0b110, 80: 0b111}
+LSM9DS1_MAG_FS = {4: (0b00, 0.00014), 8: (0b01, 0.00029), 12: (0b10, 0.00043), 16: (0b11, 0.00058)}
+
+
+def lookupSetting(table, value, name):
+    '''look up the register setting for value, raises a ValueError listing the supported values when there is none'''
+    if value not in table:
+        raise ValueError("unsupported %s %s, use one of %s" % (name, value, sorted(table)))
+    return table[value]
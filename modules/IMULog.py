@@ -0,0 +1,86 @@
+''' binary raw IMU sample logs
+A log is a 16 byte header followed by fixed size records of IMU.SAMPLE_DTYPE (26 bytes): a float64 time.monotonic()
+timestamp and the raw int16 accelerometer, gyro and magnetometer triples. Records are appended as they are read, so a
+log of hours of samples stays small and can be memory mapped without any parsing:
+
+    log = IMULog.IMULogger("mirror.imulog", imu.LSM9DS0)
+    log.append(time.monotonic(), imu.readAccel(), imu.readGyro(), imu.readMag())
+    log.close()
+
+    samples, isLSM9DS0 = IMULog.readLog("mirror.imulog")
+    samples['gyr'][:, 0]        #all raw gyro x values
+
+IMULogger.append has the same arguments as the IMUSampler fuse callback, so a background sampler can record too, and
+replay() gives them back for OrientationEstimator.replay() (python3 leveler.py --replay mirror.imulog).
+'''
+
+import os
+import struct
+
+import numpy as np
+
+from IMU import SAMPLE_DTYPE
+
+
+MAGIC = b'HPIMULG1'
+HEADER = struct.Struct('<8sB7x')     #magic, LSM9DS0 flag, padding
+RECORD = struct.Struct('<d9h')       #the same layout as SAMPLE_DTYPE
+
+
+class IMULogger:
+
+    def __init__(self, path, isLSM9DS0=0):
+        '''create (or truncate) the log at path. isLSM9DS0 tells the replay which chip the samples are from'''
+        self.logFile = open(path, 'wb')
+        self.logFile.write(HEADER.pack(MAGIC, isLSM9DS0))
+        self.pack = RECORD.pack
+        self.write = self.logFile.write
+
+    def append(self, t, acc, gyr, mag):
+        '''append one sample, acc gyr and mag are (x, y, z) tuples of raw values'''
+        self.write(self.pack(t, *acc, *gyr, *mag))
+
+    def appendBatch(self, samples):
+        '''append a SAMPLE_DTYPE array, e.g. from IMU.readBatch()'''
+        self.write(np.ascontiguousarray(samples, dtype=SAMPLE_DTYPE).tobytes())
+
+    def flush(self):
+        self.logFile.flush()
+
+    def close(self):
+        self.logFile.close()
+
+
+def readLog(path):
+    '''memory map a log, returns (samples, isLSM9DS0) with samples a read only SAMPLE_DTYPE array'''
+    with open(path, 'rb') as logFile:
+        magic, isLSM9DS0 = HEADER.unpack(logFile.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("%s is not an IMU log" % path)
+    #a record that was cut off when the logger was interrupted is left out
+    count = (os.path.getsize(path) - HEADER.size) // SAMPLE_DTYPE.itemsize
+    if count == 0:
+        return np.empty(0, dtype=SAMPLE_DTYPE), isLSM9DS0       #an empty file can't be mapped
+    samples = np.memmap(path, dtype=SAMPLE_DTYPE, mode='r', offset=HEADER.size, shape=(count,))
+    return samples, isLSM9DS0
+
+
+def replay(path, chunkSize=4096):
+    '''the samples of a log and the chip they are from, returns (samples, isLSM9DS0) like readLog() with samples an
+    iterator of (t, acc, gyr, mag) tuples, the arguments of the IMUSampler fuse callback, as fast as they can be read.
+    The log is converted chunk by chunk, so only chunkSize samples are held as Python objects at a time'''
+    samples, isLSM9DS0 = readLog(path)
+
+    def chunks():
+        for start in range(0, len(samples), chunkSize):
+            chunk = samples[start:start + chunkSize]
+            yield from zip(chunk['t'].tolist(), chunk['acc'].tolist(), chunk['gyr'].tolist(), chunk['mag'].tolist())
+
+    return chunks(), isLSM9DS0
+
+
+def simSamples(path):
+    '''the samples of a log as a list of 9 value tuples for IMUSim.SimBus'''
+    samples, isLSM9DS0 = readLog(path)
+    raw = np.column_stack((samples['acc'], samples['gyr'], samples['mag']))
+    return [tuple(sample) for sample in raw.tolist()]
@@ -0,0 +1,130 @@
+''' background IMU sampling
+IMUSampler reads an IMU device (see IMU.detectIMU()) in a thread and keeps the last samples in a fixed size ring
+buffer, so the rest of the program never has to wait for the I2C bus:
+
+    sampler = IMUSampler.IMUSampler(IMU.detectIMU(), fuse=estimator.update)
+    sampler.start()
+    ...
+    t, acc, gyr, mag = sampler.latest()
+    pitch, roll, heading = sampler.orientation
+
+FIFOSampler drains the LSM9DS1 FIFO (see IMU.enableFIFO()) every interval instead, so every gyro sample at the full
+ODR goes into the buffer and through fuse, stamped with the FIFO timestamps.
+
+The ring buffer has a single writer (the sampling thread). The thread fills a slot first and then publishes it by
+incrementing the sample count, readers only look at slots below that count, so no lock is needed.
+'''
+
+import time
+import threading
+
+
+class IMUSampler:
+
+    def __init__(self, device, size=512, interval=0.01, fuse=None):
+        '''device: an IMU.Imu, size: number of samples kept, interval: time between samples in seconds,
+        fuse: optional function called as fuse(t, acc, gyr, mag) for every sample, its result is kept in orientation'''
+        self.device = device
+        self.size = size
+        self.interval = interval
+        self.fuse = fuse
+        self.buffer = [None] * size
+        self.count = 0              #number of samples written since start, the newest is in buffer[(count - 1) % size]
+        self.orientation = None     #latest result of fuse
+        self.running = False
+        self.thread = None
+
+
+    def start(self):
+        '''start the sampling thread'''
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''stop the sampling thread and wait for it to finish'''
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+    def run(self):
+        '''the sampling loop'''
+        device = self.device
+        buffer = self.buffer
+        size = self.size
+        fuse = self.fuse
+        monotonic = time.monotonic
+        nextSample = monotonic()
+        while self.running:
+            sample = (monotonic(), device.readAccel(), device.readGyro(), device.readMag())
+            buffer[self.count % size] = sample
+            self.count += 1
+            if fuse is not None:
+                self.orientation = fuse(*sample)
+
+            nextSample += self.interval
+            delay = nextSample - monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                nextSample = monotonic()        #fell behind, don't try to catch up
+
+
+    def latest(self):
+        '''the newest sample as a (t, (ACCx, ACCy, ACCz), (GYRx, GYRy, GYRz), (MAGx, MAGy, MAGz)) tuple, None before the first sample'''
+        count = self.count
+        if count == 0:
+            return None
+        return self.buffer[(count - 1) % self.size]
+
+    def lastN(self, n):
+        '''the newest n samples (or fewer if there aren't that many yet), oldest first'''
+        count = self.count
+        first = max(0, count - min(n, self.size))
+        samples = [self.buffer[i % self.size] for i in range(first, count)]
+        #slots that the writer reused while we were copying hold newer samples, leave those out
+        overwritten = self.count - self.size - first
+        if overwritten > 0:
+            samples = samples[overwritten:]
+        return samples
+
+    def waitForSamples(self, n, timeout=None):
+        '''block until at least n samples have been taken since start, returns False on timeout'''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.count < n:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(self.interval)
+        return True
+
+
+class FIFOSampler(IMUSampler):
+
+    def run(self):
+        '''the sampling loop, the FIFO has to be enabled (IMU.enableFIFO()) and interval below 32 gyro periods'''
+        device = self.device
+        buffer = self.buffer
+        size = self.size
+        fuse = self.fuse
+        monotonic = time.monotonic
+        nextSample = monotonic()
+        while self.running:
+            #the compass is not in the FIFO, its latest value goes with all gyro samples of this read
+            mag = device.readMag()
+            for t, gyr, acc in device.readFIFO():
+                sample = (t, acc, gyr, mag)
+                buffer[self.count % size] = sample
+                self.count += 1
+                if fuse is not None:
+                    self.orientation = fuse(*sample)
+
+            nextSample += self.interval
+            delay = nextSample - monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                nextSample = monotonic()
@@ -0,0 +1,141 @@
+''' multi rate IMU sampling
+IMUSampler reads all nine axes together at one fixed interval, so the gyro is read slower than its ODR and the
+magnetometer is read again before it has a new sample. ScheduledSampler reads every gyro sample at the gyro ODR and
+the other sensors at their own output data rates, with as few I2C transactions as possible:
+
+    LSM9DS1: the gyro and accelerometer samples are drained from the FIFO (see IMU.enableFIFO()) every FIFO_BATCH gyro
+             periods, one FIFO_SRC read for the batch and two block reads per sample.
+    LSM9DS0: there is no FIFO, the gyro data ready bit (STATUS_REG_G bit 3) is only polled when the next sample is due,
+             a POLL_LEAD part of a period after the previous one was seen, so it is nearly always ready at the first
+             poll. The wait follows the sensor, so its clock can be a few percent off the Pi's. When the thread
+             wakes up late a sample is overwritten before it is read, the periods that passed are counted from the
+             time since the previous sample, rounded to a grid of whole periods (see runPolled()).
+
+The accelerometer (LSM9DS0) and the compass are read once per period of their own ODR, without polling their status:
+a sample read twice or skipped is harmless for them, only the gyro is integrated. fuse is called for every gyro sample
+with the newest accelerometer and compass values and a timestamp that advances in whole gyro periods (see
+IMUTiming.py), one per sample unless samples were missed, so the filters integrate the gyro over the time that passed:
+
+    sampler = IMUScheduler.ScheduledSampler(imu, fuse=estimator.fuse)
+    sampler.start()
+
+On the 100kHz I2C bus of the Pi a status read takes about 0.4 ms and a 6 byte read about 0.9 ms. The FIFO costs about
+2.3 transactions per gyro sample at the 476Hz default ODR, less than the 3 block reads of a burst of all sensors, and
+keeps the bus about 70% busy. The LSM9DS0 costs one status read more than a burst at its 95Hz default, but reads
+the compass only at its own 50Hz.
+'''
+
+import time
+
+import IMUSampler
+import IMUTiming
+
+
+FIFO_BATCH = 8      #gyro periods between two FIFO drains, well within the 32 slots of the FIFO
+POLL_LEAD = 0.95    #part of a gyro period after a gyro sample at which the LSM9DS0 status is polled again
+POLL_STEP = 0.05    #part of a gyro period to wait before polling again when the gyro wasn't ready yet
+
+
+class ScheduledSampler(IMUSampler.IMUSampler):
+
+    def __init__(self, device, size=512, fuse=None):
+        '''device: an initialised IMU.Imu, size: number of samples kept, fuse: called as fuse(t, acc, gyr, mag) for
+        every gyro sample. The ring buffer, latest(), lastN() and waitForSamples() are those of IMUSampler.
+        Enables the FIFO of an LSM9DS1 unless it already is, stop() switches it off again then'''
+        self.gyroPeriod = device.samplePeriod()
+        if self.gyroPeriod is None:
+            raise ValueError("initialise the IMU (initIMU()) before scheduling it")
+        self.accPeriod = 1.0 / device.accelODR
+        self.magPeriod = 1.0 / device.magODR
+        self.ownFIFO = not device.LSM9DS0 and not device.fifoEnabled
+        self.fifo = not device.LSM9DS0 and (device.fifoEnabled or device.enableFIFO())
+        interval = self.gyroPeriod * (FIFO_BATCH if self.fifo else POLL_LEAD)
+        IMUSampler.IMUSampler.__init__(self, device, size, interval, fuse)
+
+
+    def stop(self):
+        IMUSampler.IMUSampler.stop(self)
+        if self.ownFIFO:
+            #the output registers hold the newest sample again, for reads without the FIFO
+            self.device.disableFIFO()
+            self.ownFIFO = False
+
+    def run(self):
+        '''the sampling loop'''
+        if self.fifo:
+            self.runFIFO()
+        else:
+            self.runPolled()
+
+    def add(self, sample):
+        self.buffer[self.count % self.size] = sample
+        self.count += 1
+        if self.fuse is not None:
+            self.orientation = self.fuse(*sample)
+
+    def runFIFO(self):
+        '''drain the gyro and accelerometer from the FIFO, the FIFO timestamps count gyro periods'''
+        device = self.device
+        monotonic = time.monotonic
+        mag = device.readMag()
+        nextMag = monotonic() + self.magPeriod
+        nextDrain = monotonic()
+        while self.running:
+            now = monotonic()
+            if now >= nextMag:
+                mag = device.readMag()
+                nextMag = max(nextMag + self.magPeriod, now)
+            if now >= nextDrain:
+                for t, gyr, acc in device.readFIFO():
+                    self.add((t, acc, gyr, mag))
+                nextDrain = max(nextDrain + self.interval, now)
+
+            delay = min(nextDrain, nextMag) - monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def runPolled(self):
+        '''poll the gyro data ready bit when a sample is due and count the gyro periods that passed.
+        The data ready bit doesn't tell how many samples were overwritten, so the count is the time since the previous
+        sample rounded to whole periods. The grid of whole periods the times are rounded to keeps the phase of the
+        first sample, so a wrong count after a late wake-up (a sample seen more than half a period after it came) is
+        made good by the next samples: the integrated time never drifts from the time that passed. When the sensor
+        clock is a few percent off the Pi's a sample now and then counts 0 or 2 periods for the same reason'''
+        device = self.device
+        gyrStatus = device.gyrStatus
+        monotonic = time.monotonic
+        period = self.gyroPeriod
+        clock = IMUTiming.SampleClock(period)
+        retry = period * POLL_STEP
+        t = monotonic()
+        acc = device.readAccel()
+        mag = device.readMag()
+        #clear the data ready bit, so the first sample is seen within POLL_STEP of when it came and puts the grid there
+        device.readGyro()
+        nextAcc = nextMag = t
+        nextPoll = t
+        grid = None             #the time of the previous sample, on the grid of whole periods
+        while self.running:
+            delay = nextPoll - monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if not device.dataReady(gyrStatus):
+                nextPoll = monotonic() + retry
+                continue
+            seen = monotonic()
+            gyr = device.readGyro()
+            if grid is None:
+                count = 1
+                grid = seen
+            else:
+                count = max(0, int(round((seen - grid) / period)))
+                grid += count * period
+            t += clock.advance(count)
+            if seen >= nextAcc:
+                acc = device.readAccel()
+                nextAcc = max(nextAcc + self.accPeriod, seen)
+            if seen >= nextMag:
+                mag = device.readMag()
+                nextMag = max(nextMag + self.magPeriod, seen)
+            self.add((t, acc, gyr, mag))
+            nextPoll = seen + self.interval
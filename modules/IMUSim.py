@@ -0,0 +1,192 @@
+''' simulated BerryIMU for running the IMU code without a Raspberry Pi
+SimBus is a drop in replacement for smbus.SMBus that emulates the register file of a LSM9DS0 (BerryIMUv1)
+or LSM9DS1 (BerryIMUv2). It replays a list of recorded raw samples at a fixed output data rate, so
+berryIMU.py, leveler.py and calibrateBerryIMU.py can be run and benchmarked on any Linux machine:
+
+    import IMU, IMUSim
+    IMU.setBus(IMUSim.SimBus(IMUSim.loadTrace("trace.txt"), rate=476))
+    import berryIMU
+
+A sample is a tuple of 9 raw int16 values: (ACCx, ACCy, ACCz, GYRx, GYRy, GYRz, MAGx, MAGy, MAGz)
+'''
+
+import time
+import struct
+
+from LSM9DS0 import *
+from LSM9DS1 import *
+
+
+#a level BerryIMU that is not moving, used when no trace is supplied
+STILL_SAMPLE = (0, 0, 1366, 0, 0, 0, -537, 1133, 1438)
+
+FIFO_SIZE = 32
+
+
+def loadTrace(path):
+    '''read a text trace with one sample per line (9 integers separated by spaces or commas), # starts a comment'''
+    samples = []
+    with open(path) as traceFile:
+        for line in traceFile:
+            line = line.split('#')[0].replace(',', ' ').split()
+            if len(line) == 9:
+                samples.append(tuple(int(value) for value in line))
+    return samples
+
+
+class SimBus:
+    '''smbus.SMBus compatible I2C bus with a simulated LSM9DS0 or LSM9DS1 connected to it'''
+
+    def __init__(self, samples=None, rate=476.0, chip="LSM9DS1", busSpeed=None, temperature=25.0, magRate=None):
+        '''samples: list of raw samples to replay (looped), rate: output data rate in Hz,
+        chip: "LSM9DS1" or "LSM9DS0", busSpeed: I2C clock in Hz to emulate the transfer time of every transaction (None = no delay)
+        temperature: the die temperature in degrees Celsius, see setTemperature()
+        magRate: output data rate of the magnetometer in Hz, by default rate'''
+        self.samples = list(samples) if samples else [STILL_SAMPLE]
+        self.rate = float(rate)
+        self.magRate = float(magRate or rate)
+        self.lastRead = {0: -1, 3: -1, 6: -1}      #index of the last sample read per sensor, for the data ready bits
+        self.chip = chip
+        self.busSpeed = busSpeed
+        self.startTime = time.monotonic()
+        self.fifoIndex = 0
+        self.frozenIndex = None     #keeps a block read on one sample, like the block data update of the real chip
+
+        #register files, one per I2C address. Unknown addresses raise an IOError like a real bus does
+        self.registers = {}
+        if chip == "LSM9DS0":
+            self.registers[LSM9DS0_GYR_ADDRESS] = bytearray(256)
+            self.registers[LSM9DS0_ACC_ADDRESS] = bytearray(256)
+            self.registers[LSM9DS0_GYR_ADDRESS][LSM9DS0_WHO_AM_I_G] = 0xD4
+            self.registers[LSM9DS0_ACC_ADDRESS][LSM9DS0_WHO_AM_I_XM] = 0x49
+            #(address, first output register, offset of the axes in a sample)
+            self.outputs = ((LSM9DS0_ACC_ADDRESS, LSM9DS0_OUT_X_L_A, 0),
+                            (LSM9DS0_GYR_ADDRESS, LSM9DS0_OUT_X_L_G, 3),
+                            (LSM9DS0_MAG_ADDRESS, LSM9DS0_OUT_X_L_M, 6))
+            #{(address, status register): ((data ready bit, offset of the sensor in a sample), ...)}
+            self.statusRegisters = {(LSM9DS0_GYR_ADDRESS, LSM9DS0_STATUS_REG_G): ((3, 3),),
+                                    (LSM9DS0_ACC_ADDRESS, LSM9DS0_STATUS_REG_A): ((3, 0),),
+                                    (LSM9DS0_MAG_ADDRESS, LSM9DS0_STATUS_REG_M): ((3, 6),)}
+        elif chip == "LSM9DS1":
+            self.registers[LSM9DS1_GYR_ADDRESS] = bytearray(256)
+            self.registers[LSM9DS1_MAG_ADDRESS] = bytearray(256)
+            self.registers[LSM9DS1_GYR_ADDRESS][LSM9DS1_WHO_AM_I_XG] = 0x68
+            self.registers[LSM9DS1_MAG_ADDRESS][LSM9DS1_WHO_AM_I_M] = 0x3D
+            self.registers[LSM9DS1_GYR_ADDRESS][LSM9DS1_CTRL_REG8] = 0b00000100
+            self.outputs = ((LSM9DS1_ACC_ADDRESS, LSM9DS1_OUT_X_L_XL, 0),
+                            (LSM9DS1_GYR_ADDRESS, LSM9DS1_OUT_X_L_G, 3),
+                            (LSM9DS1_MAG_ADDRESS, LSM9DS1_OUT_X_L_M, 6))
+            self.statusRegisters = {(LSM9DS1_GYR_ADDRESS, LSM9DS1_STATUS_REG_1): ((0, 0), (1, 3)),
+                                    (LSM9DS1_MAG_ADDRESS, LSM9DS1_STATUS_REG_M): ((3, 6),)}
+        else:
+            raise ValueError("unknown chip %s" % chip)
+        self.setTemperature(temperature)
+
+    def setTemperature(self, temperature):
+        '''set the die temperature the temperature registers report'''
+        if self.chip == "LSM9DS0":
+            raw = int(round((temperature - 25) * 8)) & 0xFFF
+            registers, low = self.registers[LSM9DS0_ACC_ADDRESS], LSM9DS0_OUT_TEMP_L_XM
+        else:
+            raw = int(round((temperature - 25) * 16)) & 0xFFFF
+            registers, low = self.registers[LSM9DS1_GYR_ADDRESS], LSM9DS1_OUT_TEMP_L
+        registers[low] = raw & 0xFF
+        registers[low + 1] = raw >> 8
+
+
+    def sampleIndex(self):
+        '''index of the sample the simulated sensor is currently outputting'''
+        if self.frozenIndex is not None:
+            return self.frozenIndex
+        return int((time.monotonic() - self.startTime) * self.rate)
+
+    def outputIndex(self, offset):
+        '''index of the sample the sensor at offset (0 accelerometer, 3 gyro, 6 magnetometer) is outputting'''
+        index = self.sampleIndex()
+        if offset == 6:
+            return int(index * self.magRate / self.rate)
+        return index
+
+    def fifoEnabled(self):
+        if self.chip != "LSM9DS1":
+            return False
+        xg = self.registers[LSM9DS1_GYR_ADDRESS]
+        return (xg[LSM9DS1_CTRL_REG9] & 0b00000010) and (xg[LSM9DS1_FIFO_CTRL] & 0b11100000)
+
+    def fifoUnread(self):
+        '''number of unread FIFO slots, drops the oldest samples when the FIFO overflowed'''
+        current = self.sampleIndex()
+        overrun = current - self.fifoIndex > FIFO_SIZE
+        if overrun:
+            self.fifoIndex = current - FIFO_SIZE
+        return current - self.fifoIndex, overrun
+
+    def transfer(self, nBytes):
+        '''emulate the time a transaction takes on the wire: address, register, address + data bytes'''
+        if self.busSpeed:
+            time.sleep((3 + nBytes) * 9 / self.busSpeed)
+
+    def readRegister(self, address, register):
+        registers = self.registers.get(address)
+        if registers is None:
+            raise IOError(121, "Remote I/O error")
+        register &= 0x7F        #the auto-increment flag is not part of the address
+
+        for outAddress, outRegister, offset in self.outputs:
+            if address == outAddress and outRegister <= register < outRegister + 6:
+                index = self.outputIndex(offset)
+                self.lastRead[offset] = index
+                if self.fifoEnabled() and offset < 6:
+                    index = self.fifoIndex
+                    #a FIFO slot is popped once the last accelerometer byte has been read
+                    if offset == 0 and register == outRegister + 5 and index < self.sampleIndex():
+                        self.fifoIndex += 1
+                sample = self.samples[index % len(self.samples)]
+                axis = (register - outRegister) // 2
+                raw = struct.pack('<h', sample[offset + axis])
+                return raw[(register - outRegister) % 2]
+
+        if self.chip == "LSM9DS1" and address == LSM9DS1_GYR_ADDRESS and register == LSM9DS1_FIFO_SRC:
+            unread, overrun = self.fifoUnread()
+            return (0b01000000 if overrun else 0) | min(unread, FIFO_SIZE)
+
+        #the data ready bits are set while the sensor has a sample that hasn't been read
+        status = self.statusRegisters.get((address, register))
+        if status is not None:
+            value = 0
+            for bit, offset in status:
+                if self.outputIndex(offset) != self.lastRead[offset]:
+                    value |= 1 << bit
+            return value
+        return registers[register]
+
+
+    #smbus interface
+
+    def read_byte_data(self, address, register):
+        self.transfer(1)
+        return self.readRegister(address, register)
+
+    def write_byte_data(self, address, register, value):
+        self.transfer(1)
+        registers = self.registers.get(address)
+        if registers is None:
+            raise IOError(121, "Remote I/O error")
+        registers[register & 0x7F] = value & 0xFF
+        if self.chip == "LSM9DS1" and address == LSM9DS1_GYR_ADDRESS and register in (LSM9DS1_CTRL_REG9, LSM9DS1_FIFO_CTRL):
+            self.fifoIndex = self.sampleIndex()     #(re)starting the FIFO empties it
+
+    def read_i2c_block_data(self, address, register, length):
+        self.transfer(length)
+        if self.chip == "LSM9DS1" and address == LSM9DS1_GYR_ADDRESS:
+            autoIncrement = self.registers[address][LSM9DS1_CTRL_REG8] & 0b00000100
+        else:
+            autoIncrement = register & 0x80
+        register &= 0x7F
+        self.frozenIndex = self.sampleIndex()
+        try:
+            if autoIncrement:
+                return [self.readRegister(address, register + i) for i in range(length)]
+            return [self.readRegister(address, register) for i in range(length)]
+        finally:
+            self.frozenIndex = None
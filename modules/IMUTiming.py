@@ -0,0 +1,63 @@
+''' sample timing for the IMU filters
+The gyro angles are integrated over the time between two samples. Measuring that time with the Python clock measures
+the loop jitter, not the sensor: the sensor makes a new sample every 1/ODR seconds. SampleClock counts sensor samples
+instead, advance(count) returns the time count new samples take, so dt is always a whole number of sensor periods.
+Count one sample for every gyro data ready bit, or the unread count of the FIFO:
+
+    clock = IMUTiming.SampleClock(imu.samplePeriod())
+    while True:
+        if imu.inertialReady()[1]:
+            gyr = imu.readGyro()
+            dt = clock.advance(1)
+
+When a loop reads the newest sample without knowing how many it missed (berryIMU without the FIFO), tick() is the
+fallback: it turns the time between two ticks into whole sensor periods, dt 0 when the same sample is read again and
+the number of skipped samples times the period when the loop stalls. The part of a period that is left over is
+carried to the next tick, so the sum of the dts never drifts from the time that has passed, but the single dts jitter
+by a period. Without a period (the ODR isn't known) tick() returns the time.monotonic_ns() difference.
+'''
+
+import time
+
+
+class SampleClock:
+
+    def __init__(self, period=None):
+        '''period: the time between two sensor samples in seconds, None to use the monotonic clock only'''
+        self.periodNs = None if not period else int(round(period * 1000000000))
+        self.period = None if not period else self.periodNs / 1000000000
+        self.last = None
+        self.pending = 0            #nanoseconds since the last whole sensor period
+        self.samples = 0            #sensor periods counted since the first tick
+
+    def reset(self):
+        '''start over, the next tick() returns 0'''
+        self.last = None
+        self.pending = 0
+
+    def tick(self):
+        '''the time in seconds the sensor advanced since the previous tick, 0 on the first call. For loops that can't
+        count the samples, see advance()'''
+        now = time.monotonic_ns()
+        last = self.last
+        self.last = now
+        if last is None:
+            return 0.0
+        elapsed = now - last
+        if self.periodNs is None:
+            return elapsed / 1000000000
+        self.pending += elapsed
+        count = self.pending // self.periodNs
+        self.pending -= count * self.periodNs
+        self.samples += count
+        return count * self.period
+
+    def advance(self, count):
+        '''the time in seconds count new sensor samples take, count from the data ready bits or the FIFO.
+        A tick() after it starts from now'''
+        if self.period is None:
+            raise ValueError("advance() needs the sample period")
+        self.last = time.monotonic_ns()
+        self.pending = 0
+        self.samples += count
+        return count * self.period
@@ -0,0 +1,86 @@
+''' ellipsoid fit compass calibration
+A perfect compass turned in all directions measures points on a sphere around 0. Hard iron (magnetised parts near the
+IMU) moves the centre, soft iron (iron that bends the field) and differences between the axes stretch and turn the
+sphere into an ellipsoid. fitEllipsoid() fits that ellipsoid through the raw samples and returns the offset and the
+3x3 soft iron matrix that turn it back into a sphere:
+
+    calibrated = matrix @ (raw - offset)
+
+The result is kept in a profile file (JSON) that berryIMU.py loads once when an OrientationEstimator is created,
+calibrateBerryIMU.py writes it. The sphere has the mean radius of the ellipsoid, so the calibrated values are in
+the same range as the raw ones.
+'''
+
+import json
+
+import numpy as np
+
+
+#the sphere of directions is split in BANDS bands of equal area (equal steps in z) of SECTORS sectors each
+BANDS = 8
+SECTORS = 16
+
+
+def fitEllipsoid(samples):
+    '''fit an ellipsoid through an (n, 3) array of raw magnetometer samples, at least 9 in different directions.
+    returns (offset, matrix, residual): the centre (3,), the soft iron matrix (3, 3) and the rms distance of the
+    calibrated samples from the sphere, relative to its radius'''
+    samples = np.asarray(samples, dtype=np.float64)
+    if len(samples) < 9:
+        raise ValueError("an ellipsoid fit needs at least 9 samples, got %i" % len(samples))
+    #a x^2 + b y^2 + c z^2 + 2f yz + 2g xz + 2h xy + 2p x + 2q y + 2r z = 1, solved for the 9 coefficients
+    #the samples are centred and scaled first to keep the least squares problem well conditioned
+    mean = samples.mean(axis=0)
+    scale = np.abs(samples - mean).max()
+    if scale == 0:
+        raise ValueError("all samples are the same, turn the IMU in all directions")
+    x, y, z = ((samples - mean) / scale).T
+    design = np.column_stack((x * x, y * y, z * z, 2 * y * z, 2 * x * z, 2 * x * y, 2 * x, 2 * y, 2 * z))
+    a, b, c, f, g, h, p, q, r = np.linalg.lstsq(design, np.ones(len(samples)), rcond=None)[0]
+
+    quadric = np.array([[a, h, g], [h, b, f], [g, f, c]])
+    linear = np.array([p, q, r])
+    centre = -np.linalg.solve(quadric, linear)
+    shape = quadric / (1 + centre @ quadric @ centre)        #(v - centre)^T shape (v - centre) = 1 on the ellipsoid
+    eigenvalues, axes = np.linalg.eigh(shape)
+    if eigenvalues.min() <= 0:
+        raise ValueError("the samples don't lie on an ellipsoid, turn the IMU in all directions")
+
+    radii = 1 / np.sqrt(eigenvalues)
+    radius = np.prod(radii) ** (1 / 3)
+    matrix = axes @ np.diag(np.sqrt(eigenvalues) * radius) @ axes.T
+    offset = centre * scale + mean
+
+    distances = np.linalg.norm((samples - offset) @ matrix.T, axis=1)
+    residual = np.sqrt(np.mean((distances / (radius * scale) - 1) ** 2))
+    return offset, matrix, residual
+
+
+def coverage(samples, centre):
+    '''the part (0-1) of all directions around centre the samples point to, in BANDS x SECTORS cells of equal area'''
+    directions = np.asarray(samples, dtype=np.float64) - centre
+    norms = np.linalg.norm(directions, axis=1)
+    directions = directions[norms > 0] / norms[norms > 0, None]
+    band = np.clip(((directions[:, 2] + 1) / 2 * BANDS).astype(int), 0, BANDS - 1)
+    sector = ((np.arctan2(directions[:, 1], directions[:, 0]) + np.pi) / (2 * np.pi) * SECTORS).astype(int) % SECTORS
+    return len(np.unique(band * SECTORS + sector)) / (BANDS * SECTORS)
+
+
+def saveProfile(path, offset, matrix, **info):
+    '''write a calibration profile, info (e.g. samples, coverage, residual) is stored along for reference'''
+    profile = {'offset': [float(value) for value in offset],
+               'matrix': [[float(value) for value in row] for row in matrix]}
+    profile.update(info)
+    with open(path, 'w') as profileFile:
+        json.dump(profile, profileFile, indent=4)
+
+
+def loadProfile(path):
+    '''read a calibration profile, returns ((x, y, z) offset, 3x3 matrix as a tuple of row tuples)'''
+    with open(path) as profileFile:
+        profile = json.load(profileFile)
+    offset = tuple(float(value) for value in profile['offset'])
+    matrix = tuple(tuple(float(value) for value in row) for row in profile['matrix'])
+    if len(offset) != 3 or len(matrix) != 3 or any(len(row) != 3 for row in matrix):
+        raise ValueError("%s is not a compass calibration profile" % path)
+    return offset, matrix
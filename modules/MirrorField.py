@@ -0,0 +1,133 @@
+''' aim a whole field of mirrors at their targets
+SunMirrors.py aims one mirror at the sun, with one python process and one sun transformation per mirror. MirrorField
+aims N mirrors at N target points at once: a mirror reflects the sun onto its target when its normal is halfway
+between the direction of the sun and the direction of the target (the bisector),
+
+    normal = normalize(sun + target)
+
+for all mirrors in a few NumPy operations, so hundreds of mirrors take well under a millisecond per sun position:
+
+    field = MirrorField.MirrorField(positions, targets, headings)
+    yaw, pitch = field.stepperAngles(sunalt, sunaz)     #arrays of N angles for fruitStepper4, degrees
+
+Positions and targets are (east, north, up) in metres from any point of the site, the same target can be given once
+for all mirrors. The heading of a mirror is the compass direction its yaw stepper points at after /zeroYaw, 180
+(south) when the base was zeroed like the trackers do, so with the target at the sun the angles are the sunaz - 180
+and sunalt - 90 of SunTracker.py. sunalt and sunaz can be arrays of T sun positions too, the angles are then (T, N).
+A mirror whose target is exactly opposite the sun has no normal, its angles are nan or meaningless.
+
+Run as a script it drives the field from a layout file with one sun ephemeris (see SunPosition.py) for all mirrors:
+
+    python3 MirrorField.py --field field.json --interval 60 --sunBackend PSA
+
+    {"mirrors": [{"position": [0, 0, 0], "target": [0, 20, 5], "heading": 180, "address": "192.168.1.21:8000"}, ...]}
+'''
+
+import json
+import math
+import argparse
+
+import numpy as np
+
+import SunPosition
+
+
+MIRROR_HEADING = 180.0      #compass direction of yaw 0 when a mirror doesn't have its own heading
+
+
+class MirrorField:
+
+    def __init__(self, positions, targets, headings=None):
+        '''positions: (N, 3) mirror centres (east, north, up) in metres, (N, 2) for mirrors at height 0.
+        targets: (N, 3) points the mirrors reflect the sun to, or one (3,) point for all of them.
+        headings: N compass headings of yaw 0 in degrees, or one for all, by default MIRROR_HEADING'''
+        positions = np.asarray(positions, dtype=np.float64)
+        if positions.ndim != 2 or positions.shape[1] not in (2, 3):
+            raise ValueError("mirror positions have to be an (N, 3) or (N, 2) array")
+        if positions.shape[1] == 2:
+            positions = np.column_stack((positions, np.zeros(len(positions))))
+        targets = np.broadcast_to(np.asarray(targets, dtype=np.float64), positions.shape)
+        self.positions = positions
+        self.targets = targets
+        self.headings = np.broadcast_to(np.asarray(MIRROR_HEADING if headings is None else headings, dtype=np.float64),
+                                        (len(positions),))
+
+        #the targets don't move, so their directions are computed once
+        toTarget = targets - positions
+        distance = np.linalg.norm(toTarget, axis=1)
+        if np.any(distance == 0):
+            raise ValueError("a mirror is at its own target")
+        self.targetDirections = toTarget / distance[:, np.newaxis]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def normals(self, sunalt, sunaz):
+        '''the (..., N, 3) unit normals (east, north, up) of all mirrors for sun altitudes and azimuths in degrees'''
+        sun = np.stack(SunPosition.directions(sunalt, sunaz), axis=-1)[..., np.newaxis, :]
+        bisector = sun + self.targetDirections
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return bisector / np.linalg.norm(bisector, axis=-1, keepdims=True)
+
+    def stepperAngles(self, sunalt, sunaz):
+        '''the (yaw, pitch) stepper angles in degrees of all mirrors, yaw between -180 and 180 from the heading of a
+        mirror, pitch the altitude of the normal - 90'''
+        normals = self.normals(sunalt, sunaz)
+        normalAlt = np.degrees(np.arcsin(np.clip(normals[..., 2], -1, 1)))
+        normalAz = np.degrees(np.arctan2(normals[..., 0], normals[..., 1]))
+        yaw = (normalAz - self.headings + 180) % 360 - 180
+        return yaw, normalAlt - 90
+
+
+def loadField(path):
+    '''read a field layout (see the top of this file), returns (MirrorField, [addresses as "host:port"])'''
+    with open(path) as fieldFile:
+        mirrors = json.load(fieldFile)['mirrors']
+    if not mirrors:
+        raise ValueError("%s has no mirrors" % path)
+    field = MirrorField([mirror['position'] for mirror in mirrors], [mirror['target'] for mirror in mirrors],
+                        [mirror.get('heading', MIRROR_HEADING) for mirror in mirrors])
+    return field, [mirror.get('address') for mirror in mirrors]
+
+
+if __name__ == "__main__":
+    import time as t
+
+    import liblo
+
+    parser = argparse.ArgumentParser(description="aim a field of mirrors at their targets")
+    parser.add_argument('--field', metavar="field", type=str, required=True, help="field layout (JSON) with the mirrors, their targets and addresses")
+    parser.add_argument('--interval', metavar="interval", type=float, default=60.0, help="interval in seconds between sun position updates")
+    parser.add_argument('--lat', metavar="lat", type=float, default=None, help="latitude of the field, from the GPS when omitted")
+    parser.add_argument('--lon', metavar="lon", type=float, default=None, help="longitude of the field, from the GPS when omitted")
+    parser.add_argument('--sunBackend', metavar="sunBackend", type=str, default=None, help="ASTROPY or PSA, see SunPosition.BACKENDS")
+    args = parser.parse_args()
+
+    field, addresses = loadField(args.field)
+    targets = [liblo.Address(*address.split(":")) if address else None for address in addresses]
+    print("%i mirrors, %i with an address" % (len(field), sum(target is not None for target in targets)))
+
+    if args.lat is None or args.lon is None:
+        import MirrorGPS
+        #the GPS sets the system clock too, the updates use it
+        gps = MirrorGPS.getGPSinfo()
+        args.lon = float(gps[2]) / 100
+        args.lat = float(gps[4]) / 100
+    print("lon: %f" % args.lon)
+    print("lat: %f" % args.lat)
+
+    ephemeris = SunPosition.DayEphemeris(args.lat, args.lon, t.time(), backend=args.sunBackend)
+    while(True):
+        sunalt, sunaz = ephemeris.altaz(t.time())
+        if sunalt > 0:
+            started = t.perf_counter()
+            yaw, pitch = field.stepperAngles(sunalt, sunaz)
+            solved = t.perf_counter() - started
+            for target, mirrorYaw, mirrorPitch in zip(targets, yaw.tolist(), pitch.tolist()):
+                if target is not None and not math.isnan(mirrorYaw):
+                    liblo.send(target, "/angleYaw", mirrorYaw, 1)
+                    liblo.send(target, "/anglePitch", mirrorPitch, 1)
+            print("sun %.2f, %.2f: %i mirrors aimed in %.2f ms" % (sunalt, sunaz, len(field), solved * 1000))
+        else:
+            print("sun below the horizon (%.2f)" % sunalt)
+        t.sleep(args.interval)
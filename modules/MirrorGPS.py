@@ -138,3 +138,11 @@ def getGPSinfo():
     
     
     
+
+
+def gpsUnixTime(gpsDate, gpsTime):
+    "seconds since 1970 (UTC) of the date and time strings getGPSinfo() returns, without astropy"
+    when = datetime.datetime.fromisoformat(gpsDate + "T" + gpsTime)
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return when.timestamp()
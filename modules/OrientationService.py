@@ -0,0 +1,152 @@
+''' orientation daemon
+Keeps a berryIMU.OrientationEstimator running in the background and serves its pitch, roll and heading over OSC, so
+the filters stay warm and the trackers don't have to initialise and settle the IMU on every start.
+Start it once, e.g. next to fruitStepper4.py:
+
+    python3 OrientationService.py --port 8001 --rate 10
+
+OSC messages it understands:
+/orientation
+    replies /orientation pitch (float) roll (float) heading (float) converged (int) to the sender
+/subscribe
+    the sender gets the /orientation message rate times per second from now on
+/unsubscribe
+    stop sending to the sender
+
+With --target host:port the /orientation messages are also sent to fixed addresses.
+The heading is the magnetic heading, like berryIMU.getValues(). converged is 1 once the values are stable (see
+berryIMU.ConvergenceMonitor). queryOrientation() asks a running daemon for the values, that is what the trackers use.
+'''
+
+import time
+import argparse
+import threading
+
+import liblo
+
+
+ORIENTATION_PORT = 8001     #default UDP port of the daemon, fruitStepper4 uses 8000
+QUERY_TIMEOUT = 0.5         #seconds queryOrientation() waits for the reply
+
+
+class OrientationService:
+
+    def __init__(self, estimator, port=ORIENTATION_PORT, rate=10.0, targets=()):
+        '''estimator: a berryIMU.OrientationEstimator that hasn't been started, rate: /orientation messages per second
+        to the subscribers, targets: addresses ("host:port" or liblo.Address) that always get them'''
+        self.estimator = estimator
+        self.port = port
+        self.rate = rate
+        self.targets = [target if isinstance(target, liblo.Address) else liblo.Address(*target.split(":")) for target in targets]
+        self.subscribers = {}       #{url: liblo.Address}, changed by the OSC server thread
+        self.subscribersLock = threading.Lock()
+        self.server = None
+        self.running = False
+
+
+    def start(self, interval=0.03, scheduled=True):
+        '''start the IMU, the background measurements and the OSC server. scheduled: measure every gyro sample (see
+        IMUScheduler.py), interval is only used without it'''
+        self.estimator.start()
+        self.estimator.startBackground(interval, scheduled)
+        #the monitor stays on so converged() tells whether the current values are stable, its window is converted to
+        #the sample period startBackground() set
+        self.estimator.monitor = self.estimator.convergenceMonitor()
+
+        self.server = liblo.ServerThread(self.port)
+        self.server.add_method('/orientation', None, self.orientation_cb)
+        self.server.add_method('/subscribe', None, self.subscribe_cb)
+        self.server.add_method('/unsubscribe', None, self.unsubscribe_cb)
+        self.server.start()
+        print("orientation service on port", self.server.port)
+
+    def stop(self):
+        self.running = False
+        if self.server is not None:
+            self.server.stop()
+            self.server.free()
+            self.server = None
+        self.estimator.stopBackground()
+
+
+    def message(self):
+        '''the /orientation arguments: pitch, roll, heading and 1 if converged'''
+        pitch, roll, heading = self.estimator.getValues()
+        converged = 1 if self.estimator.monitor.converged() else 0
+        return float(pitch), float(roll), float(heading), converged
+
+    def orientation_cb(self, path, args, types, src):
+        self.server.send(src, '/orientation', *self.message())
+
+    def subscribe_cb(self, path, args, types, src):
+        print("subscribed %s" % src.url)
+        with self.subscribersLock:
+            self.subscribers[src.url] = src
+
+    def unsubscribe_cb(self, path, args, types, src):
+        with self.subscribersLock:
+            self.subscribers.pop(src.url, None)
+
+
+    def run(self):
+        '''publish the orientation to the targets and subscribers rate times per second until stop()'''
+        self.running = True
+        nextMessage = time.monotonic()
+        while self.running:
+            message = self.message()
+            #the OSC server thread (un)subscribes while this runs, send to a copy
+            with self.subscribersLock:
+                subscribers = list(self.subscribers.values())
+            for target in self.targets + subscribers:
+                self.server.send(target, '/orientation', *message)
+
+            nextMessage += 1 / self.rate
+            delay = nextMessage - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                nextMessage = time.monotonic()
+
+
+def queryOrientation(host="127.0.0.1", port=ORIENTATION_PORT, timeout=QUERY_TIMEOUT, converged=True):
+    '''ask a running orientation daemon for (pitch, roll, heading).
+    returns None when there is no reply within timeout seconds, or when converged is set and the daemon's values
+    are not stable yet'''
+    replies = []
+    server = liblo.Server()         #any free port, the daemon replies to it
+    server.add_method('/orientation', None, lambda path, args: replies.append(args))
+    server.send(liblo.Address(host, port), '/orientation')
+    deadline = time.monotonic() + timeout
+    while not replies:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        server.recv(int(remaining * 1000) + 1)
+    server.free()
+
+    if not replies:
+        print("no orientation daemon on %s:%i" % (host, port))
+        return None
+    pitch, roll, heading, isConverged = replies[0]
+    if converged and not isConverged:
+        print("the orientation daemon has not converged yet")
+        return None
+    return pitch, roll, heading
+
+
+if __name__ == "__main__":
+    import berryIMU
+
+    parser = argparse.ArgumentParser(description="orientation daemon, serves the BerryIMU orientation over OSC")
+    parser.add_argument('--port', metavar="port", type=int, default=ORIENTATION_PORT, help="port for receiving osc messages")
+    parser.add_argument('--rate', metavar="rate", type=float, default=10.0, help="/orientation messages per second to subscribers")
+    parser.add_argument('--target', metavar="host:port", type=str, nargs='*', default=[], help="always send /orientation to these addresses")
+    parser.add_argument('--fusion', metavar="fusion", type=str, default=None, help="CF, MADGWICK or MAHONY, see berryIMU.FUSION")
+    args = parser.parse_args()
+
+    service = OrientationService(berryIMU.OrientationEstimator(fusion=args.fusion), args.port, args.rate, args.target)
+    service.start()
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        service.stop()
@@ -0,0 +1,57 @@
+''' sun position with the PSA algorithm, NumPy only
+The algorithm of the Plataforma Solar de Almeria (Blanco-Muriel et al., "Computing the solar vector", Solar Energy
+70(5), 2001) computes the topocentric sun position from the time and the site with a few dozen floating point
+operations. It is accurate to about 0.5 arc minutes (0.008 degrees), a few times better than a mirror can be aimed,
+and loads in milliseconds where astropy takes seconds and tens of MB on a Pi. The fit was made for 1999-2015, the
+error grows slowly outside those years (see benchmarkSun.py for the error against astropy).
+
+psaAltAz() has the backend signature of SunPosition.DayEphemeris and is vectorized over the times:
+
+    alt, az = SolarPSA.psaAltAz(lat, lon, unixTimes)
+    ephemeris = SunPosition.DayEphemeris(lat, lon, suntime, backend=SolarPSA.psaAltAz)
+
+There is no atmospheric refraction, like the astropy AltAz without pressure the trackers use.
+'''
+
+import numpy as np
+
+
+EARTH_MEAN_RADIUS = 6371.01         #km
+ASTRONOMICAL_UNIT = 149597890.0     #km
+
+
+def psaAltAz(lat, lon, unixTimes, height=0):
+    '''the sun altitude and azimuth in degrees at unixTimes (number or array, UTC seconds since 1970) for a site at
+    lat, lon in degrees. height is not used, it only changes the parallax by less than a millionth of a degree'''
+    t = np.asarray(unixTimes, dtype=np.float64)
+    #days since 2000-01-01 12:00 UT (J2000)
+    n = t / 86400.0 + 2440587.5 - 2451545.0
+    decimalHours = (t % 86400.0) / 3600.0
+
+    #ecliptic coordinates
+    omega = 2.1429 - 0.0010394594 * n
+    meanLongitude = 4.8950630 + 0.017202791698 * n
+    meanAnomaly = 6.2400600 + 0.0172019699 * n
+    eclipticLongitude = (meanLongitude + 0.03341607 * np.sin(meanAnomaly) + 0.00034894 * np.sin(2 * meanAnomaly)
+                         - 0.0001134 - 0.0000203 * np.sin(omega))
+    eclipticObliquity = 0.4090928 - 6.2140e-9 * n + 0.0000396 * np.cos(omega)
+
+    #celestial coordinates, right ascension and declination
+    sinEclipticLongitude = np.sin(eclipticLongitude)
+    rightAscension = np.arctan2(np.cos(eclipticObliquity) * sinEclipticLongitude, np.cos(eclipticLongitude))
+    declination = np.arcsin(np.sin(eclipticObliquity) * sinEclipticLongitude)
+
+    #local coordinates
+    greenwichMeanSiderealTime = 6.6974243242 + 0.0657098283 * n + decimalHours
+    localMeanSiderealTime = np.radians(greenwichMeanSiderealTime * 15 + lon)
+    hourAngle = localMeanSiderealTime - rightAscension
+    latitude = np.radians(lat)
+    cosLatitude = np.cos(latitude)
+    sinLatitude = np.sin(latitude)
+    cosHourAngle = np.cos(hourAngle)
+    zenith = np.arccos(np.clip(cosLatitude * cosHourAngle * np.cos(declination) + np.sin(declination) * sinLatitude, -1, 1))
+    azimuth = np.arctan2(-np.sin(hourAngle), np.tan(declination) * cosLatitude - sinLatitude * cosHourAngle)
+    #parallax, the sun seen from the surface instead of the centre of the earth
+    zenith = zenith + EARTH_MEAN_RADIUS / ASTRONOMICAL_UNIT * np.sin(zenith)
+
+    return 90.0 - np.degrees(zenith), np.degrees(azimuth) % 360
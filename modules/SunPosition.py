@@ -0,0 +1,182 @@
+''' sun positions for the trackers
+Transforming the sun position to altitude / azimuth with astropy takes hundreds of milliseconds on a Pi. DayEphemeris
+computes the positions for a whole day in one vectorized call and interpolates between them:
+
+    ephemeris = SunPosition.DayEphemeris(lat, lon, suntime)
+    sunalt, sunaz = ephemeris.altaz(suntime)        #degrees, astropy Time or unix seconds (also arrays)
+
+The table has a point every EPHEMERIS_STEP seconds and is rebuilt when asked for a time it doesn't cover.
+The interpolation is cubic (Catmull-Rom) on the east, north and up components of the direction of the sun, which are
+smooth all day, so an azimuth that passes north (360 -> 0) or turns fast close to the zenith needs no special care.
+With the default 10 minute step the direction is within 0.0001 degrees of the backend at any latitude and time of
+year (checked against a reference solar model over a year at latitudes 0 to 66). The azimuth alone can be off more
+close to the zenith, where a tiny change of direction is a large change of azimuth. errorEstimate() checks a table
+against itself.
+
+The table comes from a backend, set with SUN_BACKEND or the backend argument: "ASTROPY" (get_sun / AltAz) or "PSA",
+the NumPy implementation of the PSA algorithm in SolarPSA.py, which is within 0.01 degrees of astropy and doesn't need
+astropy at all (see benchmarkSun.py). astropy is only imported when the ASTROPY backend builds its first table, so
+the trackers start in a fraction of a second with the PSA backend.
+
+astropy needs the IERS earth orientation table for the transformation to altitude / azimuth. It never downloads it
+here, a field unit often has no network and the download attempts stall the start. The table is read from
+IERS_TABLE, seed it with seedIERS.py while there is network. Without it astropy uses the table it comes with, which
+has no UT1 values for recent dates (UT1 - UTC is below 0.9 s, that is 0.004 degrees of sun position).
+'''
+
+import os
+
+import numpy as np
+
+import SolarPSA
+
+
+EPHEMERIS_STEP = 600        #seconds between two points of the table
+EPHEMERIS_HOURS = 26        #hours a table covers, from the time it is built for
+SUN_BACKEND = "ASTROPY"     # "ASTROPY" or "PSA", see BACKENDS
+IERS_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "finals2000A.all")   #local IERS-A table, see seedIERS.py
+
+astropyConfigured = False
+siteFrames = {}             #{(lat, lon, height): [EarthLocation, times key, AltAz frame]}
+
+
+def configureAstropy():
+    '''no IERS downloads, use the local IERS_TABLE when it exists. Done once, before the first astropy transformation'''
+    global astropyConfigured
+    if astropyConfigured:
+        return
+    astropyConfigured = True
+    from astropy.utils import iers
+    iers.conf.auto_download = False
+    iers.conf.auto_max_age = None
+    if hasattr(iers.conf, 'iers_degraded_accuracy'):
+        #times past the end of the table get a warning instead of an error
+        iers.conf.iers_degraded_accuracy = 'warn'
+    if IERS_TABLE and os.path.exists(IERS_TABLE):
+        try:
+            table = iers.IERS_Auto.read(IERS_TABLE)
+        except Exception as error:
+            print("could not read the IERS table %s: %s" % (IERS_TABLE, error))
+            return
+        table.meta['data_path'] = IERS_TABLE
+        table.meta['data_url'] = IERS_TABLE
+        iers.earth_orientation_table.set(table)
+    else:
+        print("no IERS table %s, using the one astropy comes with (run seedIERS.py)" % IERS_TABLE)
+
+
+def astropyAltAz(lat, lon, unixTimes, height=0):
+    '''the sun altitude and azimuth in degrees at unixTimes (array) for a site, in one astropy call.
+    The EarthLocation of a site is made once, its AltAz frame is reused for the same times'''
+    configureAstropy()
+    from astropy.coordinates import EarthLocation, AltAz, get_sun
+    from astropy.time import Time
+
+    unixTimes = np.atleast_1d(np.asarray(unixTimes, dtype=np.float64))
+    times = Time(unixTimes, format='unix')
+    site = siteFrames.get((lat, lon, height))
+    if site is None:
+        site = siteFrames[(lat, lon, height)] = [EarthLocation.from_geodetic(lat=lat, lon=lon, height=height), None, None]
+    key = (unixTimes[0], unixTimes[-1], len(unixTimes))
+    if site[1] != key:
+        site[1] = key
+        site[2] = AltAz(obstime=times, location=site[0])
+    altaz = get_sun(times).transform_to(site[2])
+    return altaz.alt.deg, altaz.az.deg
+
+
+BACKENDS = {"ASTROPY": astropyAltAz, "PSA": SolarPSA.psaAltAz}
+
+
+def getBackend(backend=None):
+    '''the backend function for a name in BACKENDS, by default SUN_BACKEND. A function is returned as it is'''
+    if callable(backend):
+        return backend
+    name = (backend or SUN_BACKEND).upper()
+    if name not in BACKENDS:
+        raise ValueError("unknown sun backend %s, use %s" % (backend, ", ".join(BACKENDS)))
+    return BACKENDS[name]
+
+
+def unixTime(when):
+    '''seconds since 1970 from an astropy Time or a number / array of seconds'''
+    return getattr(when, 'unix', when)
+
+
+def cubicInterpolate(start, step, values, t):
+    '''Catmull-Rom interpolation of values sampled every step seconds from start, at times t (number or array).
+    The first and the last two points are only used as neighbours, t has to be between start + step and the
+    third point from the end.'''
+    x = (np.asarray(t, dtype=np.float64) - start) / step
+    i = np.clip(np.floor(x).astype(int), 1, len(values) - 3)
+    f = x - i
+    p0 = values[i - 1]
+    p1 = values[i]
+    p2 = values[i + 1]
+    p3 = values[i + 2]
+    return p1 + 0.5 * f * (p2 - p0 + f * (2 * p0 - 5 * p1 + 4 * p2 - p3 + f * (3 * (p1 - p2) + p3 - p0)))
+
+
+def directions(alt, az):
+    '''unit vectors (east, north, up) of altitudes and azimuths in degrees'''
+    alt = np.radians(alt)
+    az = np.radians(az)
+    return np.cos(alt) * np.sin(az), np.cos(alt) * np.cos(az), np.sin(alt)
+
+
+class DayEphemeris:
+
+    def __init__(self, lat, lon, when=None, height=0, step=EPHEMERIS_STEP, hours=EPHEMERIS_HOURS, backend=None):
+        '''lat, lon in degrees, when: start of the table (astropy Time or unix seconds), by default now.
+        backend: a name in BACKENDS (by default SUN_BACKEND) or a function(lat, lon, unixTimes, height) that returns
+        (alt, az) arrays in degrees'''
+        self.lat = lat
+        self.lon = lon
+        self.height = height
+        self.step = step
+        self.hours = hours
+        self.backend = getBackend(backend)
+        self.build(when)
+
+    def build(self, when=None):
+        '''compute the table from when for hours hours'''
+        if when is None:
+            import time
+            when = time.time()
+        #one extra point before and two after, the interpolation needs the neighbours
+        self.start = float(unixTime(when)) - self.step
+        count = int(np.ceil(self.hours * 3600 / self.step)) + 4
+        self.times = self.start + np.arange(count) * self.step
+        alt, az = self.backend(self.lat, self.lon, self.times, self.height)
+        self.east, self.north, self.up = directions(alt, az)
+
+    def covers(self, t):
+        '''True when every time in t can be interpolated from the table'''
+        t = np.asarray(t)
+        return bool(np.all(t >= self.times[1]) and np.all(t <= self.times[-3]))
+
+    def direction(self, t):
+        '''the interpolated (east, north, up) vector at unix times t, not normalised'''
+        return (cubicInterpolate(self.start, self.step, self.east, t),
+                cubicInterpolate(self.start, self.step, self.north, t),
+                cubicInterpolate(self.start, self.step, self.up, t))
+
+    def altaz(self, when):
+        '''the (altitude, azimuth) of the sun in degrees at when (astropy Time or unix seconds, number or array),
+        the azimuth between 0 and 360. Builds a new table when when is outside this one'''
+        t = unixTime(when)
+        if not self.covers(t):
+            self.build(np.min(t))
+        east, north, up = self.direction(t)
+        alt = np.degrees(np.arctan2(up, np.hypot(east, north)))
+        az = np.degrees(np.arctan2(east, north)) % 360
+        if np.ndim(alt) == 0:
+            return float(alt), float(az)
+        return alt, az
+
+    def errorEstimate(self):
+        '''estimate of the largest interpolation error of this table, as an angle in degrees. The tangents of a
+        Catmull-Rom spline are off by a sixth of the third difference of the points, which moves the curve at most
+        0.096 times that between two points'''
+        third = [np.diff(component, 3) for component in (self.east, self.north, self.up)]
+        return float(np.degrees(np.sqrt(third[0] ** 2 + third[1] ** 2 + third[2] ** 2).max()) * 0.0962 / 6)
@@ -0,0 +1,165 @@
+''' the path of the sun over a time range, computed in one go
+The trackers only ask for the sun position of the next update. sunTrajectory() gives the altitude and azimuth for a
+whole range at once, with one batched call of a SunPosition backend, and finds sunrise, sunset and transit in it:
+
+    trajectory = SunTrajectory.sunTrajectory(lat, lon, start, end, resolution=60, backend="PSA")
+    trajectory.alt, trajectory.az                   #arrays in degrees at trajectory.times (unix seconds)
+    trajectory.sunrise, trajectory.sunset           #arrays of unix seconds, empty during polar day or night
+    trajectory.transit, trajectory.transitAltitude
+
+With it the stepper moves of a day can be planned and checked against the limits of the motors (see
+stepperControl.StepperControl.motorMin / motorMax) before the tracker starts:
+
+    yaw, pitch = trajectory.stepperAngles()         #what SunTracker / Heliopath send to fruitStepper4
+    late = trajectory.outOfLimits(motorMin, motorMax)
+
+A day at a one minute resolution takes a few milliseconds with the PSA backend. Sunrise and sunset are the times the
+centre of the sun is at SUNRISE_ALTITUDE, found between the samples and refined with one more backend call, transit
+is the highest point of a parabola through the samples around the highest one. They are well within a second, also at a 10 minute resolution.
+Run it to print the plan of a day:
+
+    python3 SunTrajectory.py --lat 52.37 --lon 4.90 --date 2020-06-21 --backend PSA
+'''
+
+import time
+import calendar
+import argparse
+
+import numpy as np
+
+import SunPosition
+
+
+SUNRISE_ALTITUDE = -0.833   #altitude of the centre of the sun at sunrise and sunset, refraction and half the sun
+MOTOR_MIN = -360            #stepperControl.StepperControl defaults, the steppers won't go past these angles
+MOTOR_MAX = 360
+
+
+class Trajectory:
+
+    def __init__(self, lat, lon, times, alt, az):
+        '''times in unix seconds, alt and az in degrees, all arrays of the same length'''
+        self.lat = lat
+        self.lon = lon
+        self.times = times
+        self.alt = alt
+        self.az = az
+        self.sunrise = np.empty(0)
+        self.sunset = np.empty(0)
+        self.transit = np.empty(0)
+        self.transitAltitude = np.empty(0)
+
+    def daylight(self):
+        '''True for the samples with the sun above the horizon'''
+        return self.alt > SUNRISE_ALTITUDE
+
+    def stepperAngles(self):
+        '''the (yaw, pitch) angles the trackers send to fruitStepper4 for every sample: the azimuth - 180 and the
+        altitude - 90, relative to a mirror base that was zeroed facing south'''
+        return self.az - 180, self.alt - 90
+
+    def outOfLimits(self, motorMin=MOTOR_MIN, motorMax=MOTOR_MAX, daylightOnly=True):
+        '''the times at which yaw or pitch is outside motorMin - motorMax (numbers, or (yaw, pitch) tuples of them).
+        Only the daylight samples are checked when daylightOnly is set'''
+        yawMin, pitchMin = motorMin if isinstance(motorMin, tuple) else (motorMin, motorMin)
+        yawMax, pitchMax = motorMax if isinstance(motorMax, tuple) else (motorMax, motorMax)
+        yaw, pitch = self.stepperAngles()
+        outside = (yaw < yawMin) | (yaw > yawMax) | (pitch < pitchMin) | (pitch > pitchMax)
+        if daylightOnly:
+            outside &= self.daylight()
+        return self.times[outside]
+
+
+def crossings(values, level):
+    '''the indices i where values passes level between i and i + 1, upwards and downwards'''
+    above = values > level
+    change = np.flatnonzero(above[1:] != above[:-1])
+    return change[~above[change]], change[above[change]]
+
+
+def sunTrajectory(lat, lon, start, end, resolution=60, height=0, backend=None):
+    '''the sun from start to end (astropy Time or unix seconds) every resolution seconds for a site at lat, lon in
+    degrees. backend: see SunPosition.getBackend(). Returns a Trajectory'''
+    getAltAz = SunPosition.getBackend(backend)
+    start = float(SunPosition.unixTime(start))
+    end = float(SunPosition.unixTime(end))
+    if end <= start or resolution <= 0:
+        raise ValueError("the trajectory needs a start before the end and a positive resolution")
+
+    times = start + np.arange(int(np.floor((end - start) / resolution)) + 1) * resolution
+    alt, az = getAltAz(lat, lon, times, height)
+    alt = np.asarray(alt, dtype=np.float64)
+    az = np.asarray(az, dtype=np.float64)
+    trajectory = Trajectory(lat, lon, times, alt, az)
+
+    #sunrise and sunset: where the altitude passes the horizon, linear between the samples
+    rising, setting = crossings(alt, SUNRISE_ALTITUDE)
+    index = np.concatenate((rising, setting))
+    if len(index):
+        t0 = times[index]
+        a0 = alt[index] - SUNRISE_ALTITUDE
+        a1 = alt[index + 1] - SUNRISE_ALTITUDE
+        estimate = t0 + resolution * a0 / (a0 - a1)
+        #one more backend call at the estimates, then linear again in the part of the step that has the crossing
+        ae = np.asarray(getAltAz(lat, lon, estimate, height)[0], dtype=np.float64) - SUNRISE_ALTITUDE
+        before = np.sign(ae) == np.sign(a0)
+        tLow = np.where(before, estimate, t0)
+        aLow = np.where(before, ae, a0)
+        tHigh = np.where(before, t0 + resolution, estimate)
+        aHigh = np.where(before, a1, ae)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            refined = np.where(aLow == aHigh, estimate, tLow + (tHigh - tLow) * aLow / (aLow - aHigh))
+        trajectory.sunrise = refined[:len(rising)]
+        trajectory.sunset = refined[len(rising):]
+
+    #transit: the local maxima of the altitude, the top of a parabola through three samples
+    if len(alt) >= 3:
+        peak = np.flatnonzero((alt[1:-1] > alt[:-2]) & (alt[1:-1] >= alt[2:])) + 1
+        left = alt[peak - 1]
+        middle = alt[peak]
+        right = alt[peak + 1]
+        curvature = left - 2 * middle + right
+        with np.errstate(divide='ignore', invalid='ignore'):
+            offset = np.where(curvature < 0, 0.5 * (left - right) / curvature, 0.0)
+        trajectory.transit = times[peak] + offset * resolution
+        trajectory.transitAltitude = middle - 0.25 * (left - right) * offset
+
+    return trajectory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="plan a day of sun tracking")
+    parser.add_argument('--lat', metavar="lat", type=float, default=52.37, help="latitude of the site in degrees")
+    parser.add_argument('--lon', metavar="lon", type=float, default=4.90, help="longitude of the site in degrees")
+    parser.add_argument('--date', metavar="date", type=str, default=time.strftime("%Y-%m-%d", time.gmtime()), help="UTC day to plan, YYYY-MM-DD")
+    parser.add_argument('--resolution', metavar="resolution", type=float, default=60.0, help="seconds between two positions")
+    parser.add_argument('--backend', metavar="backend", type=str, default=None, help="ASTROPY or PSA, see SunPosition.BACKENDS")
+    parser.add_argument('--motorMin', metavar="motorMin", type=float, default=MOTOR_MIN, help="lowest stepper angle")
+    parser.add_argument('--motorMax', metavar="motorMax", type=float, default=MOTOR_MAX, help="highest stepper angle")
+    args = parser.parse_args()
+
+    dayStart = calendar.timegm(time.strptime(args.date, "%Y-%m-%d"))
+    started = time.perf_counter()
+    trajectory = sunTrajectory(args.lat, args.lon, dayStart, dayStart + 86400, args.resolution, backend=args.backend)
+    elapsed = time.perf_counter() - started
+
+    def clock(seconds):
+        return time.strftime("%H:%M:%S", time.gmtime(seconds))
+
+    print("%i positions in %.1f ms" % (len(trajectory.times), elapsed * 1000))
+    print("sunrise  %s UTC" % ", ".join(clock(t) for t in trajectory.sunrise) if len(trajectory.sunrise) else "no sunrise")
+    for t, alt in zip(trajectory.transit, trajectory.transitAltitude):
+        print("transit  %s UTC at %.2f degrees" % (clock(t), alt))
+    print("sunset   %s UTC" % ", ".join(clock(t) for t in trajectory.sunset) if len(trajectory.sunset) else "no sunset")
+
+    daylight = trajectory.daylight()
+    if daylight.any():
+        yaw, pitch = trajectory.stepperAngles()
+        print("yaw      %.2f to %.2f degrees, largest move %.2f degrees" % (yaw[daylight].min(), yaw[daylight].max(),
+            np.abs(np.diff(yaw)[daylight[1:] & daylight[:-1]]).max(initial=0)))
+        print("pitch    %.2f to %.2f degrees" % (pitch[daylight].min(), pitch[daylight].max()))
+        outside = trajectory.outOfLimits(args.motorMin, args.motorMax)
+        if len(outside):
+            print("%i positions outside %g - %g degrees, the first at %s UTC" % (len(outside), args.motorMin, args.motorMax, clock(outside[0])))
+        else:
+            print("within %g - %g degrees all day" % (args.motorMin, args.motorMax))
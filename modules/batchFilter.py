@@ -0,0 +1,149 @@
+''' the berryIMU filter chain over whole arrays of recorded samples
+filterSamples() takes raw samples (IMU.SAMPLE_DTYPE, e.g. from IMULog.readLog() or IMU.readBatch()) and returns the
+angles and headings that berryIMU.OrientationEstimator would have produced for every sample when fed the same samples
+through OrientationEstimator.fuse(). The filter constants can be passed in, so AA, Q_angle, R_angle or the low pass
+factors can be re-tuned against hours of recorded data in seconds:
+
+    samples, isLSM9DS0 = IMULog.readLog("mirror.imulog")
+    angles = batchFilter.filterSamples(samples, isLSM9DS0, AA=0.3)
+    angles['kalmanX']
+
+The calibration, median, trigonometry and heading steps work on whole arrays. The low pass, complementary and Kalman
+filters are recursive, they run as one tight loop per filter over plain floats with the same operations in the same
+order as the streaming code, so results match it up to floating point rounding.
+'''
+
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import berryIMU
+from berryIMU import RAD_TO_DEG, M_PI
+
+
+#one result per sample
+ANGLES_DTYPE = np.dtype([('AccXangle', np.float64), ('AccYangle', np.float64),
+                         ('gyroXangle', np.float64), ('gyroYangle', np.float64), ('gyroZangle', np.float64),
+                         ('CFangleX', np.float64), ('CFangleY', np.float64),
+                         ('kalmanX', np.float64), ('kalmanY', np.float64),
+                         ('heading', np.float64), ('tiltCompensatedHeading', np.float64)])
+
+#rows of the median filter that are sorted at once, limits the memory used for long recordings
+MEDIAN_CHUNK = 65536
+
+
+def lowPass(values, factor):
+    '''y[n] = x[n] * factor + y[n-1] * (1 - factor), starting from 0'''
+    out = []
+    old = 0
+    for value in values.tolist():
+        old = value * factor + old * (1 - factor)
+        out.append(old)
+    return np.array(out)
+
+
+def median(values, tableSize):
+    '''the median filter of berryIMU: the middle value of the last tableSize values, the table starts filled with 1'''
+    padded = np.concatenate((np.ones(tableSize - 1), values))
+    windows = sliding_window_view(padded, tableSize)
+    middle = int(tableSize / 2)
+    out = np.empty(len(values))
+    for start in range(0, len(values), MEDIAN_CHUNK):
+        chunk = windows[start:start + MEDIAN_CHUNK]
+        out[start:start + len(chunk)] = np.partition(chunk, middle, axis=1)[:, middle]
+    return out
+
+
+def complementary(gyroRate, accAngle, LP, AA):
+    '''CFangle = AA * (CFangle + gyroRate * LP) + (1 - AA) * accAngle'''
+    out = []
+    CFangle = 0.0
+    for rate, angle, dt in zip(gyroRate.tolist(), accAngle.tolist(), LP.tolist()):
+        CFangle = AA * (CFangle + rate * dt) + (1 - AA) * angle
+        out.append(CFangle)
+    return np.array(out)
+
+
+def filterSamples(samples, isLSM9DS0=0, LP=None, gain=None, magneticDecl=None,
+                  AA=berryIMU.AA, MAG_LPF_FACTOR=berryIMU.MAG_LPF_FACTOR, ACC_LPF_FACTOR=berryIMU.ACC_LPF_FACTOR,
+                  ACC_MEDIANTABLESIZE=berryIMU.ACC_MEDIANTABLESIZE, MAG_MEDIANTABLESIZE=berryIMU.MAG_MEDIANTABLESIZE,
+                  Q_angle=berryIMU.Q_angle, Q_gyro=berryIMU.Q_gyro, R_angle=berryIMU.R_angle):
+    '''run the berryIMU filters over a SAMPLE_DTYPE array, returns an ANGLES_DTYPE array with a row per sample.
+    isLSM9DS0: the samples are from a BerryIMUv1, LP: loop periods in seconds, by default the differences of the
+    sample timestamps (0 for the first sample), gain: gyro dps/LSB, by default berryIMU.G_GAIN,
+    magneticDecl: by default berryIMU.magneticDecl. The other arguments override the berryIMU constants.'''
+    n = len(samples)
+    if gain is None:
+        gain = berryIMU.G_GAIN
+    if magneticDecl is None:
+        magneticDecl = berryIMU.magneticDecl
+    if LP is None:
+        LP = np.diff(samples['t'], prepend=samples['t'][:1]) if n else np.empty(0)
+    LP = np.asarray(LP, dtype=np.float64)
+
+    acc = samples['acc'].astype(np.float64)
+    gyr = samples['gyr'].astype(np.float64)
+    mag = samples['mag'].astype(np.float64)
+    out = np.zeros(n, dtype=ANGLES_DTYPE)
+    if n == 0:
+        return out
+
+    #Apply compass calibration
+    offsets, matrix = berryIMU.magCalibration()
+    mag = (mag - offsets) @ np.array(matrix).T
+
+    #low pass and median filter, every axis on its own
+    ACCx, ACCy, ACCz = (median(lowPass(acc[:, axis], ACC_LPF_FACTOR), ACC_MEDIANTABLESIZE) for axis in range(3))
+    MAGx, MAGy, MAGz = (median(lowPass(mag[:, axis], MAG_LPF_FACTOR), MAG_MEDIANTABLESIZE) for axis in range(3))
+
+    #Convert Gyro raw to degrees per second and integrate
+    rate_gyr_x = gyr[:, 0] * gain
+    rate_gyr_y = gyr[:, 1] * gain
+    rate_gyr_z = gyr[:, 2] * gain
+    out['gyroXangle'] = np.cumsum(rate_gyr_x * LP)
+    out['gyroYangle'] = np.cumsum(rate_gyr_y * LP)
+    out['gyroZangle'] = np.cumsum(rate_gyr_z * LP)
+
+    #Convert Accelerometer values to degrees
+    if not berryIMU.IMU_UPSIDE_DOWN:
+        AccXangle = np.arctan2(ACCy, ACCz) * RAD_TO_DEG
+        AccYangle = (np.arctan2(ACCz, ACCx) + M_PI) * RAD_TO_DEG
+    else:
+        AccXangle = np.arctan2(-ACCy, -ACCz) * RAD_TO_DEG
+        AccYangle = (np.arctan2(-ACCz, -ACCx) + M_PI) * RAD_TO_DEG
+    AccYangle = np.where(AccYangle > 90, AccYangle - 270.0, AccYangle + 90.0)
+    out['AccXangle'] = AccXangle
+    out['AccYangle'] = AccYangle
+
+    #the recursive filters
+    out['CFangleX'] = complementary(rate_gyr_x, AccXangle, LP, AA)
+    out['CFangleY'] = complementary(rate_gyr_y, AccYangle, LP, AA)
+    out['kalmanX'] = berryIMU.KalmanFilter(Q_angle, Q_gyro, R_angle).updateAll(AccXangle.tolist(), rate_gyr_x.tolist(), LP.tolist())
+    out['kalmanY'] = berryIMU.KalmanFilter(Q_angle, Q_gyro, R_angle).updateAll(AccYangle.tolist(), rate_gyr_y.tolist(), LP.tolist())
+
+    #Calculate heading
+    if berryIMU.IMU_UPSIDE_DOWN:
+        MAGy = -MAGy
+    heading = 180 * np.arctan2(MAGy, MAGx) / M_PI
+    out['heading'] = np.where(heading < 0, heading + 360, heading)
+
+    #Tilt compensated heading
+    accNorm = np.sqrt(ACCx * ACCx + ACCy * ACCy + ACCz * ACCz)
+    if not berryIMU.IMU_UPSIDE_DOWN:
+        accXnorm = ACCx / accNorm
+    else:
+        accXnorm = -ACCx / accNorm
+    accYnorm = ACCy / accNorm
+    pitch = np.arcsin(accXnorm)
+    roll = -np.arcsin(accYnorm / np.cos(pitch))
+    sinPitch = np.sin(pitch)
+    cosPitch = np.cos(pitch)
+    sinRoll = np.sin(roll)
+    magXcomp = MAGx * cosPitch + MAGz * sinPitch
+    if isLSM9DS0:
+        magYcomp = MAGx * sinRoll * sinPitch + MAGy * np.cos(roll) - MAGz * sinRoll * cosPitch
+    else:
+        magYcomp = MAGx * sinRoll * sinPitch + MAGy * np.cos(roll) + MAGz * sinRoll * cosPitch
+    tiltCompensatedHeading = 180 * (np.arctan2(magYcomp, magXcomp) + (magneticDecl / 1000)) / M_PI
+    out['tiltCompensatedHeading'] = np.where(tiltCompensatedHeading < 0, tiltCompensatedHeading + 360, tiltCompensatedHeading)
+    return out
@@ -0,0 +1,59 @@
+''' benchmark the orientation filters of berryIMU against each other, no Raspberry Pi needed
+For the complementary + Kalman filters (CF) and the quaternion filters (MADGWICK, MAHONY, see AHRS.py) it prints
+the time one update takes and how many samples it takes after power up until pitch, roll and heading have converged
+(see berryIMU.ConvergenceMonitor), with the final values so the filters can be compared.
+The samples are a level BerryIMU with sensor noise, or a recorded binary IMU log (see IMULog.py) with --log.
+'''
+
+import time
+import argparse
+import random
+
+import IMU
+import IMUSim
+import berryIMU
+
+
+parser = argparse.ArgumentParser(description="orientation filter benchmark")
+parser.add_argument('--chip', metavar="chip", type=str, default="LSM9DS1", help="LSM9DS1 (BerryIMUv2) or LSM9DS0 (BerryIMUv1)")
+parser.add_argument('--samples', metavar="samples", type=int, default=5000, help="number of noisy samples to generate")
+parser.add_argument('--rate', metavar="rate", type=float, default=33.0, help="sample rate of the generated samples in Hz")
+parser.add_argument('--noise', metavar="noise", type=float, default=10.0, help="standard deviation of the generated sensor noise in LSB")
+parser.add_argument('--log', metavar="log", type=str, default=None, help="binary IMU log to use instead of generated samples")
+parser.add_argument('--fusion', metavar="fusion", type=str, nargs='+', default=["CF", "MADGWICK", "MAHONY"], help="filters to compare")
+args = parser.parse_args()
+
+
+isLSM9DS0 = args.chip == "LSM9DS0"
+if args.log:
+    import IMULog
+    import numpy as np
+    samples, isLSM9DS0 = IMULog.readLog(args.log)
+    LP = np.diff(samples['t'], prepend=samples['t'][:1]).tolist()
+    samples = list(zip(samples['acc'].tolist(), samples['gyr'].tolist(), samples['mag'].tolist()))
+else:
+    random.seed(1)
+    samples = []
+    for i in range(args.samples):
+        noisy = [value + random.gauss(0, args.noise) for value in IMUSim.STILL_SAMPLE]
+        samples.append((noisy[0:3], noisy[3:6], noisy[6:9]))
+    LP = [1 / args.rate] * len(samples)
+
+#the device is only used for its chip type, the samples go straight into the filters
+device = IMU.Imu(IMUSim.SimBus(chip="LSM9DS0" if isLSM9DS0 else "LSM9DS1"), isLSM9DS0)
+
+
+print("%-9s %12s %12s   %s" % ("filter", "us/update", "converged at", "pitch, roll, heading"))
+for fusion in args.fusion:
+    estimator = berryIMU.OrientationEstimator(device, fusion)
+    estimator.monitor = berryIMU.ConvergenceMonitor()
+    update = estimator.update
+    convergedAt = None
+    start = time.perf_counter()
+    for i, ((acc, gyr, mag), dt) in enumerate(zip(samples, LP)):
+        update(acc, gyr, mag, dt)
+        if convergedAt is None and estimator.monitor.converged():
+            convergedAt = i + 1
+    elapsed = time.perf_counter() - start
+    print("%-9s %12.1f %12s   %.2f, %.2f, %.2f" % (fusion, elapsed / len(samples) * 1000000,
+        "never" if convergedAt is None else "%i" % convergedAt, *estimator.getValues()))
@@ -0,0 +1,110 @@
+''' benchmark the IMU read paths on a simulated BerryIMU (see IMUSim.py), no Raspberry Pi needed
+Prints the achievable sample rate of the per axis reads, the burst reads, the batch reads, (LSM9DS1 only) the FIFO drain
+and the scheduled reads that read every sensor at its own ODR (see IMUScheduler.py).
+With --busSpeed 100000 every transaction takes as long as on the 100kHz I2C bus of the Pi.
+With --minRate the script exits with an error when the burst read rate drops below that value, for use in CI.
+With --run the given script (berryIMU, leveler or calibrateBerryIMU) is started on the simulated bus instead.
+'''
+
+import sys
+import time
+import argparse
+import runpy
+
+import IMU
+import IMUSim
+
+
+parser = argparse.ArgumentParser(description="IMU read benchmark on a simulated BerryIMU")
+parser.add_argument('--chip', metavar="chip", type=str, default="LSM9DS1", help="LSM9DS1 (BerryIMUv2) or LSM9DS0 (BerryIMUv1)")
+parser.add_argument('--samples', metavar="samples", type=int, default=2000, help="number of samples to read per test")
+parser.add_argument('--busSpeed', metavar="busSpeed", type=int, default=None, help="emulated I2C clock in Hz, no transfer delay when omitted")
+parser.add_argument('--rate', metavar="rate", type=float, default=476.0, help="output data rate of the simulated IMU in Hz, on the LSM9DS1 one of its gyro ODRs")
+parser.add_argument('--magRate', metavar="magRate", type=float, default=80.0, help="output data rate of the simulated magnetometer in Hz")
+parser.add_argument('--trace', metavar="trace", type=str, default=None, help="text file with recorded raw samples to replay")
+parser.add_argument('--log', metavar="log", type=str, default=None, help="binary IMU log (see IMULog.py) to replay")
+parser.add_argument('--minRate', metavar="minRate", type=float, default=None, help="fail when the burst read rate is below this many samples/s")
+parser.add_argument('--stats', action='store_true', help="print the I2C transaction statistics at the end")
+parser.add_argument('--run', metavar="script", type=str, default=None, help="run this IMU script on the simulated bus")
+args = parser.parse_args()
+#the scheduled reads set the LSM9DS1 gyro to the simulated rate, so it has to be one the chip supports
+gyroODRs = sorted(odr for odr in IMU.LSM9DS1_GYRO_ODR if odr)
+if args.chip == "LSM9DS1" and args.rate not in gyroODRs:
+    parser.error("--rate %g is not an LSM9DS1 gyro ODR, use one of %s" % (args.rate, ", ".join("%g" % odr for odr in gyroODRs)))
+
+
+samples = None
+if args.trace:
+    samples = IMUSim.loadTrace(args.trace)
+elif args.log:
+    import IMULog
+    samples = IMULog.simSamples(args.log)
+IMU.setBus(IMUSim.SimBus(samples, rate=args.rate, chip=args.chip, busSpeed=args.busSpeed, magRate=args.magRate))
+if args.stats:
+    import I2CStats
+    IMU.setBus(I2CStats.InstrumentedBus(IMU.bus))
+
+if args.run:
+    runpy.run_module(args.run, run_name="__main__")
+    sys.exit(0)
+
+IMU.detectIMU()
+IMU.initIMU()
+
+
+def readPerAxis():
+    return (IMU.readACCx(), IMU.readACCy(), IMU.readACCz(),
+            IMU.readGYRx(), IMU.readGYRy(), IMU.readGYRz(),
+            IMU.readMAGx(), IMU.readMAGy(), IMU.readMAGz())
+
+
+def readBurst():
+    return IMU.readACC() + IMU.readGYR() + IMU.readMAG()
+
+
+def sampleRate(readFunction, n):
+    start = time.perf_counter()
+    for i in range(n):
+        readFunction()
+    return n / (time.perf_counter() - start)
+
+
+perAxisRate = sampleRate(readPerAxis, args.samples)
+burstRate = sampleRate(readBurst, args.samples)
+print("per axis reads: %8.1f samples/s (18 transactions per sample)" % perAxisRate)
+print("burst reads:    %8.1f samples/s (3 transactions per sample)" % burstRate)
+
+start = time.perf_counter()
+IMU.readBatch(args.samples)
+print("batch reads:    %8.1f samples/s (into a NumPy array)" % (args.samples / (time.perf_counter() - start)))
+
+if IMU.enableFIFO(args.rate):
+    drained = 0
+    start = time.perf_counter()
+    while drained < args.samples:
+        time.sleep(0.03)
+        drained += len(IMU.readFIFO())
+    elapsed = time.perf_counter() - start
+    print("FIFO drain:     %8.1f samples/s (%i overruns)" % (drained / elapsed, IMU.imu.fifoOverruns))
+    IMU.disableFIFO()
+
+#scheduled reads on a counting bus, so the transactions per gyro sample can be compared with the 3 of a burst read
+import I2CStats
+import IMUScheduler
+counter = I2CStats.InstrumentedBus(IMU.bus)
+scheduled = IMU.Imu(counter, IMU.imu.LSM9DS0)
+scheduled.initIMU(gyroODR=args.rate if args.chip == "LSM9DS1" else None)
+sampler = IMUScheduler.ScheduledSampler(scheduled)
+counter.reset()
+sampler.start()
+time.sleep(1.0)
+sampler.stop()
+print("scheduled reads:%8.1f samples/s (%.1f transactions per gyro sample)" % (
+    sampler.count / (time.monotonic() - counter.started), sum(counter.counts.values()) / max(1, sampler.count)))
+
+if args.stats:
+    IMU.bus.dump()
+
+if args.minRate is not None and burstRate < args.minRate:
+    print("burst read rate %.1f is below the minimum of %.1f samples/s" % (burstRate, args.minRate))
+    sys.exit(1)
@@ -0,0 +1,98 @@
+''' benchmark the sun position backends of SunPosition.py against each other, no Raspberry Pi or GPS needed
+For every backend (ASTROPY and PSA, see SunPosition.BACKENDS) it prints, each measured in a fresh python process:
+the time to import it and compute the first position, the time one position takes, the time the positions of a day
+at the ephemeris step take in one call, and the resident memory (max RSS) of the process.
+Then it compares the positions of the other backends with astropy over a whole year (every --step minutes, sun above
+the horizon) and prints the largest and mean angle between them, and the largest altitude and azimuth difference.
+Without astropy only the timings of the other backends are printed.
+'''
+
+import sys
+import json
+import time
+import calendar
+import argparse
+import subprocess
+
+import numpy as np
+
+
+parser = argparse.ArgumentParser(description="sun position backend benchmark")
+parser.add_argument('--lat', metavar="lat", type=float, default=52.37, help="latitude of the site in degrees")
+parser.add_argument('--lon', metavar="lon", type=float, default=4.90, help="longitude of the site in degrees")
+parser.add_argument('--year', metavar="year", type=int, default=2020, help="year to compare the backends over")
+parser.add_argument('--step', metavar="step", type=float, default=30.0, help="minutes between the compared positions")
+parser.add_argument('--calls', metavar="calls", type=int, default=100, help="number of calls to time")
+parser.add_argument('--backend', metavar="backend", type=str, nargs='+', default=["ASTROPY", "PSA"], help="backends to benchmark")
+parser.add_argument('--measure', metavar="backend", type=str, default=None, help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+
+yearStart = calendar.timegm((args.year, 1, 1, 0, 0, 0))
+
+
+def measure(name):
+    '''the timings and memory of one backend in this process, printed as JSON for the parent process'''
+    import resource
+    start = time.perf_counter()
+    import SunPosition
+    backend = SunPosition.getBackend(name)
+    #the first call includes the imports a backend does on its own
+    backend(args.lat, args.lon, np.array([yearStart]))
+    coldStart = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.calls):
+        backend(args.lat, args.lon, np.array([yearStart + i * 60.0]))
+    perCall = (time.perf_counter() - start) / args.calls
+
+    day = yearStart + np.arange(0, 86400 + SunPosition.EPHEMERIS_STEP, SunPosition.EPHEMERIS_STEP)
+    start = time.perf_counter()
+    backend(args.lat, args.lon, day)
+    perDay = time.perf_counter() - start
+
+    #ru_maxrss is in kB on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"coldStart": coldStart, "perCall": perCall, "perDay": perDay, "rss": rss}))
+
+
+if args.measure:
+    measure(args.measure)
+    sys.exit(0)
+
+
+print("%-8s %14s %12s %12s %10s" % ("backend", "cold start ms", "ms/call", "ms/day", "RSS MB"))
+for name in args.backend:
+    child = subprocess.run([sys.executable, __file__, "--measure", name, "--lat", str(args.lat), "--lon", str(args.lon),
+                            "--year", str(args.year), "--calls", str(args.calls)], capture_output=True, text=True)
+    if child.returncode != 0:
+        print("%-8s failed: %s" % (name, child.stderr.strip().splitlines()[-1] if child.stderr.strip() else child.returncode))
+        continue
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    print("%-8s %14.1f %12.3f %12.3f %10.1f" % (name, result["coldStart"] * 1000, result["perCall"] * 1000,
+                                                 result["perDay"] * 1000, result["rss"]))
+
+
+import SunPosition
+
+try:
+    import astropy
+except ImportError:
+    print("astropy is not installed, no accuracy comparison")
+    sys.exit(0)
+
+times = yearStart + np.arange(0, 366 * 86400, args.step * 60)
+print(" ")
+print("error against astropy over %i, every %g minutes, sun above the horizon" % (args.year, args.step))
+print("%-8s %12s %12s %12s %12s" % ("backend", "max deg", "mean deg", "max alt", "max az"))
+referenceAlt, referenceAz = SunPosition.astropyAltAz(args.lat, args.lon, times)
+reference = np.array(SunPosition.directions(referenceAlt, referenceAz))
+up = referenceAlt > 0
+for name in args.backend:
+    if name.upper() == "ASTROPY":
+        continue
+    alt, az = SunPosition.getBackend(name)(args.lat, args.lon, times)
+    angle = np.degrees(np.arccos(np.clip(np.sum(np.array(SunPosition.directions(alt, az)) * reference, axis=0), -1, 1)))
+    azError = (az - referenceAz + 180) % 360 - 180
+    print("%-8s %12.5f %12.5f %12.5f %12.5f" % (name, angle[up].max(), angle[up].mean(),
+                                                 np.abs(alt - referenceAlt)[up].max(), np.abs(azError)[up].max()))
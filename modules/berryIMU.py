@@ -17,6 +17,7 @@
 
 ''' Original file updated for use in the Heliopath project
 It now returns readings after a certain amount of measurements set by MEASURE_N
+Importing this module doesn't touch the IMU, measuring is done by an OrientationEstimator
 '''
 
 
@@ -24,8 +25,11 @@ It now returns readings after a certain amount of measurements set by MEASURE_N
 import sys
 import time
 import math
+import bisect
+import collections
 import IMU
-import datetime
+import IMUSampler
+import IMUTiming
 import os
 # If the IMU is upside down (Skull logo facing up), change this value to 1
 IMU_UPSIDE_DOWN = 0	
@@ -33,20 +37,31 @@ IMU_UPSIDE_DOWN = 0
 
 RAD_TO_DEG = 57.29578
 M_PI = 3.14159265358979323846
-G_GAIN = 0.070  	# [deg/s/LSB]  If you change the dps for gyro, you need to update this value accordingly
+G_GAIN = 0.070  	# [deg/s/LSB]  Replaced by the gain initIMU() returns for the configured gyro full scale
 AA =  0.40      	# Complementary filter constant
 MAG_LPF_FACTOR = 0.4 	# Low pass filter constant magnetometer
 ACC_LPF_FACTOR = 0.4 	# Low pass filter constant for accelerometer
 ACC_MEDIANTABLESIZE = 8    	# Median filter table size for accelerometer. Higher = smoother but a longer delay
 MAG_MEDIANTABLESIZE = 8    	# Median filter table size for magnetometer. Higher = smoother but a longer delay
+RECORD_FILE = None          # Set to a file name to record all raw samples to a binary log, see IMULog.py
+I2C_STATS = 0               # Set to 1 to count I2C transactions and latencies, kill -USR1 <pid> prints them. See I2CStats.py
+FUSION = "CF"               # "CF": complementary and Kalman filters, "MADGWICK" or "MAHONY": quaternion filter, see AHRS.py
+USE_FIFO = 0                # Set to 1 to run every gyro sample (the full ODR) through the filters from the LSM9DS1 FIFO
 
 MEASURE_N = 250     #How many times to measure
+CONVERGED_WINDOW = 30       #measure until converged: number of measurements the angles have to be stable over
+CONVERGED_TOLERANCE = 0.2   #measure until converged: maximum standard deviation of the angles and heading in degrees
+CONVERGED_TIMEOUT = 15      #measure until converged: give up and use the latest values after this many seconds
+MEASURE_INTERVAL = 0.03     #seconds between the measurements the filter constants and the numbers of measurements
+                            #above are for, they are converted for other sample periods, see setSamplePeriod()
 
 
 ################# Compass Calibration values ############
 # Use calibrateBerryIMU.py to get calibration values 
 # Calibrating the compass isnt mandatory, however a calibrated 
 # compass will result in a more accurate heading value.
+# calibrateBerryIMU.py writes the profile below, when it exists it is used instead of the min/max values.
+MAG_PROFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "magCalibration.json")
 
 '''magXmax -57.000000 magXmin: -2217.000000, magYmax 2268.000000 magYmin -1.000000, magZmin 31.000000 magZmax 2046.000000
 '''
@@ -78,393 +93,713 @@ Dont use the above values, these are just an example.
 
 
 
-#Kalman filter variables
+#Kalman filter tuning
 Q_angle = 0.02
 Q_gyro = 0.0015
 R_angle = 0.005
-y_bias = 0.0
-x_bias = 0.0
-XP_00 = 0.0
-XP_01 = 0.0
-XP_10 = 0.0
-XP_11 = 0.0
-YP_00 = 0.0
-YP_01 = 0.0
-YP_10 = 0.0
-YP_11 = 0.0
-KFangleX = 0.0
-KFangleY = 0.0
+#The Kalman filters start from the gyro bias in this table for the current die temperature, see GyroBias.py
+#Set to None to start from 0
+BIAS_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gyroBias.json")
+BIAS_SAVE_N = 250           #measurements the Kalman filters need before the bias they learned is recorded in the table
+
+class RunningMedian:
+    ''' median of the last size values, the filter starts with a table filled with initial
+    Keeps the values in arrival order (a ring buffer) and in sorted order, every new value replaces the oldest one
+    with a bisect remove and insert instead of copying and sorting the whole table.
+    Like the original median filter the middle value is sorted[int(size/2)], the upper median for even sizes.
+    '''
+    __slots__ = ('ring', 'ordered', 'index', 'size', 'middle')
+
+    def __init__(self, size, initial=1):
+        self.size = size
+        self.middle = int(size/2)
+        self.ring = [initial] * size
+        self.ordered = [initial] * size
+        self.index = 0
+
+    def update(self, value):
+        '''add value and return the median'''
+        ordered = self.ordered
+        oldest = self.ring[self.index]
+        del ordered[bisect.bisect_left(ordered, oldest)]
+        bisect.insort(ordered, value)
+        self.ring[self.index] = value
+        self.index = (self.index + 1) % self.size
+        return ordered[self.middle]
+
+
+class ConvergenceMonitor:
+    ''' tells when the filter outputs have settled: the standard deviation of every value over the last window
+    measurements is below tolerance. The heading is unwrapped first so a heading around north (0/360) is stable too.
+    The sums are kept up to date per measurement, so checking is O(1).
+    '''
+
+    def __init__(self, window=CONVERGED_WINDOW, tolerance=CONVERGED_TOLERANCE, channels=5):
+        self.window = window
+        self.limit = tolerance * tolerance * window       #variance limit times window, compared to the sums directly
+        self.history = collections.deque()
+        self.sums = [0.0] * channels
+        self.squareSums = [0.0] * channels
+        self.lastHeading = None
+        self.unwrappedHeading = 0.0
+
+    def add(self, values, heading):
+        '''add one measurement: a tuple of angles and the heading (0-360)'''
+        if self.lastHeading is not None:
+            self.unwrappedHeading += (heading - self.lastHeading + 180) % 360 - 180
+        else:
+            self.unwrappedHeading = heading
+        self.lastHeading = heading
+        values = tuple(values) + (self.unwrappedHeading,)
+
+        self.history.append(values)
+        sums = self.sums
+        squareSums = self.squareSums
+        for i, value in enumerate(values):
+            sums[i] += value
+            squareSums[i] += value * value
+        if len(self.history) > self.window:
+            for i, value in enumerate(self.history.popleft()):
+                sums[i] -= value
+                squareSums[i] -= value * value
+
+    def converged(self):
+        if len(self.history) < self.window:
+            return False
+        n = self.window
+        for total, squares in zip(self.sums, self.squareSums):
+            #n * variance = sum(x^2) - sum(x)^2 / n
+            if squares - total * total / n > self.limit:
+                return False
+        return True
+
+
+def magCalibration():
+    '''the compass calibration, returns ((x, y, z) hard iron offsets, 3x3 soft iron matrix as row tuples).
+    The calibrated compass values are matrix @ (raw - offsets). Read from MAG_PROFILE (see MagCalibration.py) when it
+    exists, otherwise from the min/max values above.'''
+    if MAG_PROFILE and os.path.exists(MAG_PROFILE):
+        import MagCalibration
+        return MagCalibration.loadProfile(MAG_PROFILE)
 
-def setMagneticDeclination(decl):
-    global magneticDecl
-    magneticDecl = decl
-
-def kalmanFilterY ( accAngle, gyroRate, DT):
-	y=0.0
-	S=0.0
-
-	global KFangleY
-	global Q_angle
-	global Q_gyro
-	global y_bias
-	global YP_00
-	global YP_01
-	global YP_10
-	global YP_11
-
-	KFangleY = KFangleY + DT * (gyroRate - y_bias)
-
-	YP_00 = YP_00 + ( - DT * (YP_10 + YP_01) + Q_angle * DT )
-	YP_01 = YP_01 + ( - DT * YP_11 )
-	YP_10 = YP_10 + ( - DT * YP_11 )
-	YP_11 = YP_11 + ( + Q_gyro * DT )
-
-	y = accAngle - KFangleY
-	S = YP_00 + R_angle
-	K_0 = YP_00 / S
-	K_1 = YP_10 / S
-	
-	KFangleY = KFangleY + ( K_0 * y )
-	y_bias = y_bias + ( K_1 * y )
-	
-	YP_00 = YP_00 - ( K_0 * YP_00 )
-	YP_01 = YP_01 - ( K_0 * YP_01 )
-	YP_10 = YP_10 - ( K_1 * YP_00 )
-	YP_11 = YP_11 - ( K_1 * YP_01 )
-	
-	return KFangleY
-
-def kalmanFilterX ( accAngle, gyroRate, DT):
-	x=0.0
-	S=0.0
-
-	global KFangleX
-	global Q_angle
-	global Q_gyro
-	global x_bias
-	global XP_00
-	global XP_01
-	global XP_10
-	global XP_11
-
-
-	KFangleX = KFangleX + DT * (gyroRate - x_bias)
-
-	XP_00 = XP_00 + ( - DT * (XP_10 + XP_01) + Q_angle * DT )
-	XP_01 = XP_01 + ( - DT * XP_11 )
-	XP_10 = XP_10 + ( - DT * XP_11 )
-	XP_11 = XP_11 + ( + Q_gyro * DT )
-
-	x = accAngle - KFangleX
-	S = XP_00 + R_angle
-	K_0 = XP_00 / S
-	K_1 = XP_10 / S
-	
-	KFangleX = KFangleX + ( K_0 * x )
-	x_bias = x_bias + ( K_1 * x )
-	
-	XP_00 = XP_00 - ( K_0 * XP_00 )
-	XP_01 = XP_01 - ( K_0 * XP_01 )
-	XP_10 = XP_10 - ( K_1 * XP_00 )
-	XP_11 = XP_11 - ( K_1 * XP_01 )
-	
-	return KFangleX
-
-
-gyroXangle = 0.0
-gyroYangle = 0.0
-gyroZangle = 0.0
-CFangleX = 0.0
-CFangleY = 0.0
-CFangleXFiltered = 0.0
-CFangleYFiltered = 0.0
-kalmanX = 0.0
-kalmanY = 0.0
-oldXMagRawValue = 0
-oldYMagRawValue = 0
-oldZMagRawValue = 0
-oldXAccRawValue = 0
-oldYAccRawValue = 0
-oldZAccRawValue = 0
-
-a = datetime.datetime.now()
-
-
-
-#Setup the tables for the mdeian filter. Fill them all with '1' soe we dont get devide by zero error 
-acc_medianTable1X = [1] * ACC_MEDIANTABLESIZE
-acc_medianTable1Y = [1] * ACC_MEDIANTABLESIZE
-acc_medianTable1Z = [1] * ACC_MEDIANTABLESIZE
-acc_medianTable2X = [1] * ACC_MEDIANTABLESIZE
-acc_medianTable2Y = [1] * ACC_MEDIANTABLESIZE
-acc_medianTable2Z = [1] * ACC_MEDIANTABLESIZE
-mag_medianTable1X = [1] * MAG_MEDIANTABLESIZE
-mag_medianTable1Y = [1] * MAG_MEDIANTABLESIZE
-mag_medianTable1Z = [1] * MAG_MEDIANTABLESIZE
-mag_medianTable2X = [1] * MAG_MEDIANTABLESIZE
-mag_medianTable2Y = [1] * MAG_MEDIANTABLESIZE
-mag_medianTable2Z = [1] * MAG_MEDIANTABLESIZE
-
-IMU.detectIMU()     #Detect if BerryIMUv1 or BerryIMUv2 is connected.
-IMU.initIMU()       #Initialise the accelerometer, gyroscope and compass
-
-
-numMeasurements = 0
-while numMeasurements < MEASURE_N:
-
-    #Read the accelerometer,gyroscope and magnetometer values
-    ACCx = IMU.readACCx()
-    ACCy = IMU.readACCy()
-    ACCz = IMU.readACCz()
-    GYRx = IMU.readGYRx()
-    GYRy = IMU.readGYRy()
-    GYRz = IMU.readGYRz()
-    #raw mag values
-    '''MAGxRAW = IMU.readMAGx()
-    MAGyRAW = IMU.readMAGy()
-    MAGzRAW = IMU.readMAGz()'''
-    MAGx = IMU.readMAGx()
-    MAGy = IMU.readMAGy()
-    MAGz = IMU.readMAGz()
-
-    #Apply compass calibration  
     #hard iron offset  
-    ''' MAGxRAW -= (magXmin + magXmax) /2 
-    MAGyRAW -= (magYmin + magYmax) /2 
-    MAGzRAW -= (magZmin + magZmax) /2 '''
-    
-    
-    MAGx -= (magXmin + magXmax) /2 
-    MAGy -= (magYmin + magYmax) /2 
-    MAGz -= (magZmin + magZmax) /2 
-    
+    magXoffset = (magXmin + magXmax) /2 
+    magYoffset = (magYmin + magYmax) /2 
+    magZoffset = (magZmin + magZmax) /2 
+    #soft iron scale
     magXscale = (magXmax - magXmin) /2 
     magYscale = (magYmax - magYmin) /2 
     magZscale = (magZmax - magZmin) /2 
     avgScale = (magXscale + magYscale + magZscale) / 3
-    
-    MAGx *= avgScale / magXscale
-    MAGy *= avgScale / magYscale
-    MAGz *= avgScale / magZscale
-    
-    
-    '''scaledMag[0]  = (float)(magRaw[0] - magXmin) / (magXmax - magXmin) * 2 - 1;
-scaledMag[1]  = (float)(magRaw[1] - magYmin) / (magYmax - magYmin) * 2 - 1;
-scaledMag[2]  = (float)(magRaw[2] - magZmin) / (magZmax - magZmin) * 2 - 1;
-'''
-    
-    #soft iron offset
-    '''MAGx = (MAGxRAW - magXmin) / (magXmax - magXmin) * 2 - 1
-    MAGy = (MAGyRAW - magYmin) / (magYmax - magYmin) * 2 - 1
-    MAGz = (MAGzRAW - magZmin) / (magZmax - magZmin) * 2 - 1'''
- 
-
-    ##Calculate loop Period(LP). How long between Gyro Reads
-    b = datetime.datetime.now() - a
-    a = datetime.datetime.now()
-    LP = b.microseconds/(1000000*1.0)
-   # print ("Loop Time | %5.2f|" % ( LP )),
-
-
-
-    ############################################### 
-    #### Apply low pass filter ####
-    ###############################################
-    MAGx =  MAGx  * MAG_LPF_FACTOR + oldXMagRawValue*(1 - MAG_LPF_FACTOR);
-    MAGy =  MAGy  * MAG_LPF_FACTOR + oldYMagRawValue*(1 - MAG_LPF_FACTOR);
-    MAGz =  MAGz  * MAG_LPF_FACTOR + oldZMagRawValue*(1 - MAG_LPF_FACTOR);
-    ACCx =  ACCx  * ACC_LPF_FACTOR + oldXAccRawValue*(1 - ACC_LPF_FACTOR);
-    ACCy =  ACCy  * ACC_LPF_FACTOR + oldYAccRawValue*(1 - ACC_LPF_FACTOR);
-    ACCz =  ACCz  * ACC_LPF_FACTOR + oldZAccRawValue*(1 - ACC_LPF_FACTOR);
-
-    oldXMagRawValue = MAGx
-    oldYMagRawValue = MAGy
-    oldZMagRawValue = MAGz
-    oldXAccRawValue = ACCx
-    oldYAccRawValue = ACCy
-    oldZAccRawValue = ACCz
-
-    ######################################### 
-    #### Median filter for accelerometer ####
-    #########################################
-    # cycle the table
-    for x in range (ACC_MEDIANTABLESIZE-1,0,-1 ):
-        acc_medianTable1X[x] = acc_medianTable1X[x-1]
-        acc_medianTable1Y[x] = acc_medianTable1Y[x-1]
-        acc_medianTable1Z[x] = acc_medianTable1Z[x-1]
-
-    # Insert the lates values
-    acc_medianTable1X[0] = ACCx
-    acc_medianTable1Y[0] = ACCy
-    acc_medianTable1Z[0] = ACCz    
-
-    # Copy the tables
-    acc_medianTable2X = acc_medianTable1X[:]
-    acc_medianTable2Y = acc_medianTable1Y[:]
-    acc_medianTable2Z = acc_medianTable1Z[:]
-
-    # Sort table 2
-    acc_medianTable2X.sort()
-    acc_medianTable2Y.sort()
-    acc_medianTable2Z.sort()
-
-    # The middle value is the value we are interested in
-    ACCx = acc_medianTable2X[int(ACC_MEDIANTABLESIZE/2)];
-    ACCy = acc_medianTable2Y[int(ACC_MEDIANTABLESIZE/2)];
-    ACCz = acc_medianTable2Z[int(ACC_MEDIANTABLESIZE/2)];
-
-
-
-    ######################################### 
-    #### Median filter for magnetometer ####
-    #########################################
-    # cycle the table
-    for x in range (MAG_MEDIANTABLESIZE-1,0,-1 ):
-        mag_medianTable1X[x] = mag_medianTable1X[x-1]
-        mag_medianTable1Y[x] = mag_medianTable1Y[x-1]
-        mag_medianTable1Z[x] = mag_medianTable1Z[x-1]
-
-    # Insert the latest values    
-    mag_medianTable1X[0] = MAGx
-    mag_medianTable1Y[0] = MAGy
-    mag_medianTable1Z[0] = MAGz    
-
-    # Copy the tables
-    mag_medianTable2X = mag_medianTable1X[:]
-    mag_medianTable2Y = mag_medianTable1Y[:]
-    mag_medianTable2Z = mag_medianTable1Z[:]
-
-    # Sort table 2
-    mag_medianTable2X.sort()
-    mag_medianTable2Y.sort()
-    mag_medianTable2Z.sort()
-
-    # The middle value is the value we are interested in
-    MAGx = mag_medianTable2X[int(MAG_MEDIANTABLESIZE/2)];
-    MAGy = mag_medianTable2Y[int(MAG_MEDIANTABLESIZE/2)];
-    MAGz = mag_medianTable2Z[int(MAG_MEDIANTABLESIZE/2)];
-
-
-
-    #Convert Gyro raw to degrees per second
-    rate_gyr_x =  GYRx * G_GAIN
-    rate_gyr_y =  GYRy * G_GAIN
-    rate_gyr_z =  GYRz * G_GAIN
-
-
-    #Calculate the angles from the gyro. 
-    gyroXangle+=rate_gyr_x*LP
-    gyroYangle+=rate_gyr_y*LP
-    gyroZangle+=rate_gyr_z*LP
-
-    #Convert Accelerometer values to degrees
-
-    if not IMU_UPSIDE_DOWN:
-        # If the IMU is up the correct way (Skull logo facing down), use these calculations
-        AccXangle =  (math.atan2(ACCy,ACCz)*RAD_TO_DEG)
-        AccYangle =  (math.atan2(ACCz,ACCx)+M_PI)*RAD_TO_DEG
-    else:
-        #Us these four lines when the IMU is upside down. Skull logo is facing up
-        AccXangle =  (math.atan2(-ACCy,-ACCz)*RAD_TO_DEG)
-        AccYangle =  (math.atan2(-ACCz,-ACCx)+M_PI)*RAD_TO_DEG
-
-
-
-    #Change the rotation value of the accelerometer to -/+ 180 and
-    #move the Y axis '0' point to up.  This makes it easier to read.
-    if AccYangle > 90:
-        AccYangle -= 270.0
-    else:
-        AccYangle += 90.0
-
+    return (magXoffset, magYoffset, magZoffset), ((avgScale / magXscale, 0, 0), (0, avgScale / magYscale, 0), (0, 0, avgScale / magZscale))
+
+def setMagneticDeclination(decl):
+    global magneticDecl
+    magneticDecl = decl
+    if estimator is not None:
+        estimator.magneticDecl = decl
+
+class KalmanFilter:
+    ''' 1D Kalman filter that combines an angle from the accelerometer with the rate of the gyro.
+    The state (angle, gyro bias and the 2x2 error covariance P) and the tuning are kept per filter, so any number of
+    filters can run side by side. One OrientationEstimator uses one for the X and one for the Y axis.
+    '''
+    __slots__ = ('Q_angle', 'Q_gyro', 'R_angle', 'angle', 'bias', 'P_00', 'P_01', 'P_10', 'P_11')
+
+    def __init__(self, Q_angle=Q_angle, Q_gyro=Q_gyro, R_angle=R_angle, bias=0.0):
+        self.Q_angle = Q_angle
+        self.Q_gyro = Q_gyro
+        self.R_angle = R_angle
+        self.reset(bias)
+
+    def reset(self, bias=0.0, angle=0.0):
+        '''start over from angle with a known gyro bias in deg/s'''
+        self.angle = angle
+        self.bias = bias
+        self.P_00 = 0.0
+        self.P_01 = 0.0
+        self.P_10 = 0.0
+        self.P_11 = 0.0
+
+    def update(self, accAngle, gyroRate, DT):
+        '''update with an accelerometer angle (deg), gyro rate (deg/s) and the time since the last update (s), returns the angle'''
+        P_00 = self.P_00
+        P_01 = self.P_01
+        P_10 = self.P_10
+        P_11 = self.P_11
+
+        angle = self.angle + DT * (gyroRate - self.bias)
+
+        P_00 = P_00 + ( - DT * (P_10 + P_01) + self.Q_angle * DT )
+        P_01 = P_01 + ( - DT * P_11 )
+        P_10 = P_10 + ( - DT * P_11 )
+        P_11 = P_11 + ( + self.Q_gyro * DT )
+
+        y = accAngle - angle
+        S = P_00 + self.R_angle
+        K_0 = P_00 / S
+        K_1 = P_10 / S
+        
+        angle = angle + ( K_0 * y )
+        self.bias = self.bias + ( K_1 * y )
+        
+        self.P_00 = P_00 - ( K_0 * P_00 )
+        self.P_01 = P_01 - ( K_0 * P_01 )
+        self.P_10 = P_10 - ( K_1 * self.P_00 )
+        self.P_11 = P_11 - ( K_1 * self.P_01 )
+
+        self.angle = angle
+        return angle
+
+    def updateAll(self, accAngles, gyroRates, DTs):
+        '''update with sequences of samples, returns the list of angles'''
+        update = self.update
+        return [update(accAngle, gyroRate, DT) for accAngle, gyroRate, DT in zip(accAngles, gyroRates, DTs)]
+
+
+
+
+
+class OrientationEstimator:
+    ''' measures the orientation of the BerryIMU: pitch and roll from the complementary filter and the tilt compensated heading.
+    Nothing happens until it is asked to, so the IMU can settle while the caller does other work:
+
+        estimator = berryIMU.OrientationEstimator()
+        estimator.start()               #detect and initialise the IMU
+        estimator.startBackground()     #keep measuring in a thread...
+        ...                             #...while getting the GPS position
+        estimator.waitForConvergence()  #or waitForMeasurements(MEASURE_N)
+        pitch, roll, heading = estimator.getValues()
+
+    or measure in the foreground with estimator.measure(MEASURE_N) or estimator.measure(untilConverged=True)
+
+    With fusion "MADGWICK" or "MAHONY" a quaternion filter replaces the complementary and Kalman filters, pitch
+    and roll then come from the quaternion and kalmanX and kalmanY are not updated.
+    '''
+
+    def __init__(self, device=None, fusion=None):
+        '''device: an IMU.Imu, by default the one IMU.detectIMU() finds on the default bus when start() is called
+        fusion: "CF", "MADGWICK" or "MAHONY", by default FUSION'''
+        self.device = device
+        self.isLSM9DS0 = device.LSM9DS0 if device is not None else 0    #the chip the samples are from
+        self.fusion = (fusion or FUSION).upper()
+        self.ahrs = None
+        if self.fusion != "CF":
+            import AHRS
+            if self.fusion not in AHRS.FILTERS:
+                raise ValueError("unknown fusion %s, use CF, %s" % (fusion, ", ".join(AHRS.FILTERS)))
+            self.ahrs = AHRS.FILTERS[self.fusion]()
+        self.gain = G_GAIN
+        self.magneticDecl = magneticDecl
+        self.imuLog = None
+        self.sampler = None
+        self.fifo = False           #True when the samples come from the FIFO, see start()
+        self.monitor = None         #a ConvergenceMonitor while measuring until converged
+        self.measurements = 0
+
+        self.gyroXangle = 0.0
+        self.gyroYangle = 0.0
+        self.gyroZangle = 0.0
+        self.CFangleX = 0.0
+        self.CFangleY = 0.0
+        self.kalmanX = 0.0
+        self.kalmanY = 0.0
+        self.kalmanFilterX = KalmanFilter()
+        self.kalmanFilterY = KalmanFilter()
+        self.gyroBias = (0.0, 0.0, 0.0)     #deg/s, from the bias table
+        self.AccXangle = 0.0
+        self.AccYangle = 0.0
+        self.heading = 0.0
+        self.tiltCompensatedHeading = 0.0
+        self.values = (0.0, 0.0, 0.0)
+        self.oldXMagRawValue = 0
+        self.oldYMagRawValue = 0
+        self.oldZMagRawValue = 0
+        self.oldXAccRawValue = 0
+        self.oldYAccRawValue = 0
+        self.oldZAccRawValue = 0
+        self.lastSampleTime = None
+        self.clock = IMUTiming.SampleClock()
+
+        #Setup the median filters, one per axis. Fill them all with '1' soe we dont get devide by zero error 
+        self.accMedianX = RunningMedian(ACC_MEDIANTABLESIZE)
+        self.accMedianY = RunningMedian(ACC_MEDIANTABLESIZE)
+        self.accMedianZ = RunningMedian(ACC_MEDIANTABLESIZE)
+        self.magMedianX = RunningMedian(MAG_MEDIANTABLESIZE)
+        self.magMedianY = RunningMedian(MAG_MEDIANTABLESIZE)
+        self.magMedianZ = RunningMedian(MAG_MEDIANTABLESIZE)
+        self.setSamplePeriod(MEASURE_INTERVAL)
+
+        #the compass calibration doesn't change so it is loaded once
+        (self.magXoffset, self.magYoffset, self.magZoffset), self.magMatrix = magCalibration()
+
+
+    def start(self, fifo=None):
+        '''detect and initialise the IMU. With fifo (by default USE_FIFO) step() and startBackground() read every
+        gyro sample from the LSM9DS1 FIFO, the LSM9DS0 has no FIFO and is read one sample at a time'''
+        if self.device is None:
+            if I2C_STATS:
+                import I2CStats
+                IMU.setBus(I2CStats.InstrumentedBus(IMU.openBus()))
+                IMU.bus.installSignalHandler()
+            self.device = IMU.detectIMU()     #Detect if BerryIMUv1 or BerryIMUv2 is connected.
+        self.isLSM9DS0 = self.device.LSM9DS0
+        self.gain = self.device.initIMU()[0]       #Initialise the accelerometer, gyroscope and compass
+        if BIAS_TABLE:
+            self.seedGyroBias()
+
+        if RECORD_FILE:
+            import IMULog
+            self.imuLog = IMULog.IMULogger(RECORD_FILE, self.device.LSM9DS0)
+        #the loop period follows the gyro ODR, see IMUTiming.py
+        self.clock = IMUTiming.SampleClock(self.device.samplePeriod())
+        self.clock.tick()
+        self.lastSampleTime = None
+        self.fifo = bool(USE_FIFO if fifo is None else fifo) and self.device.enableFIFO()
+        if self.fifo:
+            self.setSamplePeriod(self.device.samplePeriod())
+
+    def setSamplePeriod(self, period):
+        '''convert the filter constants and the numbers of measurements, which are for measurements MEASURE_INTERVAL
+        apart, to measurements period seconds apart. The low pass and complementary filters then have the same time
+        constant and the median filters and the convergence window span the same time. Nothing changes at
+        MEASURE_INTERVAL. Called by start(), measure() and startBackground() for the way they measure'''
+        steps = period / MEASURE_INTERVAL
+        self.samplePeriod = period
+        self.aa = AA ** steps
+        self.accLPF = 1 - (1 - ACC_LPF_FACTOR) ** steps
+        self.magLPF = 1 - (1 - MAG_LPF_FACTOR) ** steps
+        accSize = self.samples(ACC_MEDIANTABLESIZE)
+        if accSize != self.accMedianX.size:
+            self.accMedianX = RunningMedian(accSize)
+            self.accMedianY = RunningMedian(accSize)
+            self.accMedianZ = RunningMedian(accSize)
+        magSize = self.samples(MAG_MEDIANTABLESIZE)
+        if magSize != self.magMedianX.size:
+            self.magMedianX = RunningMedian(magSize)
+            self.magMedianY = RunningMedian(magSize)
+            self.magMedianZ = RunningMedian(magSize)
+
+    def samples(self, measurements):
+        '''the number of samples at the current sample period that take as long as measurements MEASURE_INTERVAL apart'''
+        return max(1, int(round(measurements * MEASURE_INTERVAL / self.samplePeriod)))
+
+    def convergenceMonitor(self, window=CONVERGED_WINDOW, tolerance=CONVERGED_TOLERANCE):
+        '''a ConvergenceMonitor over window measurements MEASURE_INTERVAL apart at the current sample period'''
+        return ConvergenceMonitor(self.samples(window), tolerance)
+
+
+    def seedGyroBias(self):
+        '''start the Kalman filters from the gyro bias of the current die temperature in BIAS_TABLE.
+        When the table has nothing near this temperature the bias is measured first, if the IMU is not moving'''
+        import GyroBias
+        table = GyroBias.BiasTable(BIAS_TABLE)
+        temperature = self.device.readTemperature()
+        if not table.known(temperature):
+            measured = GyroBias.measureBias(self.device, self.gain)
+            if measured is not None:
+                table.record(temperature, measured)
+                table.save()
+        bias = table.lookup(temperature)
+        if bias is not None:
+            self.gyroBias = bias
+            self.kalmanFilterX.reset(bias[0])
+            self.kalmanFilterY.reset(bias[1])
+
+    def saveGyroBias(self):
+        '''record the bias the Kalman filters have learned in BIAS_TABLE at the current die temperature, so the table
+        gets better with every run. Nothing is recorded before BIAS_SAVE_N measurements (see samples()) or without the
+        Kalman filters'''
+        if not BIAS_TABLE or self.device is None or self.ahrs is not None or self.measurements < self.samples(BIAS_SAVE_N):
+            return
+        import GyroBias
+        table = GyroBias.BiasTable(BIAS_TABLE)
+        table.record(self.device.readTemperature(), (self.kalmanFilterX.bias, self.kalmanFilterY.bias, self.gyroBias[2]))
+        table.save()
+
+
+    def step(self):
+        '''read the accelerometer, gyroscope and magnetometer once and update the filters.
+        With the FIFO every sample in it goes through the filters, with the FIFO timestamps'''
+        if self.fifo:
+            #the compass is not in the FIFO, its latest value goes with all gyro samples of this read
+            mag = self.device.readMag()
+            for t, gyr, acc in self.device.readFIFO():
+                self.fuse(t, acc, gyr, mag)
+            return self.values
+
+        #each sensor is read in a single burst transaction
+        acc = self.device.readAccel()
+        gyr = self.device.readGyro()
+        mag = self.device.readMag()
+
+        if self.imuLog:
+            self.imuLog.append(time.monotonic(), acc, gyr, mag)
+
+        ##Calculate loop Period(LP). How long between Gyro Reads
+        LP = self.clock.tick()
+
+        return self.update(acc, gyr, mag, LP)
+
+
+    def measure(self, n=MEASURE_N, interval=0.03, untilConverged=False, tolerance=CONVERGED_TOLERANCE, window=CONVERGED_WINDOW, timeout=CONVERGED_TIMEOUT):
+        '''take n measurements in the foreground, interval seconds apart. returns getValues()
+        With untilConverged n is ignored: it measures until the complementary and Kalman angles and the tilt
+        compensated heading have a standard deviation below tolerance degrees over the last window measurements,
+        or until timeout seconds have passed. With the FIFO the window is converted to gyro samples, see setSamplePeriod()'''
+        self.setSamplePeriod(self.device.samplePeriod() if self.fifo else interval)
+        if untilConverged:
+            self.monitor = self.convergenceMonitor(window, tolerance)
+            deadline = time.monotonic() + timeout
+            while not self.monitor.converged():
+                if time.monotonic() > deadline:
+                    print("orientation did not converge within %i seconds" % timeout)
+                    break
+                self.step()
+                time.sleep(interval)
+            self.monitor = None
+        else:
+            for i in range(n):
+                self.step()
+                #slow program down a bit
+                time.sleep(interval)
+        if self.imuLog:
+            self.imuLog.flush()
+        self.saveGyroBias()
+        return self.getValues()
+
+
+    def fuse(self, t, acc, gyr, mag):
+        '''update the filters with a sample taken at time.monotonic() t, used as the IMUSampler fuse function'''
+        LP = 0.0 if self.lastSampleTime is None else t - self.lastSampleTime
+        self.lastSampleTime = t
+        if self.imuLog:
+            self.imuLog.append(t, acc, gyr, mag)
+        return self.update(acc, gyr, mag, LP)
+
+    def replay(self, path):
+        '''run the filters over a log recorded with RECORD_FILE (see IMULog.py) as fast as it can be read, no IMU
+        needed. The chip comes from the log and dt from its timestamps. Yields the timestamp of every sample once the
+        filters have been updated with it'''
+        import IMULog
+        samples, self.isLSM9DS0 = IMULog.replay(path)
+        self.lastSampleTime = None
+        for t, acc, gyr, mag in samples:
+            self.fuse(t, acc, gyr, mag)
+            yield t
+
+    def startBackground(self, interval=0.03, scheduled=False):
+        '''keep measuring in a background thread every interval seconds, see IMUSampler.py
+        With scheduled every gyro sample is measured at the gyro ODR and the sensors are only read when they have a
+        new sample, interval is then not used, see IMUScheduler.py. With the FIFO (see start()) the FIFO is drained
+        every interval and all its samples are measured. The filter constants are converted to the sample period, see
+        setSamplePeriod()'''
+        self.lastSampleTime = None
+        self.setSamplePeriod(self.device.samplePeriod() if scheduled or self.fifo else interval)
+        if scheduled:
+            import IMUScheduler
+            self.sampler = IMUScheduler.ScheduledSampler(self.device, fuse=self.fuse)
+        elif self.fifo:
+            self.sampler = IMUSampler.FIFOSampler(self.device, interval=interval, fuse=self.fuse)
+        else:
+            self.sampler = IMUSampler.IMUSampler(self.device, interval=interval, fuse=self.fuse)
+        self.sampler.start()
+
+    def stopBackground(self):
+        '''stop the background thread and record the gyro bias the run has learned'''
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+            self.saveGyroBias()
+
+    def waitForMeasurements(self, n=MEASURE_N, timeout=None):
+        '''block until the background thread has taken n measurements, returns False on timeout.
+        Measuring every gyro sample that is as many samples as take as long as n measurements, see samples()'''
+        return self.sampler.waitForSamples(self.samples(n), timeout)
+
+    def waitForConvergence(self, tolerance=CONVERGED_TOLERANCE, window=CONVERGED_WINDOW, timeout=CONVERGED_TIMEOUT):
+        '''block until the background measurements have converged (see measure()), returns False on timeout'''
+        self.monitor = self.convergenceMonitor(window, tolerance)
+        deadline = time.monotonic() + timeout
+        converged = self.monitor.converged()
+        while not converged and time.monotonic() < deadline:
+            time.sleep(self.sampler.interval)
+            converged = self.monitor.converged()
+        self.monitor = None
+        if not converged:
+            print("orientation did not converge within %i seconds" % timeout)
+        return converged
+
+
+    def getValues(self):
+        '''returns (CFangleX, CFangleY, tiltCompensatedHeading)'''
+        return self.values
+
+
+    def calibrateMag(self, MAGx, MAGy, MAGz):
+        '''apply the hard iron offset and the soft iron matrix to raw compass values'''
+        #hard iron offset  
+        MAGx -= self.magXoffset
+        MAGy -= self.magYoffset
+        MAGz -= self.magZoffset
+        #soft iron matrix
+        (m00, m01, m02), (m10, m11, m12), (m20, m21, m22) = self.magMatrix
+        return (m00 * MAGx + m01 * MAGy + m02 * MAGz,
+                m10 * MAGx + m11 * MAGy + m12 * MAGz,
+                m20 * MAGx + m21 * MAGy + m22 * MAGz)
+
+
+    def update(self, acc, gyr, mag, LP):
+        '''run one sample of raw (x, y, z) accelerometer, gyro and magnetometer values through the filters.
+        LP is the time since the previous sample in seconds. returns getValues()'''
+        if self.ahrs is not None:
+            return self.updateAHRS(acc, gyr, mag, LP)
+        ACCx, ACCy, ACCz = acc
+        GYRx, GYRy, GYRz = gyr
+        MAGx, MAGy, MAGz = mag
+
+        #Apply compass calibration  
+        MAGx, MAGy, MAGz = self.calibrateMag(MAGx, MAGy, MAGz)
+
+
+        ############################################### 
+        #### Apply low pass filter ####
+        ###############################################
+        #the factors are MAG_LPF_FACTOR and ACC_LPF_FACTOR converted to the sample period, see setSamplePeriod()
+        magLPF = self.magLPF
+        accLPF = self.accLPF
+        MAGx =  MAGx  * magLPF + self.oldXMagRawValue*(1 - magLPF);
+        MAGy =  MAGy  * magLPF + self.oldYMagRawValue*(1 - magLPF);
+        MAGz =  MAGz  * magLPF + self.oldZMagRawValue*(1 - magLPF);
+        ACCx =  ACCx  * accLPF + self.oldXAccRawValue*(1 - accLPF);
+        ACCy =  ACCy  * accLPF + self.oldYAccRawValue*(1 - accLPF);
+        ACCz =  ACCz  * accLPF + self.oldZAccRawValue*(1 - accLPF);
+
+        self.oldXMagRawValue = MAGx
+        self.oldYMagRawValue = MAGy
+        self.oldZMagRawValue = MAGz
+        self.oldXAccRawValue = ACCx
+        self.oldYAccRawValue = ACCy
+        self.oldZAccRawValue = ACCz
+
+        ######################################### 
+        #### Median filter for accelerometer ####
+        #########################################
+        ACCx = self.accMedianX.update(ACCx)
+        ACCy = self.accMedianY.update(ACCy)
+        ACCz = self.accMedianZ.update(ACCz)
+
+        ######################################### 
+        #### Median filter for magnetometer ####
+        #########################################
+        MAGx = self.magMedianX.update(MAGx)
+        MAGy = self.magMedianY.update(MAGy)
+        MAGz = self.magMedianZ.update(MAGz)
+
+
+
+        #Convert Gyro raw to degrees per second. The Kalman filters get the rates with the bias, they track it themselves
+        gyroRateX = GYRx * self.gain
+        gyroRateY = GYRy * self.gain
+        bias = self.gyroBias
+        rate_gyr_x =  gyroRateX - bias[0]
+        rate_gyr_y =  gyroRateY - bias[1]
+        rate_gyr_z =  GYRz * self.gain - bias[2]
+
+
+        #Calculate the angles from the gyro. 
+        self.gyroXangle+=rate_gyr_x*LP
+        self.gyroYangle+=rate_gyr_y*LP
+        self.gyroZangle+=rate_gyr_z*LP
+
+        #Convert Accelerometer values to degrees
+
+        if not IMU_UPSIDE_DOWN:
+            # If the IMU is up the correct way (Skull logo facing down), use these calculations
+            AccXangle =  (math.atan2(ACCy,ACCz)*RAD_TO_DEG)
+            AccYangle =  (math.atan2(ACCz,ACCx)+M_PI)*RAD_TO_DEG
+        else:
+            #Us these four lines when the IMU is upside down. Skull logo is facing up
+            AccXangle =  (math.atan2(-ACCy,-ACCz)*RAD_TO_DEG)
+            AccYangle =  (math.atan2(-ACCz,-ACCx)+M_PI)*RAD_TO_DEG
+
+
+
+        #Change the rotation value of the accelerometer to -/+ 180 and
+        #move the Y axis '0' point to up.  This makes it easier to read.
+        if AccYangle > 90:
+            AccYangle -= 270.0
+        else:
+            AccYangle += 90.0
+
+        self.AccXangle = AccXangle
+        self.AccYangle = AccYangle
+
+
+        #Complementary filter used to combine the accelerometer and gyro values. AA converted to the sample period
+        aa = self.aa
+        CFangleX=aa*(self.CFangleX+rate_gyr_x*LP) +(1 - aa) * AccXangle
+        CFangleY=aa*(self.CFangleY+rate_gyr_y*LP) +(1 - aa) * AccYangle
+        self.CFangleX = CFangleX
+        self.CFangleY = CFangleY
+
+        #Kalman filter used to combine the accelerometer and gyro values.
+        self.kalmanY = self.kalmanFilterY.update(AccYangle, gyroRateY,LP)
+        self.kalmanX = self.kalmanFilterX.update(AccXangle, gyroRateX,LP)
+
+        if IMU_UPSIDE_DOWN:
+            MAGy = -MAGy      #If IMU is upside down, this is needed to get correct heading.
+        #Calculate heading
+        heading = 180 * math.atan2(MAGy,MAGx)/M_PI
+
+        #Only have our heading between 0 and 360
+        if heading < 0:
+            heading += 360
+        self.heading = heading
+
+
+
+        ####################################################################
+        ###################Tilt compensated heading#########################
+        ####################################################################
+        #Normalize accelerometer raw values.
+        if not IMU_UPSIDE_DOWN:        
+            #Use these two lines when the IMU is up the right way. Skull logo is facing down
+            accXnorm = ACCx/math.sqrt(ACCx * ACCx + ACCy * ACCy + ACCz * ACCz)
+            accYnorm = ACCy/math.sqrt(ACCx * ACCx + ACCy * ACCy + ACCz * ACCz)
+        else:
+            #Us these four lines when the IMU is upside down. Skull logo is facing up
+            accXnorm = -ACCx/math.sqrt(ACCx * ACCx + ACCy * ACCy + ACCz * ACCz)
+            accYnorm = ACCy/math.sqrt(ACCx * ACCx + ACCy * ACCy + ACCz * ACCz)
+
+        #Calculate pitch and roll
+
+        pitch = math.asin(accXnorm)
+        roll = -math.asin(accYnorm/math.cos(pitch))
 
 
-    #Complementary filter used to combine the accelerometer and gyro values.
-    CFangleX=AA*(CFangleX+rate_gyr_x*LP) +(1 - AA) * AccXangle
-    CFangleY=AA*(CFangleY+rate_gyr_y*LP) +(1 - AA) * AccYangle
+        #Calculate the new tilt compensated values
+        magXcomp = MAGx*math.cos(pitch)+MAGz*math.sin(pitch)
+     
+        #The compass and accelerometer are orientated differently on the LSM9DS0 and LSM9DS1 and the Z axis on the compass
+        #is also reversed. This needs to be taken into consideration when performing the calculations
+        if(self.isLSM9DS0):
+            magYcomp = MAGx*math.sin(roll)*math.sin(pitch)+MAGy*math.cos(roll)-MAGz*math.sin(roll)*math.cos(pitch)   #LSM9DS0
+        else:
+            magYcomp = MAGx*math.sin(roll)*math.sin(pitch)+MAGy*math.cos(roll)+MAGz*math.sin(roll)*math.cos(pitch)   #LSM9DS1
 
-    #Kalman filter used to combine the accelerometer and gyro values.
-    kalmanY = kalmanFilterY(AccYangle, rate_gyr_y,LP)
-    kalmanX = kalmanFilterX(AccXangle, rate_gyr_x,LP)
 
-    if IMU_UPSIDE_DOWN:
-        MAGy = -MAGy      #If IMU is upside down, this is needed to get correct heading.
-    #Calculate heading
-    heading = 180 * math.atan2(MAGy,MAGx)/M_PI
 
-    #Only have our heading between 0 and 360
-    if heading < 0:
-        heading += 360
+        #Calculate tilt compensated heading
+        #Added magnetic declination compensation (Léon Spek May 2019)
+        tiltCompensatedHeading = 180 * (math.atan2(magYcomp,magXcomp) + (self.magneticDecl / 1000)) /M_PI
 
 
+        #21.23
+        if tiltCompensatedHeading < 0:
+                    tiltCompensatedHeading += 360
+        self.tiltCompensatedHeading = tiltCompensatedHeading
 
-    ####################################################################
-    ###################Tilt compensated heading#########################
-    ####################################################################
-    #Normalize accelerometer raw values.
-    if not IMU_UPSIDE_DOWN:        
-        #Use these two lines when the IMU is up the right way. Skull logo is facing down
-        accXnorm = ACCx/math.sqrt(ACCx * ACCx + ACCy * ACCy + ACCz * ACCz)
-        accYnorm = ACCy/math.sqrt(ACCx * ACCx + ACCy * ACCy + ACCz * ACCz)
-    else:
-        #Us these four lines when the IMU is upside down. Skull logo is facing up
-        accXnorm = -ACCx/math.sqrt(ACCx * ACCx + ACCy * ACCy + ACCz * ACCz)
-        accYnorm = ACCy/math.sqrt(ACCx * ACCx + ACCy * ACCy + ACCz * ACCz)
+        ############################ END ##################################
 
-    #Calculate pitch and roll
+        self.measurements += 1
+        self.values = (CFangleX, CFangleY, tiltCompensatedHeading)
+        monitor = self.monitor
+        if monitor is not None:
+            monitor.add((CFangleX, CFangleY, self.kalmanX, self.kalmanY), tiltCompensatedHeading)
+        return self.values
 
-    pitch = math.asin(accXnorm)
-    roll = -math.asin(accYnorm/math.cos(pitch))
 
+    def updateAHRS(self, acc, gyr, mag, LP):
+        '''update() with the quaternion filter. The calibrated samples go into the filter without the low pass and
+        median filters, the quaternion filter smooths them itself.'''
+        ACCx, ACCy, ACCz = acc
+        GYRx, GYRy, GYRz = gyr
+        MAGx, MAGy, MAGz = mag
 
-    #Calculate the new tilt compensated values
-    magXcomp = MAGx*math.cos(pitch)+MAGz*math.sin(pitch)
- 
-    #The compass and accelerometer are orientated differently on the LSM9DS0 and LSM9DS1 and the Z axis on the compass
-    #is also reversed. This needs to be taken into consideration when performing the calculations
-    if(IMU.LSM9DS0):
-        magYcomp = MAGx*math.sin(roll)*math.sin(pitch)+MAGy*math.cos(roll)-MAGz*math.sin(roll)*math.cos(pitch)   #LSM9DS0
-    else:
-        magYcomp = MAGx*math.sin(roll)*math.sin(pitch)+MAGy*math.cos(roll)+MAGz*math.sin(roll)*math.cos(pitch)   #LSM9DS1
+        #Apply compass calibration
+        MAGx, MAGy, MAGz = self.calibrateMag(MAGx, MAGy, MAGz)
+        #turn the compass axes into the accelerometer axes, the Y axis is reversed and the Z axis too on the LSM9DS1
+        MAGy = -MAGy
+        if not self.isLSM9DS0:
+            MAGz = -MAGz
 
+        #Convert Gyro raw to radians per second
+        gain = self.gain * (M_PI / 180)
+        bias = self.gyroBias
+        rate_gyr_x = GYRx * gain - bias[0] * (M_PI / 180)
+        rate_gyr_y = GYRy * gain - bias[1] * (M_PI / 180)
+        rate_gyr_z = GYRz * gain - bias[2] * (M_PI / 180)
 
+        if IMU_UPSIDE_DOWN:
+            #upside down is turned 180 degrees around the X axis
+            ACCy, ACCz, rate_gyr_y, rate_gyr_z, MAGy, MAGz = -ACCy, -ACCz, -rate_gyr_y, -rate_gyr_z, -MAGy, -MAGz
 
+        self.ahrs.update(rate_gyr_x, rate_gyr_y, rate_gyr_z, ACCx, ACCy, ACCz, MAGx, MAGy, MAGz, LP)
+        roll, pitch, yaw = self.ahrs.angles()
 
-	#Calculate tilt compensated heading
-    #Added magnetic declination compensation (Léon Spek May 2019)
-    tiltCompensatedHeading = 180 * (math.atan2(magYcomp,magXcomp) + (magneticDecl / 1000)) /M_PI
+        tiltCompensatedHeading = (yaw + 180 * (self.magneticDecl / 1000) / M_PI) % 360
+        self.CFangleX = roll
+        self.CFangleY = pitch
+        self.tiltCompensatedHeading = tiltCompensatedHeading
 
+        self.measurements += 1
+        self.values = (roll, pitch, tiltCompensatedHeading)
+        monitor = self.monitor
+        if monitor is not None:
+            monitor.add((roll, pitch, self.kalmanX, self.kalmanY), tiltCompensatedHeading)
+        return self.values
 
-    #21.23
-    if tiltCompensatedHeading < 0:
-                tiltCompensatedHeading += 360
 
-    ############################ END ##################################
+    def printValues(self):
+        '''print the current angles, the if statements select what is shown'''
+        if 0:			#Change to '0' to stop showing the angles from the accelerometer
+            print ("# ACCX Angle %5.2f ACCY Angle %5.2f #  " % (self.AccXangle, self.AccYangle), end='')
 
+        if 0:			#Change to '0' to stop  showing the angles from the gyro
+            print ("\t# GRYX Angle %5.2f  GYRY Angle %5.2f  GYRZ Angle %5.2f # " % (self.gyroXangle,self.gyroYangle,self.gyroZangle), end='')
 
-    if 0:			#Change to '0' to stop showing the angles from the accelerometer
-        print ("# ACCX Angle %5.2f ACCY Angle %5.2f #  " % (AccXangle, AccYangle)),
+        if 0:			#Change to '0' to stop  showing the angles from the complementary filter
+            print ("\t# CFangleX Angle %5.2f   CFangleY Angle %5.2f #" % (self.CFangleX,self.CFangleY), end='')
+            
+        if 0:			#Change to '0' to stop  showing the heading
+            print ("\t# HEADING %5.2f  tiltCompensatedHeading %5.2f #" % (self.heading,self.tiltCompensatedHeading), end='')
+            
+        if 0:			#Change to '0' to stop  showing the angles from the Kalman filter
+            print ("# kalmanX %5.2f   kalmanY %5.2f #" % (self.kalmanX,self.kalmanY), end='')
 
-    if 0:			#Change to '0' to stop  showing the angles from the gyro
-        print ("\t# GRYX Angle %5.2f  GYRY Angle %5.2f  GYRZ Angle %5.2f # " % (gyroXangle,gyroYangle,gyroZangle)),
+        #print a new line
+        print ("")  
 
-    if 0:			#Change to '0' to stop  showing the angles from the complementary filter
-        print ("\t# CFangleX Angle %5.2f   CFangleY Angle %5.2f #" % (CFangleX,CFangleY)),
-        
-    if 0:			#Change to '0' to stop  showing the heading
-        print ("\t# HEADING %5.2f  tiltCompensatedHeading %5.2f #" % (heading,tiltCompensatedHeading)),
-        
-    if 0:			#Change to '0' to stop  showing the angles from the Kalman filter
-        print ("# kalmanX %5.2f   kalmanY %5.2f #" % (kalmanX,kalmanY)),
 
-    #print a new line
-    #print ("")  
 
-    numMeasurements += 1
-    #slow program down a bit, makes the output more readable
-    time.sleep(0.03)
+#the estimator getValues() uses, created on the first call
+estimator = None
 
 #return values after n measurements    (added May 2019 by Léon Spek)
 def getValues():
-    return(CFangleX, CFangleY, tiltCompensatedHeading)
-
+    '''start the IMU and measure MEASURE_N times on the first call, returns (CFangleX, CFangleY, tiltCompensatedHeading)'''
+    global estimator
+    if estimator is None:
+        estimator = OrientationEstimator()
+        estimator.start()
+        estimator.measure(MEASURE_N)
+    return estimator.getValues()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="measure the orientation of the BerryIMU")
+    parser.add_argument('--replay', metavar="replay", type=str, default=None, help="IMU log (see IMULog.py) to run the filters over instead of the IMU")
+    args = parser.parse_args()
+
+    estimator = OrientationEstimator()
+    if args.replay:
+        for t in estimator.replay(args.replay):
+            pass
+        print("%i samples from %s" % (estimator.measurements, args.replay))
+    else:
+        estimator.start()
+        estimator.measure(MEASURE_N)
+    estimator.printValues()
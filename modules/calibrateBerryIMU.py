@@ -2,22 +2,36 @@
 #   This program is used to calibrate the compass on a BerryIMUv1 or
 #   BerryIMUv2.
 #
-#   Start this program and rotate your BerryIMU in all directions. 
-#   You will see the maximum and minimum values change. 
-#   After about 30secs or when the values are not changing, press Ctrl-C.
-#   The program will printout some text which you then need to add to
-#   berryIMU.py or berryIMU-simple.py
+#   Start this program and rotate your BerryIMU in all directions.
+#   You will see the maximum and minimum values change and the coverage,
+#   the part of all directions the compass has pointed to, go up.
+#   The program stops by itself when the coverage is high enough, or
+#   press Ctrl-C. It then fits an ellipsoid through all samples (see
+#   MagCalibration.py) and writes the calibration profile that berryIMU.py
+#   loads at startup, nothing has to be pasted by hand anymore.
+#   The min/max values are printed too, for use without a profile.
 
 
 import sys,signal,os
 import time
 import math
+import argparse
+
+import numpy as np
 
 import IMU
-import datetime
+import MagCalibration
+import berryIMU
 
 
-def handle_ctrl_c(signal, frame):
+parser = argparse.ArgumentParser(description="compass calibration")
+parser.add_argument('--profile', metavar="profile", type=str, default=berryIMU.MAG_PROFILE, help="calibration profile to write")
+parser.add_argument('--coverage', metavar="coverage", type=float, default=0.9, help="stop when this part (0-1) of all directions is covered")
+parser.add_argument('--minSamples', metavar="minSamples", type=int, default=200, help="take at least this many samples")
+args = parser.parse_args()
+
+
+def finish():
     print (" ")
     print ("magXmin = ",  magXmin)
     print ("magYmin = ",  magYmin)
@@ -25,20 +39,32 @@ def handle_ctrl_c(signal, frame):
     print ("magXmax = ",  magXmax)
     print ("magYmax = ",  magYmax)
     print ("magZmax = ",  magZmax)
+
+    try:
+        offset, matrix, residual = MagCalibration.fitEllipsoid(samples[:count])
+    except (ValueError, np.linalg.LinAlgError) as error:
+        print ("no calibration profile written: %s" % error)
+        return
+    covered = MagCalibration.coverage(samples[:count], offset)
+    MagCalibration.saveProfile(args.profile, offset, matrix, samples=count, coverage=covered, residual=residual)
+    print ("offset %s" % np.array2string(offset, precision=1))
+    print ("soft iron matrix\n%s" % np.array2string(matrix, precision=4))
+    print ("%i samples, %.0f%% coverage, %.1f%% rms residual" % (count, covered * 100, residual * 100))
+    print ("calibration profile written to %s" % args.profile)
+
+def handle_ctrl_c(signal, frame):
+    finish()
     sys.exit(130) # 130 is standard exit code for ctrl-c
 
 
 
-IMU.detectIMU()
-IMU.initIMU()
+imu = IMU.detectIMU()
+imu.initIMU()
 
 #This will capture exit when using Ctrl-C
 signal.signal(signal.SIGINT, handle_ctrl_c)
 
 
-a = datetime.datetime.now()
-
-
 #Preload the variables used to keep track of the minimum and maximum values
 magXmin = 32767
 magYmin = 32767
@@ -47,17 +73,22 @@ magXmax = -32767
 magYmax = -32767
 magZmax = -32767
 
+#all samples, the array doubles in size when it is full
+samples = np.empty((1024, 3))
+count = 0
+covered = 0.0
+
 
-    
 while True:
 
     #Read magnetometer values
-    MAGx = IMU.readMAGx()
-    MAGy = IMU.readMAGy()
-    MAGz = IMU.readMAGz()
-    
-    
-    
+    MAGx, MAGy, MAGz = imu.readMag()
+
+    if count == len(samples):
+        samples = np.concatenate((samples, np.empty_like(samples)))
+    samples[count] = (MAGx, MAGy, MAGz)
+    count += 1
+
     if MAGx > magXmax:
         magXmax = MAGx
     if MAGy > magYmax:
@@ -72,11 +103,16 @@ while True:
     if MAGz < magZmin:
         magZmin = MAGz
 
-    print(" magXmin  %i  magYmin  %i  magZmin  %i  ## magXmax  %i  magYmax  %i  magZmax %i  " %(magXmin,magYmin,magZmin,magXmax,magYmax,magZmax))
+    #the coverage around the centre of the min/max values, updated once a second
+    if count % 30 == 0:
+        centre = ((magXmin + magXmax) / 2, (magYmin + magYmax) / 2, (magZmin + magZmax) / 2)
+        covered = MagCalibration.coverage(samples[:count], centre)
 
+    print(" magXmin  %i  magYmin  %i  magZmin  %i  ## magXmax  %i  magYmax  %i  magZmax %i  ## coverage %3.0f%%  " %(magXmin,magYmin,magZmin,magXmax,magYmax,magZmax,covered * 100))
 
+    if covered >= args.coverage and count >= args.minSamples:
+        finish()
+        break
 
     #slow program down a bit, makes the output more readable
     time.sleep(0.03)
-
-
@@ -0,0 +1,65 @@
+''' download the IERS-A earth orientation table for astropy, while there is network
+The trackers never let astropy download anything (see SunPosition.py), they read the table from
+SunPosition.IERS_TABLE. Run this before a unit goes into the field, and again every few months: the table has
+predictions for about a year ahead.
+
+    python3 seedIERS.py
+    python3 seedIERS.py --url file:///media/usb/finals2000A.all     #copy a table brought along on a stick
+'''
+
+import os
+import sys
+import argparse
+import urllib.request
+
+import SunPosition
+
+
+IERS_A_URL = "https://datacenter.iers.org/data/9/finals2000A.all"
+IERS_A_MIRROR = "https://maia.usno.navy.mil/ser7/finals2000A.all"
+
+
+parser = argparse.ArgumentParser(description="seed the local IERS table")
+parser.add_argument('--url', metavar="url", type=str, nargs='*', default=[IERS_A_URL, IERS_A_MIRROR], help="where to get finals2000A.all, the first that works is used")
+parser.add_argument('--path', metavar="path", type=str, default=SunPosition.IERS_TABLE, help="the local table to write")
+parser.add_argument('--timeout', metavar="timeout", type=float, default=30.0, help="seconds to wait for a download")
+args = parser.parse_args()
+
+
+data = None
+for url in args.url:
+    try:
+        with urllib.request.urlopen(url, timeout=args.timeout) as response:
+            data = response.read()
+    except (OSError, ValueError) as error:
+        print("could not get %s: %s" % (url, error))
+        continue
+    print("got %i bytes from %s" % (len(data), url))
+    break
+
+if not data:
+    print("no IERS table written")
+    sys.exit(1)
+
+#write next to the old table first, so a failed check leaves it in place
+temporary = args.path + ".new"
+with open(temporary, 'wb') as tableFile:
+    tableFile.write(data)
+
+try:
+    from astropy.utils import iers
+    from astropy.time import Time
+except ImportError:
+    print("astropy is not installed, the table is not checked")
+else:
+    try:
+        table = iers.IERS_A.read(temporary)
+    except Exception as error:
+        os.remove(temporary)
+        print("not an IERS-A table: %s" % error)
+        sys.exit(1)
+    print("IERS table from %s to %s, predictions from %s" % (Time(table['MJD'][0], format='mjd').iso[:10],
+        Time(table['MJD'][-1], format='mjd').iso[:10], Time(table.meta['predictive_mjd'], format='mjd').iso[:10]))
+
+os.replace(temporary, args.path)
+print("IERS table written to %s" % args.path)
@@ -0,0 +1,43 @@
+''' the modules are flat scripts that import each other by name, as they do when run from modules/ '''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "modules"))
+
+
+import pytest
+
+import IMU
+import IMUSim
+import IMUTiming
+import IMUScheduler
+import I2CStats
+
+
+class FakeTime:
+    '''stands in for the time module of the IMU modules: the clock only moves on sleep(), so the simulated sensor and
+    the code reading it see the same, repeatable time'''
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    def monotonic_ns(self):
+        return int(round(self.now * 1000000000))
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+@pytest.fixture
+def fakeTime(monkeypatch):
+    fake = FakeTime()
+    for module in (IMU, IMUSim, IMUTiming, IMUScheduler, I2CStats):
+        monkeypatch.setattr(module, "time", fake)
+    return fake
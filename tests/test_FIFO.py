@@ -0,0 +1,82 @@
+''' LSM9DS1 FIFO draining on a simulated BerryIMU, see IMU.Imu.readFIFO() '''
+
+import time
+
+import pytest
+
+import IMU
+import IMUSim
+import berryIMU
+
+
+RATE = 476.0      #the default LSM9DS1 gyro ODR initIMU() sets, OrientationEstimator.start() initialises the IMU again
+PERIOD = 1.0 / RATE
+
+#the gyro x axis numbers the samples, so the order of the drained samples can be checked
+SAMPLES = [(0, 0, 1366, i, 0, 0, -537, 1133, 1438) for i in range(10000)]
+
+
+def fifoDevice():
+    device = IMU.Imu(IMUSim.SimBus(SAMPLES, rate=RATE), False)
+    device.initIMU()
+    assert device.enableFIFO(odr=RATE)
+    return device
+
+
+def checkStream(samples):
+    '''consecutive samples, one FIFO period apart'''
+    for (t0, gyr0, acc0), (t1, gyr1, acc1) in zip(samples, samples[1:]):
+        assert gyr1[0] == gyr0[0] + 1
+        assert t1 - t0 == pytest.approx(PERIOD, abs=1e-9)
+
+
+def test_drainOrder():
+    device = fifoDevice()
+    time.sleep(10 * PERIOD)
+    first = device.readFIFO()
+    time.sleep(10 * PERIOD)
+    second = device.readFIFO()
+    assert 5 <= len(first) <= IMUSim.FIFO_SIZE
+    assert 5 <= len(second) <= IMUSim.FIFO_SIZE
+    #the second read goes on where the first one stopped, without a gap in the samples or the timestamps
+    checkStream(first + second)
+    assert device.fifoOverruns == 0
+
+
+def test_emptyFIFO():
+    device = fifoDevice()
+    device.readFIFO()
+    #right after a drain there is at most the sample that came in meanwhile
+    assert len(device.readFIFO()) <= 1
+
+
+def test_overrun():
+    device = fifoDevice()
+    time.sleep(2 * IMUSim.FIFO_SIZE * PERIOD)
+    samples = device.readFIFO()
+    assert device.fifoOverruns == 1
+    #the oldest samples were overwritten, what is left is still in order
+    assert len(samples) >= IMUSim.FIFO_SIZE
+    checkStream(samples)
+    #the timestamps start again from the time of the read
+    assert samples[-1][0] == pytest.approx(time.monotonic(), abs=0.05)
+
+
+def test_estimatorDt(monkeypatch):
+    '''the filters get every FIFO sample with the FIFO period as dt'''
+    monkeypatch.setattr(berryIMU, "BIAS_TABLE", None)
+    estimator = berryIMU.OrientationEstimator(fifoDevice())
+    estimator.start(fifo=True)
+    assert estimator.fifo
+    periods = []
+    update = estimator.update
+    def recordUpdate(acc, gyr, mag, LP):
+        periods.append(LP)
+        return update(acc, gyr, mag, LP)
+    monkeypatch.setattr(estimator, "update", recordUpdate)
+    for i in range(3):
+        time.sleep(10 * PERIOD)
+        estimator.step()
+    #the first sample has no previous one
+    assert len(periods) > 15
+    assert periods[1:] == pytest.approx([PERIOD] * (len(periods) - 1), abs=1e-9)
@@ -0,0 +1,93 @@
+''' gyro bias table, see GyroBias.py '''
+
+import pytest
+
+import IMU
+import IMUSim
+import GyroBias
+import berryIMU
+
+
+def table():
+    biasTable = GyroBias.BiasTable()
+    biasTable.record(20, (1.0, -1.0, 0.5))
+    biasTable.record(30, (2.0, -3.0, 0.5))
+    return biasTable
+
+
+def test_empty():
+    biasTable = GyroBias.BiasTable()
+    assert biasTable.lookup(25) is None
+    assert not biasTable.known(25)
+
+
+def test_lookupBin():
+    assert table().lookup(20) == (1.0, -1.0, 0.5)
+    assert table().lookup(30) == (2.0, -3.0, 0.5)
+
+
+def test_interpolate():
+    assert table().lookup(25) == pytest.approx((1.5, -2.0, 0.5))
+    assert table().lookup(22.5) == pytest.approx((1.25, -1.5, 0.5))
+
+
+def test_outsideRange():
+    '''the nearest bin outside the measured range'''
+    assert table().lookup(10) == (1.0, -1.0, 0.5)
+    assert table().lookup(45) == (2.0, -3.0, 0.5)
+
+
+def test_known():
+    biasTable = table()
+    assert biasTable.known(21.9)
+    assert biasTable.known(18)
+    assert not biasTable.known(25)
+
+
+def test_record():
+    '''a bin averages its measurements and rounds the temperature to a degree'''
+    biasTable = GyroBias.BiasTable()
+    biasTable.record(20.3, (1.0, 0.0, 0.0))
+    biasTable.record(19.8, (3.0, 0.0, 0.0))
+    assert list(biasTable.bins) == [20]
+    assert biasTable.lookup(20)[0] == pytest.approx(2.0)
+
+
+def test_saveLoad(tmp_path):
+    path = str(tmp_path / "gyroBias.json")
+    table().save(path)
+    assert GyroBias.BiasTable(path).lookup(27) == pytest.approx(table().lookup(27))
+
+
+def estimator(monkeypatch, path, temperature=30.0):
+    monkeypatch.setattr(berryIMU, "BIAS_TABLE", path)
+    device = IMU.Imu(IMUSim.SimBus(temperature=temperature), False)
+    orientation = berryIMU.OrientationEstimator(device)
+    orientation.gain = device.initIMU()[0]
+    return orientation
+
+
+def test_saveKalmanBias(monkeypatch, tmp_path):
+    '''the bias the Kalman filters learned goes into the table at the end of a run'''
+    path = str(tmp_path / "gyroBias.json")
+    orientation = estimator(monkeypatch, path)
+    orientation.gyroBias = (0.0, 0.0, 0.25)
+    orientation.kalmanFilterX.bias = 0.5
+    orientation.kalmanFilterY.bias = -0.75
+    orientation.measurements = berryIMU.BIAS_SAVE_N - 1
+    orientation.saveGyroBias()
+    assert GyroBias.BiasTable(path).lookup(30) is None
+    orientation.measurements = berryIMU.BIAS_SAVE_N
+    orientation.saveGyroBias()
+    assert GyroBias.BiasTable(path).lookup(30) == pytest.approx((0.5, -0.75, 0.25))
+
+
+def test_complementaryBias(monkeypatch):
+    '''the gyro angles and the complementary filter use the rates without the bias'''
+    orientation = estimator(monkeypatch, None)
+    orientation.gyroBias = (3 * orientation.gain, -2 * orientation.gain, orientation.gain)
+    for i in range(10):
+        orientation.update((0, 0, 1366), (3, -2, 1), (-537, 1133, 1438), 0.01)
+    assert orientation.gyroXangle == pytest.approx(0.0)
+    assert orientation.gyroYangle == pytest.approx(0.0)
+    assert orientation.gyroZangle == pytest.approx(0.0)
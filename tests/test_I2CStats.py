@@ -0,0 +1,48 @@
+''' I2C transaction statistics, see I2CStats.py '''
+
+import threading
+
+import IMU
+import IMUSim
+import I2CStats
+
+
+def test_counts():
+    bus = I2CStats.InstrumentedBus(IMUSim.SimBus())
+    device = IMU.Imu(bus, False)
+    bus.reset()
+    device.readGyro()
+    device.readMag()
+    stats = bus.asDict()
+    assert stats['devices']["0x%02X" % device.gyrAddress]['operations'] == {'read_i2c_block_data': 1}
+    assert stats['devices']["0x%02X" % device.magAddress]['transactions'] == 1
+
+
+def test_dumpWhileRecording():
+    '''the statistics can be printed while another thread records transactions'''
+    bus = I2CStats.InstrumentedBus(IMUSim.SimBus())
+    device = IMU.Imu(bus, False)
+    running = True
+
+    def sample():
+        while running:
+            device.readGyro()
+            device.readMag()
+    thread = threading.Thread(target=sample)
+    thread.start()
+    try:
+        for i in range(200):
+            bus.asDict()
+    finally:
+        running = False
+        thread.join()
+
+
+def test_signalHandlerOffMainThread():
+    '''signal.signal() only works on the main thread, elsewhere nothing is installed'''
+    bus = I2CStats.InstrumentedBus(IMUSim.SimBus())
+    installed = []
+    thread = threading.Thread(target=lambda: installed.append(bus.installSignalHandler()))
+    thread.start()
+    thread.join()
+    assert installed == [False]
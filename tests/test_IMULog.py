@@ -0,0 +1,97 @@
+''' binary IMU logs, see IMULog.py '''
+
+import numpy as np
+import pytest
+
+import IMU
+import IMULog
+import berryIMU
+
+
+#a tilted IMU, so the compass Z axis changes the tilt compensated heading
+SAMPLES = [(1.0 + i * 0.01, (300, -200, 1300), (i, -i, 2 * i), (-537, 1133, 1438)) for i in range(50)]
+
+
+def writeLog(path, isLSM9DS0):
+    log = IMULog.IMULogger(str(path), isLSM9DS0)
+    for sample in SAMPLES:
+        log.append(*sample)
+    log.close()
+
+
+def test_roundTrip(tmp_path):
+    path = tmp_path / "round.imulog"
+    writeLog(path, 1)
+    samples, isLSM9DS0 = IMULog.readLog(str(path))
+    assert isLSM9DS0 == 1
+    assert len(samples) == len(SAMPLES)
+    assert samples['t'].tolist() == [t for t, acc, gyr, mag in SAMPLES]
+    assert [tuple(gyr) for gyr in samples['gyr'].tolist()] == [gyr for t, acc, gyr, mag in SAMPLES]
+
+
+def test_appendBatch(tmp_path):
+    path = tmp_path / "batch.imulog"
+    batch = np.zeros(3, dtype=IMU.SAMPLE_DTYPE)
+    batch['t'] = (1.0, 2.0, 3.0)
+    batch['mag'][:, 2] = (-1, -2, -3)
+    log = IMULog.IMULogger(str(path))
+    log.appendBatch(batch)
+    log.close()
+    samples, isLSM9DS0 = IMULog.readLog(str(path))
+    assert isLSM9DS0 == 0
+    assert samples['mag'][:, 2].tolist() == [-1, -2, -3]
+
+
+def test_cutOffRecord(tmp_path):
+    path = tmp_path / "cut.imulog"
+    writeLog(path, 0)
+    with open(str(path), 'ab') as logFile:
+        logFile.write(b'\x00' * 5)
+    samples, isLSM9DS0 = IMULog.readLog(str(path))
+    assert len(samples) == len(SAMPLES)
+
+
+def test_notALog(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b'\x00' * 64)
+    with pytest.raises(ValueError):
+        IMULog.readLog(str(path))
+
+
+def test_replay(tmp_path):
+    path = tmp_path / "replay.imulog"
+    writeLog(path, 1)
+    samples, isLSM9DS0 = IMULog.replay(str(path), chunkSize=7)
+    assert isLSM9DS0 == 1
+    assert [(t, tuple(acc), tuple(gyr), tuple(mag)) for t, acc, gyr, mag in samples] == SAMPLES
+
+
+@pytest.mark.parametrize("isLSM9DS0", [0, 1])
+def test_replayChip(tmp_path, isLSM9DS0):
+    '''the estimator handles the compass of the chip the log is from, not of the LSM9DS1 it assumes without an IMU'''
+    path = tmp_path / "chip.imulog"
+    writeLog(path, isLSM9DS0)
+    replayed = berryIMU.OrientationEstimator()
+    times = list(replayed.replay(str(path)))
+    assert times == [t for t, acc, gyr, mag in SAMPLES]
+    assert replayed.isLSM9DS0 == isLSM9DS0
+
+    expected = berryIMU.OrientationEstimator()
+    expected.isLSM9DS0 = isLSM9DS0
+    for sample in SAMPLES:
+        expected.fuse(*sample)
+    assert replayed.getValues() == expected.getValues()
+    assert replayed.kalmanX == expected.kalmanX
+
+
+def test_replayChipHeading(tmp_path):
+    '''the chip flag changes the tilt compensated heading of a tilted IMU'''
+    headings = []
+    for isLSM9DS0 in (0, 1):
+        path = tmp_path / ("heading%i.imulog" % isLSM9DS0)
+        writeLog(path, isLSM9DS0)
+        estimator = berryIMU.OrientationEstimator()
+        for t in estimator.replay(str(path)):
+            pass
+        headings.append(estimator.tiltCompensatedHeading)
+    assert headings[0] != pytest.approx(headings[1], abs=0.1)
@@ -0,0 +1,108 @@
+''' scheduled sampling at the gyro ODR, see IMUScheduler.py '''
+
+import time
+
+import pytest
+
+import IMU
+import IMUSim
+import I2CStats
+import IMUScheduler
+
+
+#the gyro x axis numbers the samples
+SAMPLES = [(0, 0, 1366, i, 0, 0, -537, 1133, 1438) for i in range(100000)]
+
+
+def runFor(fakeTime, chip, rate, seconds, lateWakeUps=None):
+    '''run the sampling loop of a sampler on a simulated IMU on a 100kHz bus in this thread, on the fake clock for
+    seconds. The transfers on the bus sleep too. lateWakeUps: {number of the sleep: seconds it wakes up late}.
+    returns (sampler, transactions)'''
+    bus = I2CStats.InstrumentedBus(IMUSim.SimBus(SAMPLES, rate=rate, chip=chip, busSpeed=100000))
+    device = IMU.Imu(bus, chip == "LSM9DS0")
+    device.initIMU()
+    sampler = IMUScheduler.ScheduledSampler(device)
+    #start between two samples, not on one
+    fakeTime.sleep(0.013 / rate)
+    bus.reset()
+
+    end = fakeTime.now + seconds
+    sleep = fakeTime.sleep
+    sleeps = []
+    def jitterSleep(delay):
+        sleep(delay + (lateWakeUps or {}).get(len(sleeps), 0.0))
+        sleeps.append(delay)
+        if fakeTime.now >= end:
+            sampler.running = False
+    fakeTime.sleep = jitterSleep
+    sampler.running = True
+    sampler.run()
+    fakeTime.sleep = sleep
+    sampler.stop()
+    return sampler, sum(bus.counts.values())
+
+
+def indicesAndTimes(sampler):
+    samples = sampler.lastN(min(sampler.count, sampler.size))
+    return [gyr[0] for t, acc, gyr, mag in samples], [t for t, acc, gyr, mag in samples]
+
+
+def checkSamples(sampler, period):
+    '''every gyro sample once, one gyro period apart'''
+    indices, times = indicesAndTimes(sampler)
+    assert indices == list(range(indices[0], indices[0] + len(indices)))
+    for t0, t1 in zip(times, times[1:]):
+        assert t1 - t0 == pytest.approx(period, abs=1e-9)
+
+
+def test_fifo(fakeTime):
+    '''the LSM9DS1 is drained from the FIFO with fewer transactions than a burst read of all sensors'''
+    sampler, transactions = runFor(fakeTime, "LSM9DS1", 476.0, 0.5)
+    assert sampler.fifo
+    assert abs(sampler.count - 238) <= 8
+    checkSamples(sampler, sampler.gyroPeriod)
+    assert transactions / sampler.count < 3
+    #stop() leaves the IMU as it found it
+    assert not sampler.device.fifoEnabled
+
+
+def test_polled(fakeTime):
+    '''the LSM9DS0 gyro status is only polled when a sample is due'''
+    sampler, transactions = runFor(fakeTime, "LSM9DS0", 95.0, 2.0)
+    assert not sampler.fifo
+    assert abs(sampler.count - 190) <= 2
+    checkSamples(sampler, sampler.gyroPeriod)
+    assert transactions / sampler.count < 4
+
+
+def test_polledLate(fakeTime):
+    '''samples overwritten while the thread woke up late are counted in the time, which stays with the sensor'''
+    period = 1 / 95.0
+    late = {20: 0.3 * period, 40: 1.2 * period, 60: 0.7 * period, 80: 2.6 * period, 100: 1.9 * period}
+    sampler, transactions = runFor(fakeTime, "LSM9DS0", 95.0, 2.0, late)
+    indices, times = indicesAndTimes(sampler)
+    gaps = [i1 - i0 for i0, i1 in zip(indices, indices[1:])]
+    assert max(gaps) >= 3
+    #the time of a sample is off by at most a period right after a late wake-up, and not at all once it has settled
+    for index, t in zip(indices, times):
+        assert abs((t - times[0]) - (index - indices[0]) * period) <= period + 1e-6
+    assert times[-1] - times[0] == pytest.approx((indices[-1] - indices[0]) * period, abs=1e-6)
+
+
+def test_fuse():
+    '''fuse gets every sample, with the sample timestamps'''
+    fused = []
+    device = IMU.Imu(IMUSim.SimBus(SAMPLES, rate=476.0), False)
+    device.initIMU()
+    sampler = IMUScheduler.ScheduledSampler(device, fuse=lambda t, acc, gyr, mag: fused.append(t) or len(fused))
+    sampler.start()
+    assert sampler.waitForSamples(50, timeout=2)
+    sampler.stop()
+    assert len(fused) == sampler.count
+    assert sampler.orientation == len(fused)
+    assert fused[-1] == sampler.latest()[0]
+
+
+def test_notInitialised():
+    with pytest.raises(ValueError):
+        IMUScheduler.ScheduledSampler(IMU.Imu(IMUSim.SimBus(), False))
@@ -0,0 +1,84 @@
+''' sample timing, see IMUTiming.py '''
+
+import pytest
+
+import IMU
+import IMUSim
+import IMUTiming
+
+
+RATE = 100.0
+PERIOD = 1.0 / RATE
+
+#the gyro x axis numbers the samples
+SAMPLES = [(0, 0, 1366, i, 0, 0, -537, 1133, 1438) for i in range(10000)]
+
+
+class FakeClock:
+    '''time.monotonic_ns() that only moves when told to'''
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_counted(fakeTime):
+    '''one period for every gyro data ready sample of a simulated sensor, the dts add up to the samples it made'''
+    device = IMU.Imu(IMUSim.SimBus(SAMPLES, rate=RATE), False)
+    clock = IMUTiming.SampleClock(PERIOD)
+    dts = []
+    indices = []
+    #poll a few times per period, at a phase that drifts against the sensor
+    for i in range(100):
+        fakeTime.sleep(0.37 * PERIOD)
+        if device.inertialReady()[1]:
+            indices.append(device.readGyro()[0])
+            dts.append(clock.advance(1))
+    assert len(dts) == 37
+    assert set(dts) == {clock.period}
+    assert indices == list(range(indices[0], indices[0] + len(indices)))
+    assert sum(dts[1:]) == pytest.approx((indices[-1] - indices[0]) * PERIOD)
+    assert clock.samples == len(dts)
+
+
+def test_advanceCount():
+    clock = IMUTiming.SampleClock(PERIOD)
+    assert clock.advance(5) == 5 * clock.period
+    assert clock.advance(0) == 0.0
+    assert clock.samples == 5
+
+
+def test_advanceNeedsPeriod():
+    with pytest.raises(ValueError):
+        IMUTiming.SampleClock().advance(1)
+
+
+def test_tickWholePeriods(monkeypatch):
+    '''the fallback floors to whole periods and carries the rest, so the sum follows the time that passed'''
+    fake = FakeClock()
+    monkeypatch.setattr(IMUTiming.time, "monotonic_ns", fake)
+    clock = IMUTiming.SampleClock(PERIOD)
+    assert clock.tick() == 0.0
+    total = 0.0
+    for step in (4000000, 4000000, 4000000, 25000000, 1000000):
+        fake.now += step
+        dt = clock.tick()
+        assert dt / clock.period == pytest.approx(round(dt / clock.period))
+        total += dt
+    #38 ms is 3 whole periods and 8 ms left over
+    assert total == pytest.approx(3 * PERIOD)
+    assert clock.pending == 8000000
+    assert clock.samples == 3
+
+
+def test_tickWithoutPeriod(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(IMUTiming.time, "monotonic_ns", fake)
+    clock = IMUTiming.SampleClock()
+    clock.tick()
+    fake.now += 1234567
+    assert clock.tick() == pytest.approx(0.001234567)
+    clock.reset()
+    assert clock.tick() == 0.0
@@ -0,0 +1,62 @@
+''' the filter constants of berryIMU.OrientationEstimator at other sample periods, see setSamplePeriod() '''
+
+import pytest
+
+import IMU
+import IMUSim
+import berryIMU
+
+
+LEVEL = (0, 0, 16384)
+TILTED = (0, 8192, 14189)       #30 degrees about the x axis
+MAG = (-537, 1133, 1438)
+
+
+def estimator(monkeypatch):
+    monkeypatch.setattr(berryIMU, "BIAS_TABLE", None)
+    device = IMU.Imu(IMUSim.SimBus(), False)
+    orientation = berryIMU.OrientationEstimator(device)
+    orientation.gain = device.initIMU()[0]
+    return orientation
+
+
+def test_measureInterval(monkeypatch):
+    '''at MEASURE_INTERVAL the constants are the ones the filters were tuned with'''
+    orientation = estimator(monkeypatch)
+    assert orientation.aa == pytest.approx(berryIMU.AA)
+    assert orientation.accLPF == pytest.approx(berryIMU.ACC_LPF_FACTOR)
+    assert orientation.magLPF == pytest.approx(berryIMU.MAG_LPF_FACTOR)
+    assert orientation.accMedianX.size == berryIMU.ACC_MEDIANTABLESIZE
+    assert orientation.magMedianZ.size == berryIMU.MAG_MEDIANTABLESIZE
+    assert orientation.samples(berryIMU.BIAS_SAVE_N) == berryIMU.BIAS_SAVE_N
+    assert orientation.convergenceMonitor().window == berryIMU.CONVERGED_WINDOW
+
+
+def test_gyroPeriod(monkeypatch):
+    '''every gyro sample at 476Hz: the windows span the same time, the filters decay as much per second'''
+    orientation = estimator(monkeypatch)
+    orientation.setSamplePeriod(1 / 476)
+    assert orientation.convergenceMonitor().window == 428
+    assert orientation.samples(berryIMU.BIAS_SAVE_N) == 3570
+    assert orientation.accMedianX.size == orientation.magMedianY.size == 114
+    assert orientation.aa ** 476 == pytest.approx(berryIMU.AA ** (1 / berryIMU.MEASURE_INTERVAL))
+    assert (1 - orientation.accLPF) ** 476 == pytest.approx((1 - berryIMU.ACC_LPF_FACTOR) ** (1 / berryIMU.MEASURE_INTERVAL))
+
+
+def tiltAfter(monkeypatch, period, seconds):
+    '''the complementary filter angle seconds after the IMU was tilted, measured every period'''
+    orientation = estimator(monkeypatch)
+    orientation.setSamplePeriod(period)
+    for i in range(orientation.samples(20)):
+        orientation.update(LEVEL, (0, 0, 0), MAG, period)
+    for i in range(int(round(seconds / period))):
+        orientation.update(TILTED, (0, 0, 0), MAG, period)
+    return orientation.CFangleX
+
+
+def test_stepResponse(monkeypatch):
+    '''the filters follow a tilt in about the same time whether they are updated every 30 ms or every gyro sample'''
+    #the median filters hold the level angle for as long
+    assert tiltAfter(monkeypatch, 1 / 476, 0.09) == pytest.approx(0, abs=0.01)
+    for seconds in (0.3, 0.6):
+        assert tiltAfter(monkeypatch, 1 / 476, seconds) == pytest.approx(tiltAfter(monkeypatch, 0.03, seconds), abs=1.5)